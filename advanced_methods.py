@@ -1,6 +1,8 @@
-from basic_methods import basic_solve_attempt
+from basic_methods import propagate
+from stats import timed
 
 
+@timed
 def bare_tally_pair_check(p):
     """
     advanced method: looks for two boxes with exactly two identical possibilities
@@ -8,34 +10,31 @@ def bare_tally_pair_check(p):
     :param p: the puzzle
     """
     progress = False
+    popcount = p.grid.popcount
 
     # cycle through the 27 axes
     for key, axis in p.axis_map.items():
 
         # Impossible to get new info if 3 or fewer unknowns
-        if len(axis.unknown) < 4:
+        if popcount[axis.unknown] < 4:
             continue
 
-        box_set = axis.box_set
-        # copy of set of boxes in the axis
-        box_set_copy = set(box_set.copy())
-        # list of boxes with identical tally sets of size 2
+        boxes = axis.boxes
+        # list of boxes with identical tally masks of two values
         matches = []
 
         # cycle through boxes in axis
-        for i in box_set:
-            # remove self from the box_set
-            box_set_copy = box_set_copy - {i}
+        for k in range(0, len(boxes) - 1):
+            i = boxes[k]
 
-            # if the tally set for box j is of size 2
-            # and there are boxes left to compare with
-            if len(p.box_map[i].tally) == 2 and len(box_set_copy) != 0:
+            # if the tally mask for box i holds 2 values
+            if popcount[p.box_map[i].tally] == 2:
 
-                # Compare to remaining box tallies
-                for j in box_set_copy:
+                # Compare to the tallies of the boxes after it in the axis
+                for j in boxes[k + 1:]:
                     # If tallies are identical
                     if p.box_map[i].tally == p.box_map[j].tally:
-                        # Put the two box IDs and the tally set in match list
+                        # Put the two box IDs and the tally mask in match list
                         matches.append([i, j, p.box_map[j].tally])
 
         # if no matches found, skip to next axis
@@ -44,59 +43,61 @@ def bare_tally_pair_check(p):
 
         # Cycle through matches
         for match in matches:
-            # remove the boxes with the matching pair from the axis set
-            others = box_set - {match[0], match[1]}
-            two_set = match[2]
+            two_mask = match[2]
 
             # cycle through the other 7 boxes
-            for j in others:
-                # if one of the pair values is found in another tally
-                if p.box_map[j].tally.isdisjoint(two_set) is False:
-                    # Remove the set of those two values
-                    p.box_map[j].tally = p.box_map[j].tally - two_set
+            for j in boxes:
+                if j == match[0] or j == match[1]:
+                    continue
+                # remove the pair values from any other tally containing them
+                if p.remove_from_tally(j, two_mask):
                     progress = True
 
     p.method_log.append(["bare tally pair", progress])
 
 
+@timed
 def hidden_tally_pair_check(p):
     """
     advanced evaluation, looks at each axis to see if there are two values found in the
-    tally sets of only two boxes, removes the other values from those box tally sets
+    tally masks of only two boxes, removes the other values from those box tally masks
     :param p: the puzzle
     """
     progress = False
+    bits = p.grid.bit
+    popcount = p.grid.popcount
     # Loop through the axes
     for key, axis in p.axis_map.items():
-        box_set = axis.box_set
+        boxes = axis.boxes
         unknowns = axis.unknown
 
         # Skip to next axis if three or fewer values are unknown
-        if len(unknowns) < 4:
+        if popcount[unknowns] < 4:
             continue
 
-        # List of values found in exactly two tally sets with the boxes they're in
+        # List of values found in exactly two tally masks with the boxes they're in
         pairs = []
 
         # Loop through each value not yet known in axis
-        for value in unknowns:
+        for value in p.grid.mask_values[unknowns]:
+            bit = bits[value]
             count = 0
-            # list of tally sets where value is possible
+            # list of boxes where value is possible
             place = []
             # loop through each box in the axis
-            for box in box_set:
-                # check for value in tally set
+            for box in boxes:
+                # check for value in tally mask
                 tally = p.box_map[box].tally
-                if value in tally:
+                if tally & bit:
                     count += 1
                     place.append(box)
 
             # Add to list of possibles if value occurs twice
             if count == 2:
-                # and if at least one tally set is longer than 2
+                # and if at least one tally mask holds more than 2 values
                 tally0 = p.box_map[place[0]].tally
                 tally1 = p.box_map[place[1]].tally
-                if len(tally0) > 2 or len(tally1) > 2:
+                if popcount[tally0] > 2 or popcount[tally1] > 2:
                     # list containing value, first box, and second box
                     pairs.append([value, place[0], place[1]])
 
@@ -115,14 +116,245 @@ def hidden_tally_pair_check(p):
                     box2 = pairs[i][2]
                     value1 = pairs[i][0]
                     value2 = pairs[j][0]
-                    # set tally sets for those boxes to have only those two values
-                    p.box_map[box1].tally = {value1, value2}
-                    p.box_map[box2].tally = {value1, value2}
+                    # set tally masks for those boxes to have only those two values
+                    p.set_tally(box1, bits[value1] | bits[value2])
+                    p.set_tally(box2, bits[value1] | bits[value2])
                     progress = True
 
     p.method_log.append(["hidden tally pair", progress])
 
 
+def find_subsets(items, size, popcount, start=0, chosen=(), union=0):
+    """
+    finds the groups of size items whose masks together hold exactly size values. Groups are
+    built up one item at a time in list order, and a group is dropped as soon as its masks hold
+    more than size values, so most combinations of items are never looked at
+    :param items: list of (key, mask) with between 2 and size values in each mask
+    :param size: number of items in a group
+    :param popcount: popcount table of the grid
+    :return: generator of (tuple of the keys in the group, union of their masks)
+    """
+    for k in range(start, len(items)):
+        key, mask = items[k]
+        both = union | mask
+        if popcount[both] > size:
+            continue
+        if len(chosen) + 1 == size:
+            if popcount[both] == size:
+                yield chosen + (key,), both
+        else:
+            yield from find_subsets(items, size, popcount, k + 1, chosen + (key,), both)
+
+
+# Largest naked or hidden subset looked for. An axis with u unknown boxes and a naked subset of
+# n boxes also has a hidden subset of the other u - n, so only subsets of up to half the unknown
+# boxes need looking for
+MAX_SUBSET = 4
+
+
+def remove_eliminations(p, eliminations):
+    """
+    removes the values a pattern rules out from the tallies
+    :param p: the puzzle
+    :param eliminations: list of (box ID, mask of the values to remove)
+    :return: True if any values were removed
+    """
+    progress = False
+    for i, mask in eliminations:
+        if p.remove_from_tally(i, mask):
+            progress = True
+    return progress
+
+
+def naked_subsets(p, smallest=2, largest=MAX_SUBSET):
+    """
+    finds n boxes in an axis whose tally masks hold only n values between them (a naked pair,
+    triple, or quad), so those values can't be in the other boxes of the axis. Nothing is
+    changed; each subset's eliminations are worked out from the tallies when it is reached
+    :param p: the puzzle
+    :param smallest: fewest boxes in a subset
+    :param largest: most boxes in a subset. Subsets of more than half an axis's unknown boxes
+     aren't looked for
+    :return: generator of (tuple of the subset box IDs, mask of their values, list of (box ID,
+     mask of the values to remove)), for subsets that remove something
+    """
+    popcount = p.grid.popcount
+
+    for key, axis in p.axis_map.items():
+        most = min(largest, popcount[axis.unknown] // 2)
+        # Impossible to get new info if 3 or fewer unknowns
+        if most < smallest:
+            continue
+
+        # unknown boxes with few enough values to be in a subset, with their tally masks
+        cells = []
+        for i in axis.boxes:
+            box = p.box_map[i]
+            if box.value == 0 and 2 <= popcount[box.tally] <= most:
+                cells.append((i, box.tally))
+
+        for size in range(smallest, most + 1):
+            for subset, mask in find_subsets(cells, size, popcount):
+                # the subset values in any other tally containing them
+                eliminations = []
+                for j in axis.boxes:
+                    box = p.box_map[j]
+                    if j not in subset and box.value == 0 and box.tally & mask:
+                        eliminations.append((j, box.tally & mask))
+                if eliminations:
+                    yield subset, mask, eliminations
+
+
+def hidden_subsets(p, smallest=2, largest=MAX_SUBSET):
+    """
+    finds n values only possible in the same n boxes of an axis (a hidden pair, triple, or
+    quad), so the other values can't be in those boxes. Nothing is changed; each subset's
+    eliminations are worked out from the tallies when it is reached
+    :param p: the puzzle
+    :param smallest: fewest values in a subset
+    :param largest: most values in a subset. Subsets of more than half an axis's unknown values
+     aren't looked for
+    :return: generator of (list of the subset box IDs, mask of its values, list of (box ID, mask
+     of the values to remove)), for subsets that remove something
+    """
+    bits = p.grid.bit
+    popcount = p.grid.popcount
+    mask_values = p.grid.mask_values
+
+    for key, axis in p.axis_map.items():
+        boxes = axis.boxes
+        unknowns = axis.unknown
+        most = min(largest, popcount[unknowns] // 2)
+        # Skip to next axis if three or fewer values are unknown
+        if most < smallest:
+            continue
+
+        # mask of the places in the axis where each unknown value is possible, bit k for boxes[k]
+        places = dict.fromkeys(mask_values[unknowns], 0)
+        for k in range(0, len(boxes)):
+            box = p.box_map[boxes[k]]
+            if box.value == 0:
+                for value in mask_values[box.tally & unknowns]:
+                    places[value] |= 1 << k
+
+        # values with few enough places to be in a subset, with their place masks
+        values = [(value, mask) for value, mask in places.items() if 2 <= popcount[mask] <= most]
+
+        for size in range(smallest, most + 1):
+            for subset, mask in find_subsets(values, size, popcount):
+                keep = 0
+                for value in subset:
+                    keep |= bits[value]
+                # the boxes at those places can only hold the subset values (place k + 1 is
+                # value k + 1 in the mask tables)
+                cells = [boxes[place - 1] for place in mask_values[mask]]
+                eliminations = []
+                for i in cells:
+                    tally = p.box_map[i].tally
+                    if tally & ~keep:
+                        eliminations.append((i, tally & ~keep))
+                if eliminations:
+                    yield cells, keep, eliminations
+
+
+@timed
+def naked_subset_check(p):
+    """
+    advanced method: looks for n boxes in an axis whose tally masks hold only n values between
+    them (a naked pair, triple, or quad), removes those values from the other boxes in the axis
+    :param p: the puzzle
+    """
+    progress = False
+    for cells, mask, eliminations in naked_subsets(p):
+        if remove_eliminations(p, eliminations):
+            progress = True
+    p.method_log.append(["naked subset", progress])
+
+
+@timed
+def hidden_subset_check(p):
+    """
+    advanced method: looks for n values only possible in the same n boxes of an axis (a
+    hidden pair, triple, or quad), removes the other values from those box tally masks
+    :param p: the puzzle
+    """
+    progress = False
+    for cells, mask, eliminations in hidden_subsets(p):
+        if remove_eliminations(p, eliminations):
+            progress = True
+    p.method_log.append(["hidden subset", progress])
+
+
+def intersections(p, pointing=True, claiming=True):
+    """
+    finds values in the 3-box intersection of a square and a row or column that are found
+    only in that intersection for one of the two axes, so can't be anywhere else in the other.
+    Nothing is changed; the eliminations are worked out from the tallies when each is reached
+    :param p: the puzzle
+    :param pointing: look for values confined to the intersection within the square, which are
+     removed from the rest of the row or column
+    :param claiming: look for values confined to the intersection within the row or column,
+     which are removed from the rest of the square
+    :return: generator of (list of the intersection box IDs holding the value, its bit, list of
+     (box ID, the bit)), for values that remove something
+    """
+    bits = p.grid.bit
+    mask_values = p.grid.mask_values
+
+    # cycle through the 54 square and row/column intersections (see grid module)
+    for square, cross, intersect, square_rest, cross_rest in p.grid.intersections:
+        # create mask of values in tallies of boxes with unknown values
+        big_mask = 0
+        # boxes with known values
+        count = 0
+
+        # loop through the three boxes in the intersection
+        for k in intersect:
+            if p.box_map[k].value != 0:
+                count += 1
+            else:
+                big_mask |= p.box_map[k].tally
+
+        # if all but one of the boxes have known values, there's nothing to find
+        if count > len(intersect) - 2:
+            continue
+
+        # check if value in big_mask is
+        # (1) found somewhere in other six boxes of square OR row/column
+        # but (2) nowhere in the other six boxes of the other.
+        for k in mask_values[big_mask]:
+            bit = bits[k]
+            # is the value somewhere in other six boxes of square
+            in_square = False
+            # is the value somewhere in other six boxes of row/column
+            in_cross = False
+
+            # check if k is found somewhere else in the square
+            for m in square_rest:
+                if p.box_map[m].tally & bit:
+                    in_square = True
+                    break
+
+            # check if k somewhere else in the row/column
+            for m in cross_rest:
+                if p.box_map[m].tally & bit:
+                    in_cross = True
+                    break
+
+            # if k is elsewhere in square but not row/col, it must be in the intersection and
+            # can be removed from the rest of the square; and the opposite
+            if claiming and in_square and not in_cross:
+                rest = square_rest
+            elif pointing and in_cross and not in_square:
+                rest = cross_rest
+            else:
+                continue
+            cells = [m for m in intersect if p.box_map[m].value == 0 and p.box_map[m].tally & bit]
+            eliminations = [(m, bit) for m in rest if p.box_map[m].value == 0 and p.box_map[m].tally & bit]
+            yield cells, bit, eliminations
+
+
+@timed
 def intersection_check(p):
     """
     advanced method: checks 3-box intersection of a square and either row or column
@@ -131,90 +363,285 @@ def intersection_check(p):
     :param p: the puzzle
     """
     progress = False
+    for cells, bit, eliminations in intersections(p):
+        if remove_eliminations(p, eliminations):
+            progress = True
+    p.method_log.append(["intersection", progress])
 
-    # cycle through the 9 squares
-    for i in range(0, 9):
-        # set of boxes in the square
-        square_boxes = p.axis_map[18 + i].box_set
-
-        # list of the 3 rows and 3 columns that intersect this square
-        crosses = []
-        for j in range(0, 3):
-            # The three rows
-            crosses.append(3 * (i // 3) + j)
-            # The three columns
-            crosses.append(9 + 3 * (i % 3) + j)
-
-        for j in crosses:
-            # set of boxes in the row or column
-            box_set = p.axis_map[j].box_set
-            # Get the three box in common with the square and row/column
-            intersect = square_boxes.intersection(box_set)
-
-            # create set of values in tallies of boxes with unknown values
-            big_set = set()
-            # boxes with known values
-            count = 0
-
-            # loop through the three boxes in the intersection
-            for k in intersect:
-                if p.box_map[k].value != 0:
-                    count += 1
-                else:
-                    big_set = big_set | p.box_map[k].tally
 
-            # if two or three boxes have known values, this function can't provide progress
-            if count > 1:
+def value_places(p):
+    """
+    masks of the places each value is still possible in each row and column
+    :param p: the puzzle
+    :return: tuple of row_places and column_places. row_places[value][row] has bit c set if the
+     value is possible in column c of the row, and column_places[value][column] bit r for row r
+    """
+    size = p.grid.size
+    mask_values = p.grid.mask_values
+    row_places = [[0] * size for value in range(0, size + 1)]
+    column_places = [[0] * size for value in range(0, size + 1)]
+    for key, box in p.box_map.items():
+        if box.value == 0:
+            for value in mask_values[box.tally]:
+                row_places[value][box.row] |= 1 << box.col
+                column_places[value][box.col] |= 1 << box.row
+    return row_places, column_places
+
+
+def fish(p, size):
+    """
+    finds n rows where a value is only possible in the same n columns, or n columns where it
+    is only possible in the same n rows. The value must be in those columns (or rows) of the n
+    rows (or columns), so it can't be in the rest of them. Nothing is changed; the eliminations
+    are worked out from the tallies when each fish is reached
+    :param p: the puzzle
+    :param size: number of rows or columns, 2 for an X-Wing, 3 for a Swordfish, 4 for a Jellyfish
+    :return: generator of (list of the box IDs of the fish, the value's bit, list of (box ID,
+     the bit)), for fish that remove something
+    """
+    n = p.grid.size
+    bits = p.grid.bit
+    popcount = p.grid.popcount
+    mask_values = p.grid.mask_values
+    row_places, column_places = value_places(p)
+
+    for value in range(1, n + 1):
+        bit = bits[value]
+        # rows as the base lines and columns as the cover lines, then the other way round
+        for by_row, places in ((True, row_places[value]), (False, column_places[value])):
+            lines = [(line, mask) for line, mask in enumerate(places) if 2 <= popcount[mask] <= size]
+            if len(lines) < size:
                 continue
 
-            # check if value in big_set is
-            # (1) found somewhere in other six boxes of square OR row/column
-            # but (2) nowhere in the other six boxes of the other.
-            for k in big_set:
-                # is the value somewhere in other six boxes of square
-                in_square = False
-                # is the value somewhere in other six boxes of row/column
-                in_cross = False
-
-                # check if k is found somewhere else in the square
-                for m in (square_boxes - intersect):
-                    if k in p.box_map[m].tally:
-                        in_square = True
-                        break
-
-                # check if k somewhere else in the row/column
-                for m in (box_set - intersect):
-                    if k in p.box_map[m].tally:
-                        in_cross = True
-                        break
-
-                # if k is elsewhere in square but not row/col
-                if in_square and not in_cross:
-                    # Then k must only be in the intersection and can be removed
-                    # from the rest of the square
-                    for m in (square_boxes - intersect):
-                        p.box_map[m].tally.discard(k)
-                        progress = True
-
-                # and the opposite - k is elsewhere in row/col but not in square
-                if not in_square and in_cross:
-                    for m in (box_set - intersect):
-                        progress = True
-                        p.box_map[m].tally.discard(k)
+            for base, cover in find_subsets(lines, size, popcount):
+                cells = []
+                eliminations = []
+                # place k + 1 is value k + 1 in the mask tables
+                for place in mask_values[cover]:
+                    for line in range(0, n):
+                        i = line * n + place - 1 if by_row else (place - 1) * n + line
+                        box = p.box_map[i]
+                        if box.value == 0 and box.tally & bit:
+                            if line in base:
+                                cells.append(i)
+                            else:
+                                eliminations.append((i, bit))
+                if eliminations:
+                    yield cells, bit, eliminations
+
+
+def fish_check(p, size):
+    """
+    removes the values ruled out by each fish of a size
+    :param p: the puzzle
+    :param size: number of rows or columns in the fish
+    :return: True if any values were removed
+    """
+    progress = False
+    for cells, bit, eliminations in fish(p, size):
+        if remove_eliminations(p, eliminations):
+            progress = True
+    return progress
 
-    p.method_log.append(["intersection", progress])
+
+@timed
+def x_wing_check(p):
+    """
+    advanced method: a value only possible in the same two columns of two rows can't be
+    anywhere else in those columns, and the same with rows and columns swapped
+    :param p: the puzzle
+    """
+    p.method_log.append(["x-wing", fish_check(p, 2)])
 
 
-def use_advanced_methods(p):
+@timed
+def swordfish_check(p):
     """
-    Try to solve the puzzle with advanced methods
+    advanced method: an X-Wing with three rows and columns
     :param p: the puzzle
     """
-    method_list = [hidden_tally_pair_check, bare_tally_pair_check, intersection_check]
-    for method in method_list:
-        method(p)
-        basic_solve_attempt(p)
+    p.method_log.append(["swordfish", fish_check(p, 3)])
+
 
-        # if solution or error found, break
-        if p.solved or p.no_solution:
+@timed
+def jellyfish_check(p):
+    """
+    advanced method: an X-Wing with four rows and columns
+    :param p: the puzzle
+    """
+    p.method_log.append(["jellyfish", fish_check(p, 4)])
+
+
+def wing_eliminations(p, seen, z):
+    """
+    the boxes a wing removes z from
+    :param p: the puzzle
+    :param seen: set of the IDs of the boxes sharing an axis with each box of the wing that z could be in
+    :param z: mask of the value z
+    :return: list of (box ID, z), in box order
+    """
+    return [(j, z) for j in sorted(seen) if p.box_map[j].value == 0 and p.box_map[j].tally & z]
+
+
+def xy_wings(p):
+    """
+    finds a box with two values x and y (the pivot) and two boxes sharing an axis with it
+    holding x and z, and y and z. Whichever value the pivot has, one of the other two is z, so
+    z can't be in any box sharing an axis with both of them. Nothing is changed; the
+    eliminations are worked out from the tallies when each wing is reached
+    :param p: the puzzle
+    :return: generator of (list of the pivot and wing box IDs, mask of x, y, and z, list of
+     (box ID, mask of z)), for wings that remove something
+    """
+    popcount = p.grid.popcount
+    peers = p.grid.peers
+    peer_sets = p.grid.peer_sets
+
+    for pivot, box in p.box_map.items():
+        tally = box.tally
+        if box.value != 0 or popcount[tally] != 2:
+            continue
+
+        # boxes with two values sharing one value with the pivot
+        wings = []
+        for j in peers[pivot]:
+            wing = p.box_map[j]
+            if wing.value == 0 and popcount[wing.tally] == 2 and popcount[wing.tally & tally] == 1:
+                wings.append(j)
+
+        for k in range(0, len(wings) - 1):
+            a = wings[k]
+            for b in wings[k + 1:]:
+                tally_a = p.box_map[a].tally
+                tally_b = p.box_map[b].tally
+                z = tally_a & tally_b
+                # the wings share one value not in the pivot, and hold both pivot values between them
+                if popcount[tally_a] == 2 and popcount[tally_b] == 2 and popcount[z] == 1 \
+                        and z & tally == 0 and (tally_a | tally_b) & tally == tally:
+                    # the pivot shares an axis with both wings, but doesn't hold z
+                    eliminations = wing_eliminations(p, peer_sets[a] & peer_sets[b], z)
+                    if eliminations:
+                        yield [pivot, a, b], tally | z, eliminations
+
+
+def xyz_wings(p):
+    """
+    finds a box with three values x, y, and z (the pivot) and two boxes sharing an axis with it
+    holding x and z, and y and z. One of the three is z, so z can't be in any box sharing an
+    axis with all three. Nothing is changed; the eliminations are worked out from the tallies
+    when each wing is reached
+    :param p: the puzzle
+    :return: generator of (list of the pivot and wing box IDs, mask of x, y, and z, list of
+     (box ID, mask of z)), for wings that remove something
+    """
+    popcount = p.grid.popcount
+    peers = p.grid.peers
+    peer_sets = p.grid.peer_sets
+
+    for pivot, box in p.box_map.items():
+        tally = box.tally
+        if box.value != 0 or popcount[tally] != 3:
+            continue
+
+        # boxes with two of the pivot's values
+        wings = []
+        for j in peers[pivot]:
+            wing = p.box_map[j]
+            if wing.value == 0 and popcount[wing.tally] == 2 and wing.tally & ~tally == 0:
+                wings.append(j)
+
+        for k in range(0, len(wings) - 1):
+            a = wings[k]
+            for b in wings[k + 1:]:
+                tally_a = p.box_map[a].tally
+                tally_b = p.box_map[b].tally
+                z = tally_a & tally_b
+                if popcount[z] == 1 and tally_a | tally_b == tally:
+                    eliminations = wing_eliminations(p, peer_sets[pivot] & peer_sets[a] & peer_sets[b], z)
+                    if eliminations:
+                        yield [pivot, a, b], tally, eliminations
+
+
+@timed
+def xy_wing_check(p):
+    """
+    advanced method: a box with two values x and y (the pivot) and two boxes sharing an axis
+    with it holding x and z, and y and z. Whichever value the pivot has, one of the other two
+    is z, so z is removed from every box sharing an axis with both of them
+    :param p: the puzzle
+    """
+    progress = False
+    for cells, mask, eliminations in xy_wings(p):
+        if remove_eliminations(p, eliminations):
+            progress = True
+    p.method_log.append(["xy-wing", progress])
+
+
+@timed
+def xyz_wing_check(p):
+    """
+    advanced method: a box with three values x, y, and z (the pivot) and two boxes sharing an
+    axis with it holding x and z, and y and z. One of the three is z, so z is removed from every
+    box sharing an axis with all three
+    :param p: the puzzle
+    """
+    progress = False
+    for cells, mask, eliminations in xyz_wings(p):
+        if remove_eliminations(p, eliminations):
+            progress = True
+    p.method_log.append(["xyz-wing", progress])
+
+
+# The advanced methods in the order use_advanced_methods tries them: cheapest first, by the time
+# per call main.py --stats reports on the hard and multiple tiers of the benchmark corpus, so
+# reorder them when a method gets faster or slower. The pair checks find most subsets more
+# cheaply, so the general subset checks only run once they have nothing left to find
+ADVANCED_METHODS = [bare_tally_pair_check, xyz_wing_check, xy_wing_check, intersection_check,
+                    hidden_tally_pair_check, x_wing_check, naked_subset_check, swordfish_check,
+                    hidden_subset_check, jellyfish_check]
+
+# The advanced methods used after each guess, unless the puzzle has its own list. Guesses are
+# followed up many times per puzzle, and the fish and subset checks seldom find anything there
+# that saves the time they take
+GUESS_METHODS = [bare_tally_pair_check, xyz_wing_check, xy_wing_check, intersection_check,
+                 hidden_tally_pair_check]
+
+
+def use_advanced_methods(p, methods=None):
+    """
+    Try to solve the puzzle with advanced methods. The cheapest method that might still make
+    progress is run next. A method that removed nothing from the tallies is skipped until
+    some other method changes them, and after a method makes progress only the boxes it
+    changed are followed up with the basic methods. Stops once no method can make progress
+    :param p: the puzzle
+    :param methods: list of advanced methods to use, cheapest first; defaults to
+     p.advanced_methods, or ADVANCED_METHODS if that is None
+    """
+    if methods is None:
+        methods = ADVANCED_METHODS if p.advanced_methods is None else p.advanced_methods
+
+    # removed_count when each method last ran without removing anything
+    idle = {}
+    # while guessing, pending is already recorded for propagate
+    recording = p.pending is not None
+    if not recording:
+        p.pending = []
+
+    while not (p.solved or p.no_solution):
+        method = None
+        for candidate in methods:
+            if idle.get(candidate) != p.removed_count:
+                method = candidate
+                break
+        if method is None:
             break
+
+        removed = p.removed_count
+        method(p)
+        if p.removed_count == removed:
+            idle[method] = removed
+        else:
+            propagate(p)
+
+    if not recording:
+        p.pending = None
@@ -1,26 +1,32 @@
+from candidates import single_value
+from stats import timed
+
+
+@timed
 def lone_tally_check(p):
     """
-    standard evaluation method, checks each boxes tally set to see if there is only
+    standard evaluation method, checks each boxes tally mask to see if there is only
     one possible value left for that box.
     :param p: the puzzle
     """
     # map = p.box_map
     progress = False
+    popcount = p.grid.popcount
 
     # cycle through every box in the puzzle
     for key, box in p.box_map.items():
 
         # Only check boxes with unknown value
         if box.value == 0:
-            # if only one item in tally set, it's the value for the box
-            if len(box.tally) == 1:
-                # get the only value in the tally set
-                value = max(box.tally)
+            # if only one value in tally mask, it's the value for the box
+            if popcount[box.tally] == 1:
+                # get the only value in the tally mask
+                value = single_value(box.tally)
                 # and update the puzzle
                 p.update_new_known(key, value)
                 progress = True
             # if no values left in tally, the puzzle has an error
-            if len(box.tally) == 0:
+            if box.tally == 0:
                 p.no_solution = True
 
                 p.error_description = f'No valid value to put in row {p.box_map[key].row + 1}, ' \
@@ -35,6 +41,7 @@ def lone_tally_check(p):
         p.set_solution_string()
 
 
+@timed
 def only_place_check(p):
     """
     standard evaluation method, checks each axis to see if any values are possible
@@ -42,28 +49,31 @@ def only_place_check(p):
     :param p: the puzzle
     """
     progress = False
+    bits = p.grid.bit
+    unknown_order = p.grid.unknown_order
 
     # Loop through all 27 axes
     for key, axis in p.axis_map.items():
         # If all values in axis are known, skip
-        if len(axis.unknown) == 0:
+        if axis.unknown == 0:
             continue
 
-        box_set = axis.box_set
-        # need to copy because Unknown set can change
-        unknowns = axis.unknown.copy()
+        boxes = axis.boxes
+        # values unknown at the start; the unknown mask can change while looping
+        unknowns = unknown_order[axis.unknown]
 
         # loop through the values not yet known in the axis
         for value in unknowns:
+            bit = bits[value]
             # how many tallies have the value as a possibility
             count = 0
             # box ID for last box where this value was a possibility
             latest = 0
 
             # loop through every box in axis
-            for j in box_set:
-                # if the value of the box is unknown and the tally set contains it
-                if value in p.box_map[j].tally:
+            for j in boxes:
+                # if the value of the box is unknown and the tally mask contains it
+                if p.box_map[j].tally & bit:
                     # increment the count
                     count += 1
                     # record the box ID
@@ -76,7 +86,7 @@ def only_place_check(p):
             if count == 1:
                 p.update_new_known(latest, value)
                 progress = True
-            # the value is found in no tally sets, there's an error in the puzzle
+            # the value is found in no tally masks, there's an error in the puzzle
             if count == 0:
                 p.no_solution = True
                 p.set_final_string()
@@ -114,3 +124,77 @@ def basic_solve_attempt(p):
         # If there's no progress, end attempt
         if p.num_unknown_boxes() == blanks:
             break
+
+
+@timed
+def propagate(p):
+    """
+    event-driven version of the two basic methods: only the boxes in p.pending (those whose
+    tallies shrank) are checked for a lone tally, and only their axes are checked for values
+    with only one place. Reaches the same result as basic_solve_attempt, but the work done is
+    proportional to the changes rather than to full passes over the grid. Nothing is added
+    to the method log.
+    :param p: the puzzle, with p.pending a list of box IDs
+    """
+    pending = p.pending
+    grid = p.grid
+
+    while pending:
+        # axes containing a box that changed
+        axes = set()
+
+        # place values in boxes left with a lone tally
+        while pending:
+            ID = pending.pop()
+            axes.update(grid.box_axes[ID])
+            box = p.box_map[ID]
+            if box.value != 0:
+                continue
+            if box.tally == 0:
+                p.no_solution = True
+                p.error_description = f'No valid value to put in row {box.row + 1}, ' \
+                                      f'column {box.col + 1}'
+                p.set_final_string()
+                del pending[:]
+                return
+            if grid.popcount[box.tally] == 1:
+                # adds the peers whose tallies shrink to pending
+                p.update_new_known(ID, single_value(box.tally))
+
+        # look for values with only one place in the changed axes
+        for key in axes:
+            axis = p.axis_map[key]
+            if axis.unknown == 0:
+                continue
+
+            # values found in at least one tally, and in at least two
+            once = 0
+            twice = 0
+            for j in axis.boxes:
+                tally = p.box_map[j].tally
+                twice |= once & tally
+                once |= tally
+
+            # a value with no place means there's an error in the puzzle
+            if axis.unknown & ~once:
+                p.no_solution = True
+                dims = ['row', 'column', 'big square']
+                value = grid.mask_values[axis.unknown & ~once][0]
+                p.error_description = f'No place for {value} in {dims[axis.dimension]} ' \
+                                      f'{axis.index + 1}'
+                p.set_final_string()
+                del pending[:]
+                return
+
+            for value in grid.mask_values[axis.unknown & ~twice]:
+                bit = grid.bit[value]
+                for j in axis.boxes:
+                    box = p.box_map[j]
+                    # skip if an earlier placement in this loop already used the box
+                    if box.tally & bit and box.value == 0:
+                        p.update_new_known(j, value)
+                        break
+
+    if p.num_unknown_boxes() == 0:
+        p.solved = True
+        p.set_solution_string()
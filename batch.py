@@ -0,0 +1,174 @@
+import functools
+import itertools
+import multiprocessing
+import os
+import time
+from loader import iter_puzzles
+from solver import solve_puzzle, puzzle_result
+from stats import MethodStats
+
+
+def solve_one(item, time_limit=None, max_guesses=None):
+    """
+    Solve a single puzzle and summarize the result. Runs in the worker processes, so it
+    returns a small dictionary rather than the Puzzle itself
+    :param item: tuple of the puzzle name, puzzle string, and solution string or "0"
+    :param time_limit: seconds to allow for guessing, or None for no limit
+    :param max_guesses: number of guesses to allow, or None for no limit
+    :return: dictionary with the puzzle name, puzzle string, given solution, status,
+     solution found, difficulty, error description, number of guesses, summary of the
+     methods used, seconds taken, and the work done by each method from MethodStats.as_dict
+    """
+    name, puzzle_string, given = item
+    stats = MethodStats()
+    start = time.perf_counter()
+    p = solve_puzzle(puzzle_string, name, stats=stats, time_limit=time_limit, max_guesses=max_guesses)
+    elapsed = time.perf_counter() - start
+    result = {'name': name,
+              'puzzle': puzzle_string,
+              'given': given}
+    result.update(puzzle_result(p))
+    result['time'] = round(elapsed, 6)
+    result['stats'] = stats.as_dict()
+    return result
+
+
+def lookup_one(item, store):
+    """
+    Find the result for a puzzle in a result store, in the same form as solve_one
+    :param item: tuple of the puzzle name, puzzle string, and solution string or "0"
+    :param store: ResultStore of earlier results
+    :return: dictionary as from solve_one, or None if the puzzle isn't stored
+    """
+    name, puzzle_string, given = item
+    start = time.perf_counter()
+    stored = store.get(puzzle_string)
+    if stored is None:
+        return None
+    result = {'name': name,
+              'puzzle': puzzle_string,
+              'given': given}
+    result.update(stored)
+    result['time'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def solve_stream(items, workers=None, chunksize=64, store=None, time_limit=None, max_guesses=None, pool=None):
+    """
+    Solve puzzles from any iterable over a pool of worker processes, yielding results as they
+    are ready. Puzzles are read from items a window at a time, so memory use doesn't grow
+    with the number of puzzles. If a result store is given, puzzles already in it are looked
+    up rather than solved, and the results of the others are put in it. The store is only
+    used from this process, never from the workers. Puzzles that run out of time or guesses
+    aren't put in the store
+    :param items: iterable of (name, puzzle string, solution string or "0") tuples
+    :param workers: number of worker processes, defaults to the number of cores
+    :param chunksize: puzzles sent to a worker at a time
+    :param store: optional ResultStore of earlier results
+    :param time_limit: seconds to allow for each puzzle, or None for no limit
+    :param max_guesses: number of guesses to allow for each puzzle, or None for no limit
+    :param pool: multiprocessing Pool of worker processes to use, so that a caller solving
+     many streams can start it once; None to start one for the call
+    :return: generator of results from solve_one, in the same order as items
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    solve = functools.partial(solve_one, time_limit=time_limit, max_guesses=max_guesses)
+
+    # no pool needed for a single worker
+    if pool is None and workers == 1:
+        for item in items:
+            result = lookup_one(item, store) if store is not None else None
+            if result is None:
+                result = solve(item)
+                if store is not None and result['status'] != 'budget_exceeded':
+                    store.put(result['puzzle'], result)
+            yield result
+        return
+
+    # enough puzzles to keep every worker busy
+    window = workers * chunksize * 4
+    items = iter(items)
+
+    if pool is None:
+        with multiprocessing.Pool(workers) as pool:
+            yield from solve_stream(items, workers, chunksize, store, time_limit, max_guesses, pool)
+        return
+
+    while True:
+        batch = list(itertools.islice(items, window))
+        if len(batch) == 0:
+            break
+
+        if store is None:
+            yield from pool.imap(solve, batch, chunksize)
+            continue
+
+        # only the puzzles not in the store go to the workers
+        known = [lookup_one(item, store) for item in batch]
+        unknown = [item for item, result in zip(batch, known) if result is None]
+        solved = pool.imap(solve, unknown, chunksize)
+        for result in known:
+            if result is None:
+                result = next(solved)
+                if result['status'] != 'budget_exceeded':
+                    store.put(result['puzzle'], result)
+            yield result
+
+
+def solve_batch(items, workers=None, chunksize=None, store=None):
+    """
+    Solve a list of puzzles over a pool of worker processes
+    :param items: list of (name, puzzle string, solution string or "0") tuples
+    :param workers: number of worker processes, defaults to the number of cores
+    :param chunksize: puzzles sent to a worker at a time, defaults to about four chunks per worker
+    :param store: optional ResultStore of earlier results
+    :return: list of results from solve_one, in the same order as items
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if chunksize is None:
+        chunksize = max(1, len(items) // (workers * 4))
+
+    return list(solve_stream(items, workers, chunksize, store))
+
+
+def check_result(result):
+    """
+    compare a result with the solution provided with the puzzle
+    :param result: dictionary from solve_one
+    :return: 'PASS' if the solution found matches, 'FAIL' if not, '' if no solution was provided
+    """
+    if result['given'] == "0":
+        return ''
+    if result['status'] == 'solved' and result['solution'] == result['given']:
+        return 'PASS'
+    return 'FAIL'
+
+
+def name_puzzles(file_name, puzzles):
+    """
+    Name each puzzle after its file and position, as main.py does
+    :param file_name: name of the file the puzzles came from
+    :param puzzles: iterable of [puzzle string, solution string or "0"] lists
+    :return: generator of (name, puzzle string, solution string or "0") tuples
+    """
+    for num, row in enumerate(puzzles):
+        yield file_name + "-" + str(num + 1), row[0], row[1]
+
+
+def solve_file(path, workers=None, chunksize=64, store=None):
+    """
+    Solve every puzzle in a puzzle file over a pool of worker processes, reading the file
+    as the puzzles are solved
+    :param path: path to the puzzle file
+    :param workers: number of worker processes, defaults to the number of cores
+    :param chunksize: puzzles sent to a worker at a time
+    :param store: optional ResultStore of earlier results
+    :return: generator of results from solve_one, in file order
+    """
+    items = name_puzzles(os.path.basename(path), iter_puzzles(path))
+    return solve_stream(items, workers, chunksize, store)
+
@@ -0,0 +1,251 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from loader import read_puzzle_file
+from solver import solve_puzzle, puzzle_status, BACKENDS
+from guess_methods import BRANCHING, VALUE_ORDERS
+
+# The benchmark corpus is one file per tier in the benchmarks folder. Puzzles with one
+# solution are stored with it, so the solutions found can be checked. The large tier is of
+# 16x16 and 25x25 puzzles with many blanks
+TIERS = ['easy', 'medium', 'hard', 'seventeen', 'multiple', 'invalid', 'large']
+
+# status every puzzle in a tier should get
+TIER_STATUS = {'easy': 'solved',
+               'medium': 'solved',
+               'hard': 'solved',
+               'seventeen': 'solved',
+               'multiple': 'multiple_solution',
+               'invalid': 'no_solution',
+               'large': 'multiple_solution'}
+
+CORPUS_DIR = "benchmarks"
+BASELINE_PATH = os.path.join(CORPUS_DIR, "baseline.json")
+
+
+def compare_guess_strategies(puzzles):
+    """
+    Solve the same puzzles with each way of guessing, counting the guesses made
+    :param puzzles: list of [puzzle string, solution string or "0"] lists
+    :return: list of dictionaries, one per branching and value order, with the number of
+     puzzles solved correctly, guesses (nodes of the search), and seconds taken
+    """
+    rows = []
+    for branching in BRANCHING:
+        for value_order in VALUE_ORDERS:
+            correct = 0
+            nodes = 0
+            start = time.perf_counter()
+            for puzzle_string, given in puzzles:
+                p = solve_puzzle(puzzle_string, "puzzle", branching=branching, value_order=value_order)
+                nodes += p.guess_count
+                if p.solved and given in ["0", p.solution]:
+                    correct += 1
+            rows.append({'branching': branching,
+                         'value_order': value_order,
+                         'correct': correct,
+                         'nodes': nodes,
+                         'time': time.perf_counter() - start})
+    return rows
+
+
+def percentile(values, fraction):
+    """
+    nearest-rank percentile of a list of numbers
+    :param values: the numbers, in any order
+    :param fraction: 0.5 for the median, 0.99 for the 99th percentile
+    :return: the percentile, or 0 if there are no numbers
+    """
+    if len(values) == 0:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, int(fraction * len(ordered) + 0.999999))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def benchmark_tier(puzzles, expected_status, repeat=5, **options):
+    """
+    Time solving each puzzle of a tier, then solve them all again to find the peak memory used
+    :param puzzles: list of [puzzle string, solution string or "0"] lists
+    :param expected_status: status each puzzle should get from puzzle_status
+    :param repeat: times each puzzle is solved; its fastest time is kept
+    :param options: keyword arguments for solve_puzzle, such as backend or branching
+    :return: dictionary with the number of puzzles, the number whose status (and solution, if
+     one is given) are right, puzzles per second, median and 99th percentile milliseconds per
+     puzzle, total guesses, and peak kilobytes allocated while solving
+    """
+    latencies = []
+    correct = 0
+    guesses = 0
+    # garbage collection runs at times that depend on everything allocated before, so collect
+    # now and keep it from running in the middle of the timings
+    gc.collect()
+    gc.disable()
+    for puzzle_string, given in puzzles:
+        best = None
+        for _ in range(0, repeat):
+            start = time.perf_counter()
+            p = solve_puzzle(puzzle_string, "puzzle", **options)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        latencies.append(best)
+        guesses += p.guess_count
+        if puzzle_status(p) == expected_status and given in ["0", p.solution]:
+            correct += 1
+    gc.enable()
+
+    # tracing allocations slows solving down, so memory is measured on a separate pass
+    tracemalloc.start()
+    for puzzle_string, given in puzzles:
+        solve_puzzle(puzzle_string, "puzzle", **options)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {'puzzles': len(puzzles),
+            'correct': correct,
+            'per_second': round(len(puzzles) / total, 1) if total else 0,
+            'p50_ms': round(1000 * percentile(latencies, 0.5), 3),
+            'p99_ms': round(1000 * percentile(latencies, 0.99), 3),
+            'guesses': guesses,
+            'peak_kb': round(peak / 1024, 1)}
+
+
+def run_suite(corpus_dir=CORPUS_DIR, repeat=5, **options):
+    """
+    Benchmark every tier of the corpus
+    :param corpus_dir: folder with a TIER.txt puzzle file for each tier
+    :param repeat: times each puzzle is solved; its fastest time is kept
+    :param options: keyword arguments for solve_puzzle, such as backend or branching
+    :return: dictionary with the Python version, the options, and the results of
+     benchmark_tier for each tier
+    """
+    # warm up first, so the first tier isn't timed on a cold interpreter
+    for puzzle_string, given in read_puzzle_file(os.path.join(corpus_dir, TIERS[0] + ".txt")):
+        solve_puzzle(puzzle_string, "puzzle", **options)
+
+    tiers = {}
+    for tier in TIERS:
+        puzzles = read_puzzle_file(os.path.join(corpus_dir, tier + ".txt"))
+        tiers[tier] = benchmark_tier(puzzles, TIER_STATUS[tier], repeat, **options)
+    return {'python': platform.python_version(),
+            'options': options,
+            'tiers': tiers}
+
+
+def compare_to_baseline(results, baseline, tolerance=0.5):
+    """
+    Find the ways the results are worse than a baseline. Correct counts and guesses don't
+    depend on the machine, so any change is reported; speed and memory are allowed to be
+    worse by the tolerance, to allow for noise
+    :param results: dictionary from run_suite
+    :param baseline: dictionary from run_suite for an earlier version
+    :param tolerance: fraction speed and memory may be worse by
+    :return: list of descriptions of regressions, empty if there are none
+    """
+    regressions = []
+    for tier, base in baseline['tiers'].items():
+        new = results['tiers'].get(tier)
+        if new is None:
+            continue
+        if new['correct'] < base['correct']:
+            regressions.append(f"{tier}: {new['correct']} correct, was {base['correct']}")
+        if new['guesses'] > base['guesses']:
+            regressions.append(f"{tier}: {new['guesses']} guesses, was {base['guesses']}")
+        if new['per_second'] < base['per_second'] * (1 - tolerance):
+            regressions.append(f"{tier}: {new['per_second']} puzzles/s, was {base['per_second']}")
+        if new['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{tier}: p99 {new['p99_ms']} ms, was {base['p99_ms']}")
+        if new['peak_kb'] > base['peak_kb'] * (1 + tolerance):
+            regressions.append(f"{tier}: peak {new['peak_kb']} KB, was {base['peak_kb']}")
+    return regressions
+
+
+def format_suite(results):
+    """
+    The results of run_suite as a table
+    :return: the table as a string, one line per tier after a header line
+    """
+    lines = [f"{'tier':<10}{'puzzles':>8}{'correct':>8}{'per sec':>10}{'p50 ms':>10}{'p99 ms':>10}"
+             f"{'guesses':>9}{'peak KB':>10}"]
+    for tier, row in results['tiers'].items():
+        lines.append(f"{tier:<10}{row['puzzles']:>8}{row['correct']:>8}{row['per_second']:>10}"
+                     f"{row['p50_ms']:>10}{row['p99_ms']:>10}{row['guesses']:>9}{row['peak_kb']:>10}")
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    """
+    Parse the command line options
+    :param argv: list of command line arguments, not including the program name
+    :return: argparse namespace of the options
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the solver.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    strategies = commands.add_parser("strategies", help="compare the ways of guessing on a puzzle file")
+    strategies.add_argument("file", nargs="?", default="puzzles/morehardpuzzles.txt",
+                            help="puzzle file (default puzzles/morehardpuzzles.txt)")
+
+    suite = commands.add_parser("suite", help="time each tier of the benchmark corpus and compare with "
+                                              "the baseline; exits with 1 if anything got worse")
+    suite.add_argument("--corpus", default=CORPUS_DIR, help=f"corpus folder (default {CORPUS_DIR})")
+    suite.add_argument("--baseline", default=BASELINE_PATH, help=f"baseline file (default {BASELINE_PATH})")
+    suite.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    suite.add_argument("--tolerance", type=float, default=0.5,
+                       help="fraction speed and memory may be worse than the baseline (default 0.5)")
+    suite.add_argument("--repeat", type=int, default=5,
+                       help="times each puzzle is solved, keeping the fastest (default 5)")
+    suite.add_argument("--backend", choices=BACKENDS, default="methods")
+    suite.add_argument("--branching", choices=BRANCHING, default="first")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    """
+    compare the ways of guessing on a puzzle file, or run the benchmark suite
+    :param argv: list of command line arguments, not including the program name
+    :return: exit status, 1 if the suite found a regression
+    """
+    args = parse_args(argv)
+
+    if args.command == "strategies":
+        puzzles = read_puzzle_file(args.file)
+        print(f"{len(puzzles)} puzzles from {args.file}")
+        print(f"{'branching':<10}{'value order':<20}{'correct':>8}{'nodes':>10}{'seconds':>10}")
+        for row in compare_guess_strategies(puzzles):
+            print(f"{row['branching']:<10}{row['value_order']:<20}{row['correct']:>8}"
+                  f"{row['nodes']:>10}{row['time']:>10.3f}")
+        return 0
+
+    results = run_suite(args.corpus, args.repeat, backend=args.backend, branching=args.branching)
+    print(format_suite(results))
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to make one")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    if len(regressions) == 0:
+        print("No regressions against " + args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from canonical import canonicalize, recanonicalize, uncanonicalize
+from solver import solve_puzzle, puzzle_status
+
+
+def canonical_form(puzzle_string):
+    """
+    The canonical form of a puzzle, for lookup_form and store_form. Finding it takes about a
+    millisecond, so a caller that mustn't be held up, such as an event loop, can find it
+    elsewhere, in a worker process
+    :param puzzle_string: puzzle string
+    :return: tuple from canonical.canonicalize, or None if the puzzle has no canonical form
+    """
+    try:
+        return canonicalize(puzzle_string)
+    except ValueError:
+        return None
+
+
+class SolutionCache:
+    """
+    Least-recently-used cache of puzzle results. Results are stored under the canonical form of
+    the puzzle (see canonical module), so a rotated, transposed, relabelled, or band/stack permuted
+    copy of a cached puzzle is answered without solving, with the solution mapped back to the
+    caller's orientation. Exact repeats are answered from a second cache keyed by the puzzle
+    string itself, which also skips finding the canonical form. Puzzles with no canonical form
+    (other grid sizes than 9x9, fewer than 17 clues, or a value twice in an axis) are only kept
+    in the exact cache.
+    A result is a dictionary with at least the status and solution; anything else in it, such
+    as the difficulty, is kept as it is.
+    """
+
+    def __init__(self, maxsize=10000):
+        # most results kept in each of the two caches
+        self.maxsize = maxsize
+        # canonical puzzle string -> result with the solution in canonical form
+        self.canonical = OrderedDict()
+        # puzzle string -> result
+        self.exact = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # the last puzzle canonicalized and its canonical form, so a miss followed by a store
+        # only finds the canonical form once
+        self.last = (None, None)
+
+    def _remember(self, entries, key, result):
+        """
+        Add a result to one of the caches, dropping the least recently used if over size
+        """
+        entries[key] = result
+        entries.move_to_end(key)
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def _canonicalize(self, puzzle_string):
+        """
+        canonical_form, remembering the last puzzle
+        """
+        if self.last[0] != puzzle_string:
+            self.last = (puzzle_string, canonical_form(puzzle_string))
+        return self.last[1]
+
+    def lookup(self, puzzle_string):
+        """
+        Find the result for a puzzle or any puzzle equivalent to it
+        :param puzzle_string: 81-digit puzzle string
+        :return: result dictionary, or None if not cached. The dictionary is the caller's own,
+         so changing it doesn't change the cache
+        """
+        result = self.lookup_exact(puzzle_string)
+        if result is None:
+            result = self.lookup_form(puzzle_string, self._canonicalize(puzzle_string))
+        return result
+
+    def lookup_exact(self, puzzle_string):
+        """
+        Find the result for a puzzle seen before as it is, without finding its canonical form.
+        Only hits are counted, since a miss here can still be a hit in lookup_form
+        :param puzzle_string: 81-digit puzzle string
+        :return: result dictionary of the caller's own, or None if not cached
+        """
+        stored = self.exact.get(puzzle_string)
+        if stored is None:
+            return None
+        self.exact.move_to_end(puzzle_string)
+        self.hits += 1
+        return dict(stored)
+
+    def lookup_form(self, puzzle_string, form):
+        """
+        Find the result for a puzzle equivalent to one seen before, given its canonical form
+        :param puzzle_string: 81-digit puzzle string
+        :param form: tuple from canonical_form for the puzzle, or None if it has no canonical form
+        :return: result dictionary of the caller's own, or None if not cached
+        """
+        if form is None:
+            self.misses += 1
+            return None
+        canonical, source, labels = form
+        stored = self.canonical.get(canonical)
+        if stored is None:
+            self.misses += 1
+            return None
+
+        self.canonical.move_to_end(canonical)
+        self.hits += 1
+        result = dict(stored)
+        if stored['solution']:
+            result['solution'] = uncanonicalize(stored['solution'], source, labels)
+        self._remember(self.exact, puzzle_string, result)
+        return dict(result)
+
+    def store(self, puzzle_string, result):
+        """
+        Add the result for a puzzle to the cache
+        :param puzzle_string: 81-digit puzzle string
+        :param result: dictionary with the status, solution, and difficulty
+        """
+        self.store_form(puzzle_string, result, self._canonicalize(puzzle_string))
+
+    def store_form(self, puzzle_string, result, form):
+        """
+        Add the result for a puzzle to the cache, given its canonical form
+        :param puzzle_string: 81-digit puzzle string
+        :param result: dictionary with the status, solution, and difficulty
+        :param form: tuple from canonical_form for the puzzle, or None if it has no canonical form
+        """
+        if form is not None:
+            canonical, source, labels = form
+            stored = dict(result)
+            if result['solution']:
+                # the solution rearranged the way the puzzle was to get its canonical form
+                stored['solution'] = recanonicalize(result['solution'], source, labels)
+            self._remember(self.canonical, canonical, stored)
+        self._remember(self.exact, puzzle_string, dict(result))
+
+    def solve(self, puzzle_string, puzzle_name="puzzle"):
+        """
+        Return the cached result for a puzzle, solving it and caching the result if not found
+        :param puzzle_string: 81-digit puzzle string
+        :param puzzle_name: the name for the puzzle if it needs solving
+        :return: result dictionary
+        """
+        result = self.lookup(puzzle_string)
+        if result is None:
+            p = solve_puzzle(puzzle_string, puzzle_name)
+            result = {'status': puzzle_status(p),
+                      'solution': p.solution,
+                      'difficulty': p.difficulty}
+            self.store(puzzle_string, result)
+        return result
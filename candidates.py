@@ -0,0 +1,116 @@
+# Candidate values for a box (its tally) and the values not yet known in an axis are
+# stored as integers with a bit per value: bit (v - 1) is set when value v is still possible.
+# The tables below are for the nine values of a standard 9x9 grid; candidate_tables gives the
+# same tables for grids of other sizes.
+
+# mask with all nine values possible
+ALL_VALUES = 0x1FF
+
+# BIT[v] is the mask for the single value v; BIT[0] is 0 so unknown boxes have no bit
+BIT = tuple([0] + [1 << (v - 1) for v in range(1, 10)])
+
+# number of values in each of the 512 possible masks
+POPCOUNT = tuple(bin(mask).count('1') for mask in range(512))
+
+# the values in each of the 512 possible masks, in ascending order
+MASK_VALUES = tuple(tuple(v for v in range(1, 10) if mask & BIT[v]) for mask in range(512))
+
+
+def _set_copy_order(mask):
+    """
+    order the values of a mask come out of a copy of the set-based axis unknowns
+    (a full set of nine values with the missing values discarded)
+    :param mask: candidate mask
+    :return: tuple of values in that order
+    """
+    unknown = {1, 2, 3, 4, 5, 6, 7, 8, 9}
+    for v in range(1, 10):
+        if not mask & BIT[v]:
+            unknown.discard(v)
+    return tuple(unknown.copy())
+
+
+# the values in each mask in the order only_place_check has always visited them,
+# which keeps the method log identical to the set-based version of the solver
+UNKNOWN_ORDER = tuple(_set_copy_order(mask) for mask in range(512))
+
+
+def mask_of(values):
+    """
+    build a candidate mask from an iterable of values
+    :param values: values from 1 to 9
+    :return: mask with the bit for each value set
+    """
+    mask = 0
+    for value in values:
+        mask |= BIT[value]
+    return mask
+
+
+def values_of(mask):
+    """
+    set of the values in a candidate mask
+    :param mask: candidate mask
+    :return: set of values from 1 to 9
+    """
+    return set(MASK_VALUES[mask])
+
+
+def single_value(mask):
+    """
+    the value of a mask containing exactly one value
+    :param mask: candidate mask with a single bit set
+    :return: value from 1 to 9
+    """
+    return mask.bit_length()
+
+
+# characters for the values in puzzle strings: digits up to 9, then letters from A for 10
+# up to P for 25; '0' or '.' for a blank box
+DIGITS = "0123456789ABCDEFGHIJKLMNOP"
+
+# value of each character allowed in a puzzle string
+CHARACTER_VALUES = dict([(ch, v) for v, ch in enumerate(DIGITS)] +
+                        [(ch.lower(), v) for v, ch in enumerate(DIGITS) if v > 9] + [('.', 0)])
+
+
+class MaskTable(dict):
+    """
+    A table indexed by candidate mask like POPCOUNT and MASK_VALUES, but filled in as masks
+    are looked up, for grids with too many values for a table of every mask (2 ** 25 masks
+    for 25 values)
+    """
+
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, mask):
+        result = self[mask] = self.function(mask)
+        return result
+
+
+def candidate_tables(size):
+    """
+    The candidate tables for a grid with the given number of values
+    :param size: number of values, 9 for a standard grid
+    :return: tuple of the mask with all values possible, and the BIT, POPCOUNT, MASK_VALUES, and
+     UNKNOWN_ORDER tables for that many values
+    """
+    if size == 9:
+        return ALL_VALUES, BIT, POPCOUNT, MASK_VALUES, UNKNOWN_ORDER
+
+    bit = tuple([0] + [1 << (v - 1) for v in range(1, size + 1)])
+
+    def mask_values(mask):
+        values = []
+        while mask:
+            low = mask & -mask
+            values.append(low.bit_length())
+            mask ^= low
+        return tuple(values)
+
+    popcount = MaskTable(lambda mask: bin(mask).count('1'))
+    values = MaskTable(mask_values)
+    # only 9x9 grids keep the order of the set-based solver
+    return (1 << size) - 1, bit, popcount, values, values
@@ -0,0 +1,254 @@
+import itertools
+from candidates import CHARACTER_VALUES
+from grid import AXIS_BOXES, MIN_CLUES
+
+# Puzzles that differ only by symmetries which preserve sudoku rules have the same solutions,
+# rearranged the same way. The symmetries are transposing the grid, reordering the three bands
+# of rows or three stacks of columns, reordering the rows within a band or columns within
+# a stack, and relabelling the digits. The canonical form of a puzzle is the smallest
+# 81-digit string, blanks as '0', that these symmetries can turn it into. Only puzzles that
+# could have one solution, with at least 17 clues and no value twice in an axis, are given
+# canonical forms.
+
+# the three rows of each band, which are also the three columns of each stack
+BAND_LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8))
+
+
+def _next_lines(chosen):
+    """
+    rows (or columns) that may come next in a reordering, given those already placed
+    :param chosen: tuple of the rows already placed, in order
+    :return: list of rows that keep bands together
+    """
+    # first row of a band: any row from a band not used yet
+    if len(chosen) % 3 == 0:
+        used = {line // 3 for line in chosen}
+        return [line for band in range(3) if band not in used for line in BAND_LINES[band]]
+    # otherwise the rows left in the current band
+    band = chosen[-1] // 3
+    return [line for line in BAND_LINES[band] if line not in chosen]
+
+
+def _check(grid):
+    """
+    Make sure a puzzle can be a proper puzzle before looking for its canonical form, which takes
+    much longer for puzzles with few clues
+    :param grid: the grid as a list of values
+    :raises ValueError: if the puzzle has fewer than 17 clues or a value twice in an axis
+    """
+    clues = sum(1 for value in grid if value != 0)
+    if clues < MIN_CLUES[9]:
+        raise ValueError(f"Puzzle has {clues} clues; valid puzzles have at least {MIN_CLUES[9]}")
+    for boxes in AXIS_BOXES:
+        values = [grid[i] for i in boxes if grid[i] != 0]
+        if len(set(values)) != len(values):
+            raise ValueError("Puzzle has a value twice in a row, column, or square")
+
+
+def _place_row(row, columns, labels, next_label):
+    """
+    The smallest a row can be made by reordering the columns within each group of columns
+    that are still interchangeable. Within a group, blanks come first, then the digits already
+    labelled, smallest label first, then the new digits, which get the next labels in whatever
+    order they are put
+    :param row: the values of the row
+    :param columns: tuple of groups of interchangeable columns, in order
+    :param labels: label of each digit 0 to 9 so far, 0 for digits not labelled yet
+    :param next_label: the label for the next new digit
+    :return: tuple of the row as labels, the groups split by the row with None for each column
+     of a new digit, and a list of (index, columns) for the new digits of each group
+    """
+    out = []
+    groups = []
+    fresh_groups = []
+    label = next_label
+    for group in columns:
+        # most groups are down to one column after the first few rows
+        if len(group) == 1:
+            value = row[group[0]]
+            if value == 0 or labels[value] != 0:
+                out.append(labels[value])
+                groups.append(group)
+            else:
+                out.append(label)
+                label += 1
+                fresh_groups.append((len(groups), group))
+                groups.append(None)
+            continue
+
+        blanks = tuple(c for c in group if row[c] == 0)
+        known = sorted((labels[row[c]], c) for c in group if row[c] != 0 and labels[row[c]] != 0)
+        fresh = [c for c in group if row[c] != 0 and labels[row[c]] == 0]
+        out.extend([0] * len(blanks))
+        out.extend(value for value, c in known)
+        out.extend(range(label, label + len(fresh)))
+        label += len(fresh)
+        # blank columns can still be swapped; the others can't
+        if blanks:
+            groups.append(blanks)
+        groups.extend((c,) for value, c in known)
+        if fresh:
+            fresh_groups.append((len(groups), fresh))
+            groups.extend([None] * len(fresh))
+    return out, groups, fresh_groups
+
+
+def _orderings(row, groups, fresh_groups, labels, next_label):
+    """
+    every order of the new digits of a row placed by _place_row, each labelling them differently
+    :return: generator of (columns, labels, next label) states
+    """
+    for orders in itertools.product(*(itertools.permutations(fresh) for index, fresh in fresh_groups)):
+        columns = list(groups)
+        new_labels = labels[:]
+        label = next_label
+        for (index, fresh), order in zip(fresh_groups, orders):
+            for k, c in enumerate(order):
+                columns[index + k] = (c,)
+                new_labels[row[c]] = label
+                label += 1
+        yield tuple(columns), new_labels, label
+
+
+def _first_rows(grids):
+    """
+    Every choice of first row and stack order that gives the smallest first row. All the digits
+    in a row are different, so relabelling always turns its clues into 1, 2, 3... in order;
+    the smallest first row is the one with the most blanks in front, which means the stacks
+    with the most blanks first and the blanks first within each stack
+    :param grids: the grid as a list of values, and its transpose
+    :return: list of (transposed, rows, columns, labels, next label) states
+    """
+    # blanks in each stack of each row, most first; the most blanks up front is best
+    best = None
+    starts = []
+    for transposed in (0, 1):
+        for r in range(0, 9):
+            row = grids[transposed][r * 9: r * 9 + 9]
+            blanks = sorted((sum(1 for c in stack if row[c] == 0) for stack in BAND_LINES), reverse=True)
+            if best is None or blanks > best:
+                best = blanks
+                starts = []
+            if blanks == best:
+                starts.append((transposed, r))
+
+    states = []
+    for transposed, r in starts:
+        row = grids[transposed][r * 9: r * 9 + 9]
+        blanks = [sum(1 for c in stack if row[c] == 0) for stack in BAND_LINES]
+        for stack_order in itertools.permutations(range(0, 3)):
+            if [blanks[stack] for stack in stack_order] != best:
+                continue
+            # each stack's columns can be in any order until the row is placed
+            columns = tuple(BAND_LINES[stack] for stack in stack_order)
+            out, groups, fresh_groups = _place_row(row, columns, [0] * 10, 1)
+            for columns, labels, next_label in _orderings(row, groups, fresh_groups, [0] * 10, 1):
+                states.append((transposed, (r,), columns, labels, next_label))
+    return states
+
+
+def canonicalize(puzzle_string):
+    """
+    Find the canonical form of a puzzle and the symmetry that turns the puzzle into it. Rows are
+    placed one at a time, keeping every partial arrangement that gives the smallest string so
+    far. Columns that have been blank in every row placed are kept together as a group rather
+    than tried in every order, so puzzles with many blanks don't multiply the arrangements
+    :param puzzle_string: 81-digit puzzle string, blanks as '0'
+    :return: tuple of
+    - the canonical 81-digit string
+    - tuple of 81 box IDs, the box of the puzzle that ends up in each box of the canonical form
+    - list of the canonical label for each digit 0 to 9, 0 for digits not in the puzzle
+    :raises ValueError: if the puzzle has fewer than 17 clues or a value twice in an axis
+    """
+    if len(puzzle_string) != 81:
+        raise ValueError("Canonical forms are only found for 9x9 puzzles")
+    grid = [CHARACTER_VALUES[ch] for ch in puzzle_string]
+    _check(grid)
+    grids = (grid, [grid[c * 9 + r] for r in range(0, 9) for c in range(0, 9)])
+
+    states = _first_rows(grids)
+
+    # add the remaining rows one at a time
+    for k in range(1, 9):
+        best = None
+        survivors = []
+        for transposed, rows, columns, labels, next_label in states:
+            values = grids[transposed]
+            for r in _next_lines(rows):
+                row = values[r * 9: r * 9 + 9]
+                out, groups, fresh_groups = _place_row(row, columns, labels, next_label)
+                if best is not None and out > best:
+                    continue
+                if best is None or out < best:
+                    best = out
+                    survivors = []
+                survivors.append((transposed, rows + (r,), row, groups, fresh_groups, labels, next_label))
+
+        # only the arrangements giving the smallest string so far are kept, and only one of
+        # those with the same rows placed in another order (rows with the same values, such as
+        # blank rows) and the same columns and labels, since the rest of the string is the same
+        states = []
+        seen = set()
+        for transposed, rows, row, groups, fresh_groups, labels, next_label in survivors:
+            for columns, new_labels, label in _orderings(row, groups, fresh_groups, labels, next_label):
+                key = (transposed, frozenset(rows), rows[-1] // 3, columns, tuple(new_labels))
+                if key not in seen:
+                    seen.add(key)
+                    states.append((transposed, rows, columns, new_labels, label))
+
+    # any states left give the same string; use the first, with any columns blank in every row
+    # in order
+    transposed, rows, columns, labels, next_label = states[0]
+    columns = [c for group in columns for c in group]
+    if transposed:
+        source = tuple(c * 9 + r for r in rows for c in columns)
+    else:
+        source = tuple(r * 9 + c for r in rows for c in columns)
+    canonical = "".join(str(labels[grid[i]]) for i in source)
+    return canonical, source, labels
+
+
+def complete_labels(labels):
+    """
+    Give the digits missing from a puzzle the labels left over, in ascending order, so that
+    solutions can be relabelled too
+    :param labels: digit labels from canonicalize
+    :return: list of the label for each digit 0 to 9
+    """
+    complete = list(labels)
+    unused = [label for label in range(1, 10) if label not in labels]
+    for digit in range(1, 10):
+        if complete[digit] == 0:
+            complete[digit] = unused.pop(0)
+    return complete
+
+
+def recanonicalize(solution, source, labels):
+    """
+    Rearrange and relabel a solution of a puzzle the way canonicalize did the puzzle
+    :param solution: 81-digit solution of the original puzzle
+    :param source: box IDs from canonicalize
+    :param labels: digit labels from canonicalize
+    :return: 81-digit solution of the canonical form
+    """
+    labels = complete_labels(labels)
+    return "".join(str(labels[int(solution[i])]) for i in source)
+
+
+def uncanonicalize(canonical_solution, source, labels):
+    """
+    Turn a solution of the canonical form back into a solution of the original puzzle
+    :param canonical_solution: 81-digit solution of the canonical form
+    :param source: box IDs from canonicalize
+    :param labels: digit labels from canonicalize
+    :return: 81-digit solution of the original puzzle
+    """
+    # digit for each label
+    digits = [0] * 10
+    for digit, label in enumerate(complete_labels(labels)):
+        digits[label] = digit
+
+    solution = [''] * 81
+    for k, i in enumerate(source):
+        solution[i] = str(digits[int(canonical_solution[k])])
+    return "".join(solution)
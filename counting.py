@@ -0,0 +1,163 @@
+from candidates import CHARACTER_VALUES
+from grid import grid_for
+
+# Counting solutions only needs to know which values each axis already has, so instead of
+# a Puzzle this keeps a mask of the values used in each of the 27 axes (3N for a grid of size N)
+# and the value bit in each box. Boxes with only one possible value and values with only one place in an axis are
+# filled in before guessing, and guesses are made in the box with the fewest possible values.
+
+
+def _undo(used, values, placed, grid):
+    """
+    take the values placed by _count back out of the boxes and axes
+    """
+    box_axes = grid.box_axes
+    for box in placed:
+        bit = values[box]
+        values[box] = 0
+        row, col, sqr = box_axes[box]
+        used[row] &= ~bit
+        used[col] &= ~bit
+        used[sqr] &= ~bit
+
+
+def _count(used, values, limit, fill, grid):
+    """
+    count the ways to fill the empty boxes, stopping at limit
+    :param used: list of the mask of values used in each axis
+    :param values: list of the value bit in each box, 0 if empty
+    :param limit: number of solutions to stop at
+    :param fill: list of (box, value bit) to fill in first, value bit 0 for the one value
+     the box has left
+    :param grid: Grid of the puzzle
+    :return: number of solutions found, at most limit. used and values are changed while
+     searching but restored before returning
+    """
+    all_values, popcount, mask_values = grid.all_values, grid.popcount, grid.mask_values
+    axis_boxes, box_axes, peers = grid.axis_boxes, grid.box_axes, grid.peers
+
+    # boxes filled in before guessing
+    placed = []
+
+    while True:
+        # fill the boxes, and any of their peers left with one possible value
+        while fill:
+            box, bit = fill.pop()
+            if values[box] != 0 and bit in (0, values[box]):
+                continue
+            row, col, sqr = box_axes[box]
+            possible = all_values & ~(used[row] | used[col] | used[sqr])
+            if bit == 0:
+                bit = possible
+            # the box was filled with another value, or the value was placed in another axis
+            if values[box] != 0 or bit & possible == 0:
+                _undo(used, values, placed, grid)
+                return 0
+            values[box] = bit
+            used[row] |= bit
+            used[col] |= bit
+            used[sqr] |= bit
+            placed.append(box)
+            for peer in peers[box]:
+                if values[peer] == 0:
+                    row, col, sqr = box_axes[peer]
+                    count = popcount[all_values & ~(used[row] | used[col] | used[sqr])]
+                    if count == 0:
+                        _undo(used, values, placed, grid)
+                        return 0
+                    if count == 1:
+                        fill.append((peer, 0))
+
+        # the empty box with the fewest possible values, and which values are possible in
+        # one box or more than one box of each axis
+        best = -1
+        best_count = grid.size + 1
+        once = [0] * grid.axis_count
+        twice = [0] * grid.axis_count
+        for box in range(0, grid.cells):
+            if values[box] == 0:
+                axes = box_axes[box]
+                row, col, sqr = axes
+                mask = all_values & ~(used[row] | used[col] | used[sqr])
+                count = popcount[mask]
+                if count < best_count:
+                    best = box
+                    best_count = count
+                for axis in axes:
+                    twice[axis] |= once[axis] & mask
+                    once[axis] |= mask
+
+        if best == -1:
+            _undo(used, values, placed, grid)
+            return 1
+
+        # fill the boxes that are the only place for a value in an axis
+        for axis in range(0, grid.axis_count):
+            missing = all_values & ~used[axis]
+            # a value missing from an axis with nowhere to go
+            if missing & ~once[axis]:
+                _undo(used, values, placed, grid)
+                return 0
+            single = missing & ~twice[axis]
+            for value in mask_values[single]:
+                bit = grid.bit[value]
+                for box in axis_boxes[axis]:
+                    row, col, sqr = box_axes[box]
+                    if values[box] == 0 and not (used[row] | used[col] | used[sqr]) & bit:
+                        fill.append((box, bit))
+                        break
+        if not fill:
+            break
+
+    # guess each value of the box with the fewest possible values
+    row, col, sqr = box_axes[best]
+    found = 0
+    for value in mask_values[all_values & ~(used[row] | used[col] | used[sqr])]:
+        found += _count(used, values, limit - found, [(best, grid.bit[value])], grid)
+        if found >= limit:
+            break
+
+    _undo(used, values, placed, grid)
+    return found
+
+
+def count_solutions(puzzle_string, limit=2):
+    """
+    Count the solutions of a puzzle without solving it with the solving methods, stopping
+    as soon as limit solutions are found. With the default limit of 2 the answer is 0 for
+    no solution, 1 for a unique solution, and 2 for more than one
+    :param puzzle_string: 81-digit puzzle string, blanks as '0' (or N x N characters for other
+     grid sizes, see grid module)
+    :param limit: number of solutions to stop at
+    :return: number of solutions, at most limit
+    """
+    grid = grid_for(puzzle_string)
+    all_values, box_axes = grid.all_values, grid.box_axes
+    used = [0] * grid.axis_count
+    values = [0] * grid.cells
+    for i in range(0, grid.cells):
+        value = CHARACTER_VALUES[puzzle_string[i]]
+        if value == 0:
+            continue
+        row, col, sqr = box_axes[i]
+        bit = grid.bit[value]
+        # a value given twice in an axis
+        if (used[row] | used[col] | used[sqr]) & bit:
+            return 0
+        values[i] = bit
+        used[row] |= bit
+        used[col] |= bit
+        used[sqr] |= bit
+
+    # boxes with only one possible value to start with
+    fill = []
+    for box in range(0, grid.cells):
+        if values[box] == 0:
+            row, col, sqr = box_axes[box]
+            count = grid.popcount[all_values & ~(used[row] | used[col] | used[sqr])]
+            if count == 0:
+                return 0
+            if count == 1:
+                fill.append((box, 0))
+
+    return _count(used, values, limit, fill, grid)
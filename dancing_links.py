@@ -0,0 +1,298 @@
+from candidates import CHARACTER_VALUES, DIGITS
+from grid import GRID, grid_for
+from stats import timed
+from guess_methods import BudgetExceeded
+import time
+
+# Sudoku as an exact cover problem. For a 9x9 grid, each of the 324 columns is a constraint that
+# must be met exactly once: every box has a value (columns 0-80), and every axis has each value
+# (columns 81 + 9 * axis ID + value - 1). Each of the 729 rows is a value in a box, and covers
+# the box's column and the columns for that value in the box's row, column, and square.
+# Algorithm X with dancing links finds every set of rows covering each column exactly once.
+# Other grid sizes have N x N boxes and N values in the same layout.
+
+
+def _row_columns(row, grid):
+    """
+    the columns covered by a row
+    :param row: grid size * box ID + value - 1
+    :param grid: Grid of the puzzle
+    :return: tuple of the four column numbers
+    """
+    box = row // grid.size
+    v = row % grid.size
+    return (box,) + tuple(grid.cells + grid.size * axis + v for axis in grid.box_axes[box])
+
+
+# ROW_COLUMNS[grid size] is the tuple of the columns covered by each row, made the first time
+# a grid of the size is solved
+ROW_COLUMNS = {}
+
+
+def row_columns(grid):
+    """
+    the columns covered by each row of the exact cover matrix for a grid size
+    :param grid: Grid of the puzzle
+    :return: tuple of the four column numbers of each row
+    """
+    columns = ROW_COLUMNS.get(grid.size)
+    if columns is None:
+        columns = ROW_COLUMNS[grid.size] = tuple(_row_columns(row, grid)
+                                                 for row in range(0, grid.cells * grid.size))
+    return columns
+
+
+class DancingLinks:
+    """
+    The exact cover matrix for one puzzle, as circular doubly linked lists of the nodes in each
+    row and column, held in parallel lists indexed by node number. Node 0 is the root, nodes
+    1-324 are the column headers (for a 9x9 grid), and the rest are the ones in the matrix.
+    """
+
+    def __init__(self, grid=GRID, max_nodes=None, deadline=None):
+        """
+        :param grid: the Grid of the puzzle's size
+        :param max_nodes: number of rows to allow search to try, or None for no limit
+        :param deadline: perf_counter time to stop searching at, or None for no limit
+        """
+        self.row_columns = row_columns(grid)
+        num_columns = 4 * grid.cells
+        count = num_columns + 1
+        # left, right, up, and down neighbours of each node
+        self.left = [i - 1 for i in range(0, count)]
+        self.right = [i + 1 for i in range(0, count)]
+        self.left[0] = num_columns
+        self.right[num_columns] = 0
+        self.up = list(range(0, count))
+        self.down = list(range(0, count))
+        # column header of each node, and matrix row of each node
+        self.column = list(range(0, count))
+        self.row = [-1] * count
+        # number of nodes left in each column
+        self.size = [0] * count
+        # number of rows tried while searching, and when to stop
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+
+        for row in range(0, len(self.row_columns)):
+            first = len(self.column)
+            for c in self.row_columns[row]:
+                header = c + 1
+                node = len(self.column)
+                # add to the bottom of the column
+                self.up.append(self.up[header])
+                self.down.append(header)
+                self.down[self.up[header]] = node
+                self.up[header] = node
+                self.column.append(header)
+                self.row.append(row)
+                self.size[header] += 1
+                # and to the end of the row
+                self.left.append(node - 1 if node > first else node + 3)
+                self.right.append(node + 1 if node < first + 3 else first)
+
+    def cover(self, c):
+        """
+        remove a column header, and every row with a node in the column from the other columns
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        """
+        put back a column removed by cover, in the reverse order
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def remove_row(self, row):
+        """
+        Take a row out of its columns, for a value already ruled out in a box. Must be done
+        before any column is covered
+        :param row: grid size * box ID + value - 1
+        """
+        up, down, column, size = self.up, self.down, self.column, self.size
+        # the nodes of each row follow the column headers, four to a row
+        first = len(self.size) + 4 * row
+        for node in range(first, first + 4):
+            down[up[node]] = down[node]
+            up[down[node]] = up[node]
+            size[column[node]] -= 1
+
+    def choose_row(self, row):
+        """
+        Cover the columns of a row that must be in the solution, such as a given value
+        :param row: grid size * box ID + value - 1
+        :return: False if one of the columns is already covered by a row chosen before
+        """
+        for c in self.row_columns[row]:
+            header = c + 1
+            # a covered column header is no longer linked into the header list
+            if self.right[self.left[header]] != header:
+                return False
+            self.cover(header)
+        return True
+
+    def search(self, chosen, solutions, limit):
+        """
+        Algorithm X: cover the column with the fewest rows left with each of its rows in turn,
+        adding the exact covers found to solutions until limit is reached
+        :param chosen: list of rows chosen so far
+        :param solutions: list of solutions found, each a list of rows
+        :param limit: number of solutions to stop at
+        :return: True if limit was reached
+        :raises BudgetExceeded: if max_nodes rows have been tried or the deadline has passed
+        """
+        right, down, size = self.right, self.down, self.size
+        if right[0] == 0:
+            solutions.append(list(chosen))
+            return len(solutions) >= limit
+
+        # column with the fewest rows
+        c = right[0]
+        best = size[c]
+        j = right[c]
+        while j != 0 and best > 1:
+            if size[j] < best:
+                c = j
+                best = size[j]
+            j = right[j]
+
+        self.cover(c)
+        i = down[c]
+        while i != c:
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                raise BudgetExceeded(f"Stopped after {self.nodes} guesses", self.nodes)
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise BudgetExceeded(f"Stopped after {self.nodes} guesses when out of time", self.nodes)
+            self.nodes += 1
+            chosen.append(self.row[i])
+            j = right[i]
+            while j != i:
+                self.cover(self.column[j])
+                j = right[j]
+
+            if self.search(chosen, solutions, limit):
+                # the matrix is thrown away once the limit is reached, so no need to restore it
+                return True
+
+            chosen.pop()
+            j = self.left[i]
+            while j != i:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            i = down[i]
+        self.uncover(c)
+        return False
+
+
+def exact_cover_solutions(puzzle_string, limit=2, max_nodes=None, deadline=None, tallies=None):
+    """
+    Find solutions of a puzzle with dancing links
+    :param puzzle_string: 81-digit puzzle string, blanks as '0' (or N x N characters for other
+     grid sizes, see grid module)
+    :param limit: number of solutions to stop at
+    :param max_nodes: number of rows to allow the search to try, or None for no limit
+    :param deadline: perf_counter time to stop searching at, or None for no limit
+    :param tallies: optional list of the tally mask of each box; values not in the tally of a
+     blank box are left out of the search
+    :return: tuple of the list of solution strings found, at most limit of them, and the
+     number of rows tried while searching
+    :raises BudgetExceeded: if the search runs out of rows or time
+    """
+    grid = grid_for(puzzle_string)
+    size = grid.size
+    dlx = DancingLinks(grid, max_nodes, deadline)
+    if tallies is not None:
+        for i in range(0, grid.cells):
+            if CHARACTER_VALUES[puzzle_string[i]] == 0:
+                for value in range(1, size + 1):
+                    if not tallies[i] & grid.bit[value]:
+                        dlx.remove_row(size * i + value - 1)
+    givens = []
+    for i in range(0, grid.cells):
+        value = CHARACTER_VALUES[puzzle_string[i]]
+        if value != 0:
+            givens.append(size * i + value - 1)
+            if not dlx.choose_row(size * i + value - 1):
+                return [], 0
+
+    solutions = []
+    dlx.search(givens, solutions, limit)
+
+    strings = []
+    for rows in solutions:
+        values = [0] * grid.cells
+        for row in rows:
+            values[row // size] = row % size + 1
+        strings.append("".join(DIGITS[value] for value in values))
+    return strings, dlx.nodes
+
+
+@timed
+def solve_with_dancing_links(p, max_nodes=None):
+    """
+    Solve a puzzle with dancing links instead of the solving methods. Like guessing, the
+    search finds whether there are no, one, or several solutions, and the rows tried are
+    counted as guesses, and limited by the puzzle's max_guesses and deadline
+    :param p: the puzzle
+    :param max_nodes: number of rows to try before giving up, or None to search until the
+     puzzle's own budget runs out
+    :return: False if max_nodes rows were tried first, leaving the puzzle as it was but for its
+     guess count; otherwise True
+    """
+    budget = None if p.max_guesses is None else p.max_guesses - p.guess_count
+    if budget is None or (max_nodes is not None and max_nodes < budget):
+        budget = max_nodes
+    try:
+        solutions, nodes = exact_cover_solutions(p.get_current_string(), max_nodes=budget, deadline=p.deadline,
+                                                 tallies=[p.box_map[i].tally for i in range(0, p.grid.cells)])
+    except BudgetExceeded as error:
+        # nothing was changed in the puzzle, so it is as it was before the search
+        p.guess_count += error.guesses
+        if budget == max_nodes and (p.deadline is None or time.perf_counter() <= p.deadline):
+            p.method_log.append(["dancing links", False])
+            return False
+        p.budget_exceeded = True
+        p.error_description = str(error)
+        return True
+    p.guess_count += nodes
+
+    if len(solutions) == 0:
+        p.no_solution = True
+        p.error_description = "No way to complete the puzzle"
+        p.set_final_string()
+    elif len(solutions) == 1:
+        for i in range(0, p.grid.cells):
+            if p.box_map[i].value == 0:
+                p.update_new_known(i, CHARACTER_VALUES[solutions[0][i]])
+        p.solved = True
+        p.set_solution_string()
+    else:
+        for solution in solutions:
+            p.update_valid_completion(solution)
+        p.error_description = "More than one way to complete the puzzle"
+
+    p.method_log.append(["dancing links", len(solutions) > 0])
+    return True
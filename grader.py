@@ -0,0 +1,194 @@
+import argparse
+import functools
+import itertools
+import multiprocessing
+import os
+import sys
+from puzzle import Puzzle
+from loader import iter_puzzles, iter_puzzle_lines
+from batch import name_puzzles
+from basic_methods import propagate
+from hints import next_hint, apply_hint
+from guess_methods import guess_in_place, BudgetExceeded, BRANCHING
+from solver import puzzle_status
+
+# Grading: how hard a puzzle is, as a number rather than solve_puzzle's Easy, Medium, or
+# Difficult. The puzzle is solved a step at a time with the easiest strategy that makes progress,
+# as Sudoku Explainer does, so its rating is that of the hardest strategy it needed (see
+# hints.HINT_LADDER). If the strategies get stuck, the rest is found by guessing on the same
+# puzzle, and it is rated GUESS_RATING, and DEPTH_RATING more for each guess that had to be nested
+# in another. No solution string or picture is made, so a corpus can be graded quickly.
+
+GUESS_RATING = 6.0
+DEPTH_RATING = 0.5
+
+# The columns of the grading table: heading, width, and key in the result of grade_puzzle
+TABLE_COLUMNS = [("name", 24, 'name'),
+                 ("rating", 6, 'rating'),
+                 ("hardest", 13, 'hardest'),
+                 ("steps", 5, 'steps'),
+                 ("guesses", 7, 'guesses'),
+                 ("depth", 5, 'depth'),
+                 ("status", 0, 'status')]
+
+
+def grade_puzzle(item, branching='fewest', max_guesses=None):
+    """
+    Rate how hard a puzzle is. One Puzzle is used throughout, from the first strategy to the
+    last guess
+    :param item: tuple of the puzzle name, puzzle string, and solution string or "0"; the
+     solution isn't used
+    :param branching: how guess_in_place picks what to guess on, one of guess_methods.BRANCHING
+    :param max_guesses: number of guesses to allow, or None for no limit
+    :return: dictionary with the puzzle name ('name'), its rating ('rating'), the hardest strategy
+     used ('hardest', "" if none was), the number of times a strategy was used ('steps'), the
+     number of guesses ('guesses'), the most guesses in place at once ('depth'), and the status
+     as from solver.puzzle_status ('status')
+    """
+    name, puzzle_string, given = item
+    p = Puzzle(name, puzzle_string)
+    p.max_guesses = max_guesses
+    result = {'name': name,
+              'rating': 0.0,
+              'hardest': "",
+              'steps': 0,
+              'guesses': 0,
+              'depth': 0}
+
+    if not p.no_solution and p.grid.cells - p.num_unknown_boxes() < p.grid.min_clues:
+        p.too_few_clues = True
+
+    if not p.no_solution and not p.too_few_clues:
+        # the easiest strategy each time, as far as the strategies go
+        hint = next_hint(p)
+        while hint is not None:
+            result['steps'] += 1
+            if hint['rating'] > result['rating']:
+                result['rating'] = hint['rating']
+                result['hardest'] = hint['strategy']
+            apply_hint(p, hint)
+            hint = next_hint(p)
+
+        if not p.solved and not p.no_solution and p.num_unknown_boxes() > 0:
+            checkpoint = p.checkpoint()
+            # check every box, as the strategies don't record which changed; this finds any box
+            # or axis left with no place for a value, which the strategies don't look for
+            p.pending = list(range(0, p.grid.cells))
+            propagate(p)
+            try:
+                if not p.no_solution:
+                    guess_in_place(p, (), branching)
+            except BudgetExceeded as error:
+                p.rollback(checkpoint)
+                p.budget_exceeded = True
+                p.error_description = str(error)
+            p.trail = None
+            p.pending = None
+            if p.guess_depth > 0:
+                result['rating'] = GUESS_RATING + DEPTH_RATING * (p.guess_depth - 1)
+
+    result['guesses'] = p.guess_count
+    result['depth'] = p.guess_depth
+    result['status'] = puzzle_status(p)
+    return result
+
+
+def grade_stream(items, workers=None, chunksize=64, branching='fewest', max_guesses=None):
+    """
+    Grade puzzles from any iterable over a pool of worker processes, yielding results as they
+    are ready. Puzzles are read from items a window at a time, so memory use doesn't grow
+    with the number of puzzles
+    :param items: iterable of (name, puzzle string, solution string or "0") tuples
+    :param workers: number of worker processes, defaults to the number of cores
+    :param chunksize: puzzles sent to a worker at a time
+    :param branching: how guess_in_place picks what to guess on, one of guess_methods.BRANCHING
+    :param max_guesses: number of guesses to allow for each puzzle, or None for no limit
+    :return: generator of results from grade_puzzle, in the same order as items
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    grade = functools.partial(grade_puzzle, branching=branching, max_guesses=max_guesses)
+
+    # no pool needed for a single worker
+    if workers == 1:
+        yield from map(grade, items)
+        return
+
+    # enough puzzles to keep every worker busy
+    window = workers * chunksize * 4
+    items = iter(items)
+
+    with multiprocessing.Pool(workers) as pool:
+        while True:
+            batch = list(itertools.islice(items, window))
+            if len(batch) == 0:
+                break
+            yield from pool.imap(grade, batch, chunksize)
+
+
+def format_row(values):
+    """
+    one line of the grading table
+    :param values: dictionary with a value for each key in TABLE_COLUMNS
+    """
+    cells = []
+    for heading, width, key in TABLE_COLUMNS:
+        value = values[key]
+        if isinstance(value, float):
+            value = f"{value:.1f}"
+        value = str(value)
+        cells.append(value.ljust(width) if key in ('name', 'hardest') else value.rjust(width))
+    return " ".join(cells).rstrip()
+
+
+def format_table(results):
+    """
+    The grading table, a heading line and then one line per puzzle
+    :param results: iterable of results from grade_puzzle
+    :return: generator of lines
+    """
+    yield format_row({key: heading for heading, width, key in TABLE_COLUMNS})
+    for result in results:
+        yield format_row(result)
+
+
+def parse_args(argv):
+    """
+    Parse the command line options
+    :param argv: list of command line arguments, not including the program name
+    :return: argparse namespace of the options
+    """
+    parser = argparse.ArgumentParser(description="Rate how hard sudoku puzzles are. Puzzles are read one per "
+                                                 "line, as for main.py, and one table line is written per puzzle.")
+    parser.add_argument("file", nargs="?", default="-",
+                        help="puzzle file to grade; '-' or no file reads puzzles from stdin")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes (default 1)")
+    parser.add_argument("--branching", choices=BRANCHING, default='fewest',
+                        help="how to pick what to guess on (default fewest)")
+    parser.add_argument("--max-guesses", type=int, metavar="N",
+                        help="stop guessing on a puzzle after this many guesses and report it as "
+                             "budget_exceeded")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    """
+    Grade the puzzles in a file or on stdin and write the grading table to stdout
+    :param argv: list of command line arguments, not including the program name
+    :return: exit status
+    """
+    args = parse_args(argv)
+    if args.file == "-":
+        items = name_puzzles("stdin", iter_puzzle_lines(sys.stdin))
+    else:
+        items = name_puzzles(os.path.basename(args.file), iter_puzzles(args.file))
+
+    results = grade_stream(items, args.workers, branching=args.branching, max_guesses=args.max_guesses)
+    for line in format_table(results):
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,143 @@
+from candidates import candidate_tables, DIGITS
+
+# Index tables for a grid, built once per grid size and shared read-only by every puzzle of that
+# size. A grid of size N has N values, N x N boxes, and N rows, N columns and N squares, each
+# square sqrt(N) boxes wide. Axes are numbered as in the Axis class: rows first, then columns,
+# then squares; for a 9x9 grid 0-8 rows, 9-17 columns, 18-26 squares.
+
+# grid size for each length of puzzle string
+SIZES = {16: 4, 81: 9, 256: 16, 625: 25}
+
+# fewest clues a puzzle with one solution can have, for the sizes where it is known
+MIN_CLUES = {4: 4, 9: 17}
+
+
+def _axis_boxes(ID, size, width):
+    """
+    box IDs in an axis
+    :param ID: axis number
+    :param size: grid size
+    :param width: width of a square
+    :return: tuple of the box IDs, in ascending order
+    """
+    dimension = ID // size
+    index = ID % size
+    # if it's a row, the ith box in the row
+    if dimension == 0:
+        return tuple(index * size + i for i in range(0, size))
+    # if it's a column, the ith box in the column
+    if dimension == 1:
+        return tuple(index + i * size for i in range(0, size))
+    # if it's a square, yes, this formula works
+    return tuple(size * ((index // width) * width + i // width) + (index % width) * width + i % width
+                 for i in range(0, size))
+
+
+def _intersections(axis_boxes, size, width):
+    """
+    the intersections of a square with one of the rows or columns crossing it, in the order
+    intersection_check visits them
+    :return: tuple of (square axis, row/column axis, intersection, rest of square, rest of row/column)
+    """
+    intersections = []
+    # cycle through the squares
+    for i in range(0, size):
+        square = 2 * size + i
+        for j in range(0, width):
+            # one of the rows, then one of the columns
+            for cross in (width * (i // width) + j, size + width * (i % width) + j):
+                intersect = tuple(k for k in axis_boxes[square] if k in axis_boxes[cross])
+                square_rest = tuple(k for k in axis_boxes[square] if k not in intersect)
+                cross_rest = tuple(k for k in axis_boxes[cross] if k not in intersect)
+                intersections.append((square, cross, intersect, square_rest, cross_rest))
+    return tuple(intersections)
+
+
+class Grid:
+    """
+    The index and candidate tables for one grid size
+    """
+
+    def __init__(self, size):
+        width = int(round(size ** 0.5))
+        if width * width != size or size > len(DIGITS) - 1:
+            raise ValueError(f"Unsupported grid size {size}")
+        # number of values, and boxes in each axis
+        self.size = size
+        # width of a square
+        self.width = width
+        # number of boxes and axes
+        self.cells = size * size
+        self.axis_count = 3 * size
+        self.min_clues = MIN_CLUES.get(size, 0)
+
+        # axis_boxes[axis] is the tuple of the boxes in the axis
+        self.axis_boxes = tuple(_axis_boxes(ID, size, width) for ID in range(0, 3 * size))
+        # the same boxes as frozensets, for membership tests
+        self.axis_box_sets = tuple(frozenset(boxes) for boxes in self.axis_boxes)
+        # box_axes[box] is the (row, column, square) axis numbers of the box
+        self.box_axes = tuple((ID // size, size + ID % size,
+                               2 * size + (ID // (size * width)) * width + (ID % size) // width)
+                              for ID in range(0, self.cells))
+        # peers[box] is the tuple of the other boxes sharing a row, column, or square with the box
+        self.peers = tuple(tuple(sorted(set(self.axis_boxes[axes[0]] + self.axis_boxes[axes[1]] +
+                                            self.axis_boxes[axes[2]]) - {ID}))
+                           for ID, axes in enumerate(self.box_axes))
+        # the same boxes as frozensets, for membership tests
+        self.peer_sets = tuple(frozenset(peers) for peers in self.peers)
+        # square and row/column intersections used by intersection_check
+        self.intersections = _intersections(self.axis_boxes, size, width)
+
+        # candidate masks (see candidates module)
+        self.all_values, self.bit, self.popcount, self.mask_values, self.unknown_order = candidate_tables(size)
+
+    def __deepcopy__(self, memo):
+        # shared by every puzzle of the size, including copies made while guessing
+        return self
+
+
+# grids made so far, by size
+_GRIDS = {}
+
+
+def get_grid(size):
+    """
+    The grid tables for a size, made the first time they are needed
+    :param size: number of values, 4, 9, 16, or 25
+    :return: Grid
+    """
+    grid = _GRIDS.get(size)
+    if grid is None:
+        grid = _GRIDS[size] = Grid(size)
+    return grid
+
+
+def grid_for(puzzle_string):
+    """
+    The grid tables for a puzzle string
+    :param puzzle_string: puzzle string of 16, 81, 256, or 625 characters
+    :return: Grid
+    """
+    size = SIZES.get(len(puzzle_string))
+    if size is None:
+        raise ValueError(f"puzzle string of {len(puzzle_string)} characters is not a square grid")
+    return get_grid(size)
+
+
+# the standard 9x9 grid, whose tables are also kept here for the modules that only solve 9x9 grids
+GRID = get_grid(9)
+
+# AXIS_BOXES[axis] is the tuple of the nine boxes in the axis
+AXIS_BOXES = GRID.axis_boxes
+
+# the same boxes as frozensets, for membership tests
+AXIS_BOX_SETS = GRID.axis_box_sets
+
+# BOX_AXES[box] is the (row, column, square) axis numbers of the box
+BOX_AXES = GRID.box_axes
+
+# PEERS[box] is the tuple of the 20 other boxes sharing a row, column, or square with the box
+PEERS = GRID.peers
+
+# square and row/column intersections used by intersection_check
+INTERSECTIONS = GRID.intersections
@@ -1,6 +1,54 @@
 import copy
-from basic_methods import basic_solve_attempt
-from advanced_methods import use_advanced_methods
+import time
+from basic_methods import basic_solve_attempt, propagate
+from advanced_methods import use_advanced_methods, GUESS_METHODS
+from candidates import CHARACTER_VALUES
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised while guessing when the puzzle's deadline has passed or its guess budget is used up
+    """
+
+    def __init__(self, message, guesses=0):
+        """
+        :param message: what ran out
+        :param guesses: number of guesses made before stopping
+        """
+        super().__init__(message)
+        self.guesses = guesses
+
+
+def check_budget(p):
+    """
+    Stop guessing if the puzzle has run out of time or guesses
+    :param p: the puzzle, with the deadline and max_guesses set by solve_puzzle
+    """
+    if p.max_guesses is not None and p.guess_count >= p.max_guesses:
+        raise BudgetExceeded(f"Stopped after {p.guess_count} guesses", p.guess_count)
+    if p.deadline is not None and time.perf_counter() > p.deadline:
+        raise BudgetExceeded(f"Stopped after {p.guess_count} guesses when out of time", p.guess_count)
+
+
+def guess_methods(p):
+    """
+    the advanced methods to follow up each guess with: the puzzle's own list if it has one,
+    otherwise advanced_methods.GUESS_METHODS
+    :param p: the puzzle
+    """
+    return GUESS_METHODS if p.advanced_methods is None else p.advanced_methods
+
+
+def rule_out(p, i, value):
+    """
+    remove a guessed value that led to an error from the box's tally
+    :param p: the puzzle
+    :param i: box ID
+    :param value: the value guessed
+    """
+    p.remove_from_tally(i, p.grid.bit[value])
+    if p.stats is not None:
+        p.stats.record('guess', calls=0, eliminations=1)
 
 
 def guess_recursive(p, start_index):
@@ -11,7 +59,7 @@ def guess_recursive(p, start_index):
     :param p: the puzzle
     :param start_index: puzzle box index to start at (one more than last guess)
     """
-    for i in range(start_index, 81):
+    for i in range(start_index, p.grid.cells):
         # Go on to next box if this box's value is known
         if p.box_map[i].value != 0:
             continue
@@ -20,11 +68,17 @@ def guess_recursive(p, start_index):
         local_progress = False
 
         # list of possible values in the box
-        possibles = sorted(p.box_map[i].tally)
+        possibles = p.grid.mask_values[p.box_map[i].tally]
 
         for possible in possibles:
+            check_budget(p)
+            p.guess_count += 1
+            if p.stats is not None:
+                p.stats.record('guess', placements=1)
             # create deep copy of puzzle; no changes to parent while guessing
             test_puzzle = copy.deepcopy(p)
+            # the copy is thrown away rather than rolled back, so it needs no undo trail
+            test_puzzle.trail = None
             # try the possible value in test puzzle
             test_puzzle.update_new_known(i, possible)
 
@@ -32,12 +86,12 @@ def guess_recursive(p, start_index):
             basic_solve_attempt(test_puzzle)
             # and then the advanced methods
             if test_puzzle.solved is False and test_puzzle.no_solution is False:
-                use_advanced_methods(test_puzzle)
+                use_advanced_methods(test_puzzle, guess_methods(test_puzzle))
 
             # if the possible value leads to a no-solution error, it cannot be correct
             if test_puzzle.no_solution:
                 # remove value from box tally in parent puzzle
-                p.box_map[i].tally.discard(possible)
+                rule_out(p, i, possible)
                 local_progress = True
 
             # If the possible value gives valid solution, update valid completion list
@@ -47,9 +101,11 @@ def guess_recursive(p, start_index):
             # If nothing interesting happened, guess in the next empty box
             else:
                 guess_recursive(test_puzzle, i+1)
+                # the copy started with this puzzle's guess count
+                p.guess_count = test_puzzle.guess_count
                 # remove this guess from parent puzzle if no solution
                 if test_puzzle.no_solution:
-                    p.box_map[i].tally.discard(possible)
+                    rule_out(p, i, possible)
                     local_progress = True
                 # update multiple solution error if found
                 if test_puzzle.multiple_solution:
@@ -88,3 +144,328 @@ def guess_recursive(p, start_index):
             # if so, break
             if p.solved or p.no_solution:
                 break
+
+
+# ways of picking what to guess on next in guess_in_place:
+# first - the lowest-index unknown box, as guess_recursive does
+# fewest - the unknown box with the fewest possible values
+# unit - as fewest, but a value with fewer possible places in a row, column, or square than
+#  that box has possible values is guessed in each of those places instead
+# Only one of them is needed to find every solution, so with fewest and unit, once every guess
+# in the box (or place) picked has been followed through, the search stops there
+BRANCHING = ['first', 'fewest', 'unit']
+
+# orders to try the guesses in:
+# ascending - smallest value first, or lowest box first for a value's places
+# least_constraining - the guess that removes the value from the fewest other boxes first
+VALUE_ORDERS = ['ascending', 'least_constraining']
+
+AXIS_NAMES = ['row', 'column', 'square']
+
+
+def guess_box(p, i):
+    """
+    guess on each possible value of a box
+    :return: tuple of the key for the guess, its name for the method log, the error description if
+     more than one guess gives a solution, and list of (box, value) guesses
+    """
+    return i, f'box {i}', f'Multiple values possible in box {i}', \
+        [(i, value) for value in p.grid.mask_values[p.box_map[i].tally]]
+
+
+def fewest_values_box(p, tried):
+    """
+    the unknown box not already guessed on with the fewest possible values, lowest index if tied
+    :return: the box index, or None if every unknown box has been guessed on
+    """
+    best = None
+    best_count = p.grid.size + 1
+    popcount = p.grid.popcount
+    for i in range(0, p.grid.cells):
+        box = p.box_map[i]
+        if box.value != 0 or i in tried:
+            continue
+        count = popcount[box.tally]
+        if count < best_count:
+            best = i
+            best_count = count
+            if count <= 2:
+                break
+    return best
+
+
+def choose_guess(p, tried, branching):
+    """
+    Pick what to guess on next
+    :param p: the puzzle
+    :param tried: keys of the guesses already made by this guess and those it is nested in
+    :param branching: one of BRANCHING
+    :return: tuple as from guess_box, or None if there is nothing left to guess on
+    """
+    grid = p.grid
+    if branching == 'first':
+        for i in range(0, grid.cells):
+            if p.box_map[i].value == 0 and i not in tried:
+                return guess_box(p, i)
+        return None
+
+    i = fewest_values_box(p, tried)
+    if branching == 'fewest' or (i is not None and grid.popcount[p.box_map[i].tally] <= 2):
+        return guess_box(p, i) if i is not None else None
+
+    # look for a value with fewer places in an axis than the box has values
+    best = guess_box(p, i) if i is not None else None
+    best_count = grid.popcount[p.box_map[i].tally] if i is not None else grid.size + 1
+    for ID in range(0, grid.axis_count):
+        axis = p.axis_map[ID]
+        for value in grid.mask_values[axis.unknown]:
+            if (ID, value) in tried:
+                continue
+            bit = grid.bit[value]
+            places = [j for j in axis.boxes if p.box_map[j].value == 0 and p.box_map[j].tally & bit]
+            if len(places) < best_count:
+                name = f'{value} in {AXIS_NAMES[axis.dimension]} {axis.index + 1}'
+                best = (ID, value), name, f'Multiple places possible for {name}', \
+                    [(j, value) for j in places]
+                best_count = len(places)
+                if best_count <= 2:
+                    return best
+    return best
+
+
+def order_guesses(p, guesses, value_order):
+    """
+    put guesses in the order to try them
+    :param p: the puzzle
+    :param guesses: list of (box, value) guesses
+    :param value_order: one of VALUE_ORDERS
+    :return: list of the guesses in order
+    """
+    if value_order == 'ascending':
+        return guesses
+
+    # number of other boxes each guess would remove the value from
+    def constrained(guess):
+        bit = p.grid.bit[guess[1]]
+        return sum(1 for j in p.grid.peers[guess[0]] if p.box_map[j].tally & bit and p.box_map[j].value == 0)
+
+    return sorted(guesses, key=constrained)
+
+
+class GuessLevel:
+    """
+    One level of guess_in_place's search: the guesses made while the guesses of the levels
+    below it are in place
+    """
+
+    def __init__(self, p, tried, depth=1):
+        # the guesses nested in this one skip everything guessed on so far
+        self.tried = set(tried)
+        # number of guesses in place while this level's guesses are, counting its own
+        self.depth = depth
+        # completions found before this level, by the levels below it
+        self.found = len(p.valid_completion_list)
+        # what is being guessed on, from choose_guess, and its guesses in order; None
+        # when a new choice is needed
+        self.key = None
+        self.name = ""
+        self.multiple_description = ""
+        self.guesses = None
+        # index of the next guess to make
+        self.next = 0
+        # whether any guess has been ruled out
+        self.local_progress = False
+        # puzzle checkpoint from before the guess being followed
+        self.checkpoint = None
+
+
+def start_choice(p, level, branching, value_order):
+    """
+    Pick what the level guesses on next
+    :return: False if there is nothing left to guess on
+    """
+    choice = choose_guess(p, level.tried, branching)
+    if choice is None:
+        return False
+    level.key, level.name, level.multiple_description, guesses = choice
+    level.tried.add(level.key)
+    level.guesses = order_guesses(p, guesses, value_order)
+    level.next = 0
+    level.local_progress = False
+    return True
+
+
+def multiple_found(p, level):
+    """
+    Check for a second completion after a guess
+    :return: True if no more guesses are needed on the level's choice
+    """
+    # no need to test more possibilities in this box if multiple solutions found
+    if p.multiple_solution:
+        return True
+
+    if len(p.valid_completion_list) >= 2:
+        p.multiple_solution = True
+        p.error_description = level.multiple_description
+        return True
+    return False
+
+
+def try_guesses(p, level):
+    """
+    Make the level's remaining guesses until one needs guessing nested in it
+    :return: True if the last guess made needs a nested level, False once the guesses are done
+    """
+    while level.next < len(level.guesses):
+        i, possible = level.guesses[level.next]
+        level.next += 1
+        check_budget(p)
+        p.guess_count += 1
+        if level.depth > p.guess_depth:
+            p.guess_depth = level.depth
+        if p.stats is not None:
+            p.stats.record('guess', placements=1)
+        # remember the puzzle as it is before the guess
+        level.checkpoint = p.checkpoint()
+        # try the possible value
+        p.update_new_known(i, possible)
+
+        # follow the consequences of the guessed value with the basic methods
+        propagate(p)
+        # and then the advanced methods
+        if p.solved is False and p.no_solution is False:
+            use_advanced_methods(p, guess_methods(p))
+
+        # if the possible value leads to a no-solution error, it cannot be correct
+        if p.no_solution:
+            p.rollback(level.checkpoint)
+            # remove value from box tally
+            rule_out(p, i, possible)
+            level.local_progress = True
+
+        # If the possible value gives valid solution, update valid completion list
+        elif p.solved:
+            solution = p.solution
+            p.rollback(level.checkpoint)
+            p.update_valid_completion(solution)
+
+        # If nothing interesting happened, guess again
+        else:
+            return True
+
+        if multiple_found(p, level):
+            return False
+    return False
+
+
+def follow_up(p, level):
+    """
+    Undo the level's last guess once the level nested in it is done, keeping what it found
+    :return: True if no more guesses are needed on the level's choice
+    """
+    i, possible = level.guesses[level.next - 1]
+    # keep what the guess found before undoing it
+    no_solution = p.no_solution
+    multiple_solution = p.multiple_solution
+    solved = p.solved
+    solution = p.solution
+    error_description = p.error_description
+    completions = p.valid_completion_list
+    p.rollback(level.checkpoint)
+
+    # remove this guess if no solution
+    if no_solution:
+        rule_out(p, i, possible)
+        level.local_progress = True
+    # update multiple solution error if found
+    if multiple_solution:
+        p.multiple_solution = True
+        p.error_description = error_description
+        for completion in completions:
+            p.update_valid_completion(completion)
+        return True
+    # add valid completion if found
+    if solved:
+        p.update_valid_completion(solution)
+
+    return multiple_found(p, level)
+
+
+def finish_choice(p, level, branching):
+    """
+    Log the level's choice once its guesses are done, and act on what they found
+    :return: True if the level's search is over
+    """
+    # Check if more than one valid solution is found for the first time for this box
+    if p.multiple_solution and p.error_description == "":
+        p.error_description = level.multiple_description
+
+    # update method log to track guessing
+    p.method_log.append([f'Recursive guess {level.name}', level.local_progress])
+
+    # No need to go to next box if multiple solutions
+    if p.multiple_solution:
+        return True
+
+    # every guess was followed through, so a single completion found is the only solution
+    if branching != 'first' and len(p.valid_completion_list) > level.found:
+        solution = p.valid_completion_list[-1]
+        for j in range(0, p.grid.cells):
+            if p.box_map[j].value == 0:
+                p.update_new_known(j, CHARACTER_VALUES[solution[j]])
+        p.solved = True
+        p.set_solution_string()
+        return True
+
+    # If something changed, see if puzzle can be solved or if error identified
+    if level.local_progress:
+        basic_solve_attempt(p)
+        # if so, stop
+        if p.solved or p.no_solution:
+            return True
+    return False
+
+
+def guess_in_place(p, tried=(), branching='first', value_order='ascending'):
+    """
+    Same search as guess_recursive, but each guess is made on the puzzle itself and undone
+    with the puzzle's undo trail instead of being made on a deep copy, so memory use
+    doesn't grow with the number of guesses. Which box to guess on next and the order of the
+    values tried can also be chosen. The levels of nested guesses are kept in a list rather
+    than on the call stack, so the depth of the search doesn't depend on the recursion limit.
+    Raises BudgetExceeded if the puzzle runs out of time or guesses
+    :param p: the puzzle
+    :param tried: keys of the guesses already made
+    :param branching: one of BRANCHING
+    :param value_order: one of VALUE_ORDERS
+    """
+    stack = [GuessLevel(p, tried)]
+    # whether the level on top of the stack is back from a level nested in its last guess
+    returned = False
+
+    while stack:
+        level = stack[-1]
+        if returned:
+            returned = False
+            done = follow_up(p, level)
+        elif level.guesses is None:
+            if not start_choice(p, level, branching, value_order):
+                # nothing left to guess on, so this level is over
+                stack.pop()
+                returned = True
+                continue
+            done = False
+        else:
+            done = False
+
+        if not done and try_guesses(p, level):
+            stack.append(GuessLevel(p, level.tried, level.depth + 1))
+            continue
+
+        if finish_choice(p, level, branching):
+            stack.pop()
+            returned = True
+        else:
+            level.guesses = None
+
+    return p
@@ -0,0 +1,164 @@
+from puzzle import Puzzle
+from advanced_methods import naked_subsets, hidden_subsets, intersections, fish, xy_wings, xyz_wings
+
+# Hints: the easiest deduction that can be made next in a puzzle, and what it shows. The
+# strategies are tried in order of difficulty, and each stops at the first deduction it finds,
+# so a hint only looks as far as it needs to. Ratings are on the scale of Sudoku Explainer, the
+# usual measure of how hard a technique is for a person.
+#
+# A finder takes the puzzle and its size option (the number of boxes or lines in a subset or
+# fish, or whether an intersection is claiming) and returns the cells and digits that make up
+# the pattern, the values it places, and the values it removes from tallies, or None. Apart from
+# the singles, the finders take the first pattern from the same generators the advanced methods
+# use (see advanced_methods module), which find patterns without applying them.
+
+def find_only_place(p, option):
+    """
+    a value possible in only one box of an axis
+    """
+    grid = p.grid
+    for key, axis in p.axis_map.items():
+        # values possible in at least one box of the axis, and in at least two
+        once = 0
+        twice = 0
+        for j in axis.boxes:
+            box = p.box_map[j]
+            if box.value == 0:
+                twice |= once & box.tally
+                once |= box.tally
+        single = once & ~twice & axis.unknown
+        if single:
+            value = grid.mask_values[single][0]
+            bit = grid.bit[value]
+            for j in axis.boxes:
+                if p.box_map[j].value == 0 and p.box_map[j].tally & bit:
+                    return [j], [value], [(j, value)], []
+    return None
+
+
+def find_lone_tally(p, option):
+    """
+    a box with only one possible value
+    """
+    for key, box in p.box_map.items():
+        if box.value == 0 and p.grid.popcount[box.tally] == 1:
+            value = p.grid.mask_values[box.tally][0]
+            return [key], [value], [(key, value)], []
+    return None
+
+
+def first_pattern(p, patterns):
+    """
+    the first pattern from one of the advanced_methods generators, with masks turned into values
+    """
+    mask_values = p.grid.mask_values
+    for cells, mask, eliminations in patterns:
+        return list(cells), list(mask_values[mask]), [], \
+            [(j, value) for j, removed in eliminations for value in mask_values[removed]]
+    return None
+
+
+def find_intersection(p, option):
+    """
+    a value in a square only possible where it crosses a row or column, which can't be anywhere
+    else in the row or column (pointing), or the other way round when option is True (claiming)
+    """
+    return first_pattern(p, intersections(p, pointing=not option, claiming=option))
+
+
+def find_naked_subset(p, size):
+    """
+    size boxes in an axis whose tallies hold only size values between them
+    """
+    return first_pattern(p, naked_subsets(p, size, size))
+
+
+def find_hidden_subset(p, size):
+    """
+    size values only possible in the same size boxes of an axis
+    """
+    return first_pattern(p, hidden_subsets(p, size, size))
+
+
+def find_fish(p, size):
+    """
+    size rows where a value is only possible in the same size columns, or the other way round
+    """
+    return first_pattern(p, fish(p, size))
+
+
+def find_wing(p, size):
+    """
+    an XY-Wing (size 2) or XYZ-Wing (size 3): a pivot box with size values, and two boxes in its
+    axes with two values each, so that one of the three holds the value z they share
+    """
+    return first_pattern(p, xy_wings(p) if size == 2 else xyz_wings(p))
+
+
+# The strategies in the order hints are looked for, easiest first: name, rating, finder, and
+# the option passed to the finder
+HINT_LADDER = [("only place", 1.5, find_only_place, None),
+               ("lone tally", 2.3, find_lone_tally, None),
+               ("pointing", 2.6, find_intersection, False),
+               ("claiming", 2.8, find_intersection, True),
+               ("naked pair", 3.0, find_naked_subset, 2),
+               ("x-wing", 3.2, find_fish, 2),
+               ("hidden pair", 3.4, find_hidden_subset, 2),
+               ("naked triple", 3.6, find_naked_subset, 3),
+               ("swordfish", 3.8, find_fish, 3),
+               ("hidden triple", 4.0, find_hidden_subset, 3),
+               ("xy-wing", 4.2, find_wing, 2),
+               ("xyz-wing", 4.4, find_wing, 3),
+               ("naked quad", 5.0, find_naked_subset, 4),
+               ("jellyfish", 5.2, find_fish, 4),
+               ("hidden quad", 5.4, find_hidden_subset, 4)]
+
+
+def next_hint(p):
+    """
+    Find the easiest deduction that can be made next, without changing the puzzle
+    :param p: the puzzle
+    :return: dictionary of the strategy name ('strategy'), its rating ('rating'), the box IDs
+     ('cells') and values ('digits') making up the pattern, the (box ID, value) pairs it places
+     ('placements') and removes from tallies ('eliminations'); or None if none of the strategies
+     finds anything, or the puzzle is solved or has no solution
+    """
+    if p.solved or p.no_solution or p.num_unknown_boxes() == 0:
+        return None
+    for strategy, rating, finder, option in HINT_LADDER:
+        found = finder(p, option)
+        if found is not None:
+            cells, digits, placements, eliminations = found
+            return {'strategy': strategy,
+                    'rating': rating,
+                    'cells': cells,
+                    'digits': digits,
+                    'placements': placements,
+                    'eliminations': eliminations}
+    return None
+
+
+def apply_hint(p, hint):
+    """
+    Make the deduction of a hint in the puzzle
+    :param p: the puzzle
+    :param hint: dictionary from next_hint
+    """
+    for ID, value in hint['placements']:
+        if p.box_map[ID].value == 0:
+            p.update_new_known(ID, value)
+    for ID, value in hint['eliminations']:
+        p.remove_from_tally(ID, p.grid.bit[value])
+    if p.num_unknown_boxes() == 0:
+        p.solved = True
+        p.set_solution_string()
+
+
+def hint(puzzle_string):
+    """
+    The easiest next deduction in a puzzle, from its givens
+    :param puzzle_string: 81-digit puzzle string, blanks as '0', with any values already found
+     filled in
+    :return: dictionary as from next_hint, or None
+    """
+    return next_hint(Puzzle("puzzle", puzzle_string))
@@ -0,0 +1,90 @@
+import sys
+
+from candidates import CHARACTER_VALUES
+from grid import SIZES
+
+
+def check_puzzle_string(puzzle_string, kind="puzzle"):
+    """
+    Check that a puzzle or solution string fits a grid: 81 digits for a 9x9 grid, or 16, 256,
+    or 625 characters for 4x4, 16x16, or 25x25 grids, with values over 9 as letters (see
+    candidates.DIGITS) and blanks as '0'
+    :param puzzle_string: the string
+    :param kind: "puzzle" or "solution", for the error message
+    :raises ValueError: if the string doesn't fit a grid
+    """
+    size = SIZES.get(len(puzzle_string))
+    if size is None:
+        raise ValueError(f"{kind} string is not 81 digits (or 16, 256, or 625 characters)")
+    for ch in puzzle_string:
+        if ch == '.' or CHARACTER_VALUES.get(ch, size + 1) > size:
+            raise ValueError(f"{kind} string has characters that are not values in a {size}x{size} grid")
+
+
+def parse_puzzle_line(line):
+    """
+    Parse one line of a puzzle file. A line is either the puzzle and solution separated by a
+    comma, with the solution "0" if not provided, or a puzzle on its own. Blank boxes in the
+    puzzle may be '0' or '.'. Puzzles for other grid sizes are as check_puzzle_string allows,
+    with letters in either case
+    :param line: line of text
+    :return: two-item list of the 81-digit puzzle string (blanks as '0') and either the
+     81-digit solution or "0"; None if the line is blank
+    :raises ValueError: if the line is not a valid puzzle
+    """
+    row = line.split(',')
+    if len(row) > 2:
+        raise ValueError("more than two strings in row")
+
+    puzzle_string = row[0].strip().replace('.', '0').upper()
+    if puzzle_string == "" and len(row) == 1:
+        return None
+    check_puzzle_string(puzzle_string)
+
+    solution_string = row[1].strip().upper() if len(row) == 2 else "0"
+    if solution_string != "0":
+        if len(solution_string) != len(puzzle_string):
+            raise ValueError("solution string is not the size of the puzzle or 0")
+        check_puzzle_string(solution_string, "solution")
+
+    return [puzzle_string, solution_string]
+
+
+def iter_puzzle_lines(lines):
+    """
+    Yield the valid puzzles in a sequence of lines one at a time, reporting invalid lines
+    on stderr and skipping them
+    :param lines: any iterable of lines, such as an open file
+    :return: generator of [puzzle string, solution string or "0"] lists
+    """
+    count = 0
+    for line in lines:
+        count += 1
+        try:
+            puzzle = parse_puzzle_line(line)
+        except ValueError as error:
+            print(f"Error loading puzzle: {error} in row {count}", file=sys.stderr)
+            continue
+        if puzzle is not None:
+            yield puzzle
+
+
+def iter_puzzles(path):
+    """
+    Yield the puzzles in a puzzle file one at a time, so files of any size can be read
+    in constant memory
+    :param path: path to the puzzle file
+    :return: generator of [puzzle string, solution string or "0"] lists
+    """
+    with open(path, 'r') as file:
+        yield from iter_puzzle_lines(file)
+
+
+def read_puzzle_file(path):
+    """
+    Read all the puzzles and solutions out of a puzzle file
+    :param path: path to the puzzle file
+    :return: list of puzzles, each puzzle a two-item list of (0) the 81-digit string representing
+     the blank puzzle and (1) either the 81-digit solution or "0"
+    """
+    return list(iter_puzzles(path))
@@ -1,7 +1,14 @@
-from puzzle import Puzzle
+from puzzle import print_grid
 from solver import solve_puzzle
-import csv
+from loader import read_puzzle_file, iter_puzzle_lines, check_puzzle_string
+from batch import solve_stream, check_result, name_puzzles
+from results import ResultWriter, FORMATS
+from store import ResultStore
+from vectorized import solve_stream_vectorized
+from stats import MethodStats
+import argparse
 import os
+import sys
 
 
 def get_puzzles_from_file():
@@ -33,28 +40,7 @@ def get_puzzles_from_file():
     file_name = puzzle_files[int(selection)-1]
 
     # Read file to get puzzles and solutions
-    path = "puzzles\\" + file_name
-    with open(path, 'r') as file:
-        reader = csv.reader(file)
-        data = []
-        count = 0
-
-        # Read through the rows in the file
-        for row in reader:
-            count += 1
-            # ignore rows without two elements
-            if len(row) != 2:
-                continue
-            puzzle_string = row[0].strip()
-            if len(puzzle_string) != 81 or puzzle_string.isdigit() is False:
-                print(f"Error loading puzzle: puzzle string in row {count} is not 81 digits")
-                continue
-            solution_string = row[1].strip()
-            if (len(solution_string) != 81 and solution_string != "0") or solution_string.isdigit() is False:
-                print(f"Error loading puzzle: solution string in row {count} is not 81 digits or 0")
-                continue
-
-            data.append([puzzle_string, solution_string])
+    data = read_puzzle_file(os.path.join("puzzles", file_name))
 
     return file_name, data
 
@@ -67,10 +53,15 @@ def puzzle_string_input():
     of the puzzle string and '0' (indicating no solution provided)
     """
     print("Please enter an 81-digit string representing your puzzle")
-    puzzle_string = input()
+    puzzle_string = input().strip().upper()
 
-    while len(puzzle_string) != 81 or puzzle_string.isdigit() is False:
-        puzzle_string = input("Please enter 81 digits in a single line, no spaces or letters:")
+    # 81 digits, or 16, 256, or 625 characters for the other grid sizes
+    while True:
+        try:
+            check_puzzle_string(puzzle_string)
+            break
+        except ValueError:
+            puzzle_string = input("Please enter 81 digits in a single line, no spaces or letters:").strip().upper()
 
     return "puzzle", [[puzzle_string, "0"]]
 
@@ -98,9 +89,9 @@ def puzzle_selection():
         return get_puzzles_from_file()
 
 
-def main():
+def interactive():
     """
-    runs through puzzles provided and prints out results
+    runs through puzzles chosen at the prompts and prints out results
     """
     # get file name (to name puzzles) and the list of puzzles
     file_name, puzzle_list = puzzle_selection()
@@ -156,4 +147,117 @@ def main():
             print(entry)
 
 
-main()
+def parse_args(argv):
+    """
+    Parse the command line options
+    :param argv: list of command line arguments, not including the program name
+    :return: argparse namespace of the options
+    """
+    parser = argparse.ArgumentParser(description="Solve sudoku puzzles. Puzzles are read one per line, "
+                                                 "either as 'puzzle,solution' or as a puzzle on its own, "
+                                                 "and one result line is written per puzzle.")
+    parser.add_argument("file", nargs="?", default="-",
+                        help="puzzle file to solve; '-' or no file reads puzzles from stdin")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="text",
+                        help="text: name, status, check against given solution, and solution or error; "
+                             "solution: the solution, or the status if not solved; "
+                             "jsonl or csv: one record per puzzle with the puzzle, solution, status, "
+                             "difficulty, guesses, and solve time")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of worker processes (default 1)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="solve puzzles together with numpy as far as the basic methods go, "
+                             "and the rest one at a time (needs numpy; without it every puzzle is "
+                             "solved one at a time)")
+    parser.add_argument("-s", "--store", metavar="PATH",
+                        help="database file of earlier results; puzzles found there aren't solved again, "
+                             "and new results are added to it")
+    parser.add_argument("--time-limit", type=float, metavar="SECONDS",
+                        help="stop guessing on a puzzle after this many seconds and report it as "
+                             "budget_exceeded")
+    parser.add_argument("--max-guesses", type=int, metavar="N",
+                        help="stop guessing on a puzzle after this many guesses and report it as "
+                             "budget_exceeded")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the calls, time, eliminations, and placements of each solving method, "
+                             "totalled over all the puzzles, to stderr")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="don't print the summary line to stderr")
+    parser.add_argument("--pic", action="store_true",
+                        help="print a picture of each solution after its result line")
+    parser.add_argument("-i", "--interactive", action="store_true",
+                        help="choose puzzles at prompts, as when run with no arguments from a terminal")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    """
+    Solve the puzzles in a file or on stdin and write one result line per puzzle to stdout
+    :param argv: list of command line arguments, not including the program name
+    :return: exit status, 1 if any solution found doesn't match the one given, 2 if the puzzle
+     file can't be opened
+    """
+    # keep the prompts for someone running the program with no arguments from a terminal
+    if len(argv) == 0 and sys.stdin.isatty():
+        interactive()
+        return 0
+
+    args = parse_args(argv)
+    if args.interactive:
+        interactive()
+        return 0
+
+    if args.file == "-":
+        file = None
+        items = name_puzzles("stdin", iter_puzzle_lines(sys.stdin))
+    else:
+        # opened here rather than by loader.iter_puzzles, which would only open it once the
+        # first puzzle is asked for
+        try:
+            file = open(args.file, 'r')
+        except OSError as error:
+            print(f"main.py: {args.file}: {error.strerror}", file=sys.stderr)
+            return 2
+        items = name_puzzles(os.path.basename(args.file), iter_puzzle_lines(file))
+
+    store = ResultStore(args.store) if args.store else None
+
+    failures = 0
+    stats = MethodStats()
+    # pictures are printed between result lines, so write each line straight away
+    buffer_size = 1 if args.pic else 1000
+    try:
+        with ResultWriter(sys.stdout, args.format, buffer_size) as writer:
+            if args.vectorized:
+                results = solve_stream_vectorized(items, args.workers, store=store, time_limit=args.time_limit,
+                                                  max_guesses=args.max_guesses)
+            else:
+                results = solve_stream(items, args.workers, store=store, time_limit=args.time_limit,
+                                       max_guesses=args.max_guesses)
+            for result in results:
+                if check_result(result) == 'FAIL':
+                    failures += 1
+                # puzzles found in the store have no method stats
+                if 'stats' in result:
+                    stats.merge(result['stats'])
+                writer.write(result)
+                if args.pic and result['solution']:
+                    print_grid(result['solution'])
+    finally:
+        # commit the results found so far even if the run is stopped part way
+        if store is not None:
+            store.close()
+        if file is not None:
+            file.close()
+
+    if args.stats:
+        print(stats.format_table(), file=sys.stderr)
+
+    if not args.quiet:
+        print(f"{writer.count} puzzles, {failures} failed", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,22 +1,59 @@
 from box import Box
 from axis import Axis
+from candidates import CHARACTER_VALUES, DIGITS
+from grid import grid_for
 
 
-def print_row(x, v):
+def print_row(x, v, width=3):
     """
-    used in print_pic method
+    used in print_grid
     """
-    i = x*9
-    print(f"||  {v[i]}  |  {v[1+i]}  |  {v[2+i]}  ||  " +
-          f"{v[3+i]}  |  {v[4+i]}  |  {v[5+i]}  ||  " +
-          f"{v[6+i]}  |  {v[7+i]}  |  {v[8+i]}  ||  ")
+    size = width * width
+    i = x*size
+    squares = ["  " + "  |  ".join(v[i + k:i + k + width]) + "  ||" for k in range(0, size, width)]
+    print("||" + "".join(squares) + "  ")
+
+
+def print_grid(s):
+    """
+    prints a picture of the grid represented by a puzzle string
+    :param s: the string, with zeros for blank boxes
+    """
+    # replace zeros with blanks for display of puzzle
+    print_list = s.replace('0', ' ')
+    grid = grid_for(s)
+    width = grid.width
+
+    # define rows that don't depend on puzzle values
+    # width in characters
+    w = 2 + width * (6 * width + 1)
+    # thick and thin horizontal lines, with verticals where appropriate
+    thick_outer = "="*w
+    thick_inner = "||" + ((("="*5) + "|")*(width - 1) + ("="*5) + "||")*width
+    thin = "||" + ((("-"*5) + "|")*(width - 1) + ("-"*5) + "||")*width
+
+    # print the top horizontal, then loop through each band of squares
+    print(thick_outer)
+    for i in range(0, width):
+        for k in range(0, width):
+            print_row(i*width + k, print_list, width)
+            if k < width - 1:
+                print(thin)
+        if i == width - 1:
+            print(thick_outer)
+        else:
+            print(thick_inner)
 
 
 class Puzzle:
 
     def __init__(self, name, puzzle_string):
         self.name = name
-        # string of 81 digits representing the original puzzle
+        # index and candidate tables for the size of grid, from the length of the puzzle string
+        # (81 characters for a standard 9x9 grid; see grid module)
+        self.grid = grid_for(puzzle_string)
+        # string of 81 digits representing the original puzzle (see candidates.DIGITS for
+        # values over 9)
         self.puzzle_string = puzzle_string
         # string of 81 digits representing valid, unique solution
         self.solution = ""
@@ -33,27 +70,53 @@ class Puzzle:
         self.too_few_clues = False
         self.no_solution = False
         self.multiple_solution = False
+        # Whether solving stopped because the time or guess budget ran out
+        self.budget_exceeded = False
         self.error_description = ""
         # List of functions applied to solve puzzle and whether progress made
         self.method_log = []
         # Difficulty level
         self.difficulty = ""
+        # Undo trail of earlier box and axis states, recorded only while guessing
+        self.trail = None
+        # Boxes whose tallies shrank and still need checking by propagate, recorded only while
+        # using the basic methods after the givens, the advanced methods, or guessing
+        self.pending = None
+        # Number of boxes with unknown value
+        self.unknown_count = self.grid.cells
+        # Number of values tried while guessing
+        self.guess_count = 0
+        # Most guesses in place at once while guessing in place
+        self.guess_depth = 0
+        # Whether the results were restored from a ResultStore rather than found by solving
+        self.from_store = False
+        # Number of values removed from tallies
+        self.removed_count = 0
+        # MethodStats recording the work done by each method, or None if not recording
+        self.stats = None
+        # Advanced methods for use_advanced_methods to use, or None for the usual ones
+        self.advanced_methods = None
+        # perf_counter time to stop guessing at, and number of guesses to stop at; None for no limit
+        self.deadline = None
+        self.max_guesses = None
 
         # initialize axis map
-        for i in range(0, 27):
-            self.axis_map[i] = Axis(i)
+        for i in range(0, self.grid.axis_count):
+            self.axis_map[i] = Axis(i, self.grid)
 
         # initialize box map
-        for i in range(0, 81):
-            self.box_map[i] = Box(i)
+        for i in range(0, self.grid.cells):
+            self.box_map[i] = Box(i, self.grid)
 
         # put the known box values into the box map
-        for i in range(0, 81):
-            value = int(puzzle_string[i])
+        for i in range(0, self.grid.cells):
+            value = CHARACTER_VALUES.get(puzzle_string[i])
+            if value is None or value > self.grid.size:
+                raise ValueError(f"{puzzle_string[i]} is not a value in a {self.grid.size}x{self.grid.size} grid")
             if value != 0:
                 self.box_map[i].given = True
                 # make sure value can legally be put in this box
-                if value in self.box_map[i].tally:
+                if self.box_map[i].tally & self.grid.bit[value]:
                     self.update_new_known(i, value)
                 else:
                     self.no_solution = True
@@ -69,7 +132,7 @@ class Puzzle:
         :param index: which of the nine axes in the dimension
         :return: list of nine box indices
         """
-        ID = 9 * dimension + index
+        ID = self.grid.size * dimension + index
         axis_box_set = self.axis_map[ID].box_set
         return axis_box_set
 
@@ -87,20 +150,24 @@ class Puzzle:
             print("box value not set, can't update tallies")
             return
 
-        # Loop through the 3 axes the box is in
-        for i in range(0, 3):
-            index = self.box_map[ID].coord[i]
-            # Get list of boxes in axis
-            axis = self.get_axis(i, index)
+        # mask keeping every value but v
+        keep = ~self.grid.bit[v]
 
-            # Loop through 8 boxes in axis other than the one updated
-            for j in axis.difference({ID}):
-                # Remove value from tally set
-                self.box_map[j].tally.discard(v)
+        # Loop through the 20 boxes sharing an axis with the one updated
+        for j in self.grid.peers[ID]:
+            box = self.box_map[j]
+            # Remove value from tally mask
+            if box.tally & ~keep:
+                if self.trail is not None:
+                    self.trail.append((box, box.value, box.tally))
+                if self.pending is not None:
+                    self.pending.append(j)
+                box.tally &= keep
+                self.removed_count += 1
 
     def update_axis_unknowns(self, ID):
         """
-        Update sets of the values not yet known for the three axes of a given box
+        Update masks of the values not yet known for the three axes of a given box
         :param ID: box with known value
         :return:
         """
@@ -112,12 +179,14 @@ class Puzzle:
             print("box value not set, can't update axis")
             return
 
-        # Loop through the three dimensions
-        for i in range(0, 3):
-            # get the axis the box is in
-            axis = i*9 + self.box_map[ID].coord[i]
+        # Loop through the three axes the box is in
+        keep = ~self.grid.bit[v]
+        for i in self.grid.box_axes[ID]:
+            axis = self.axis_map[i]
+            if self.trail is not None:
+                self.trail.append((axis, axis.unknown))
             # remove the value from the axis unknowns
-            self.axis_map[axis].unknown.discard(v)
+            axis.unknown &= keep
 
     def update_new_known(self, boxID, value):
         """
@@ -125,25 +194,95 @@ class Puzzle:
         :param boxID: ID of box whose value has been identified
         :param value: value in box
         """
-        self.box_map[boxID].set_value(value)
+        box = self.box_map[boxID]
+        if self.trail is not None:
+            self.trail.append((box, box.value, box.tally))
+        if self.pending is not None:
+            self.pending.append(boxID)
+        if box.value == 0:
+            self.unknown_count -= 1
+        box.set_value(value)
         self.update_tallies(boxID)
         self.update_axis_unknowns(boxID)
-    
+
+    def set_tally(self, boxID, tally):
+        """
+        Replaces the tally mask of a box, recording the old one if guessing in place
+        :param boxID: ID of box
+        :param tally: new tally mask
+        """
+        box = self.box_map[boxID]
+        if self.trail is not None:
+            self.trail.append((box, box.value, box.tally))
+        if self.pending is not None:
+            self.pending.append(boxID)
+        self.removed_count += self.grid.popcount[box.tally & ~tally]
+        box.tally = tally
+
+    def remove_from_tally(self, boxID, mask):
+        """
+        Removes values from the tally mask of a box
+        :param boxID: ID of box
+        :param mask: mask of the values to remove
+        :return: True if any of the values were in the tally
+        """
+        box = self.box_map[boxID]
+        if box.tally & mask == 0:
+            return False
+        if self.trail is not None:
+            self.trail.append((box, box.value, box.tally))
+        if self.pending is not None:
+            self.pending.append(boxID)
+        self.removed_count += self.grid.popcount[box.tally & mask]
+        box.tally &= ~mask
+        return True
+
+    def checkpoint(self):
+        """
+        Records the current state of the puzzle so changes made afterwards can be undone.
+        Starts the undo trail if it isn't already running
+        :return: checkpoint to pass to rollback
+        """
+        if self.trail is None:
+            self.trail = []
+        pending = None if self.pending is None else tuple(self.pending)
+        return (len(self.trail), len(self.method_log), len(self.valid_completion_list),
+                self.unknown_count, pending,
+                self.solved, self.no_solution, self.multiple_solution,
+                self.solution, self.final_string, self.error_description)
+
+    def rollback(self, checkpoint):
+        """
+        Undoes every change made since the checkpoint was taken
+        :param checkpoint: result of an earlier call to checkpoint
+        """
+        trail_length, log_length, completions, unknown_count, pending = checkpoint[0:5]
+
+        # restore box and axis states, most recent first
+        while len(self.trail) > trail_length:
+            entry = self.trail.pop()
+            if len(entry) == 3:
+                entry[0].value = entry[1]
+                entry[0].tally = entry[2]
+            else:
+                entry[0].unknown = entry[1]
+
+        # new lists rather than truncating, so callers can keep the longer versions
+        self.method_log = self.method_log[:log_length]
+        self.valid_completion_list = self.valid_completion_list[:completions]
+        self.unknown_count = unknown_count
+        self.pending = None if pending is None else list(pending)
+        (self.solved, self.no_solution, self.multiple_solution,
+         self.solution, self.final_string, self.error_description) = checkpoint[5:]
+
     def num_unknown_boxes(self):
-        count = 0
-        for i in range(0, 81):
-            if self.box_map[i].value == 0:
-                count += 1
-        return count
+        return self.unknown_count
         
     def print_initial_string(self):
         print("Initial string: ", self.puzzle_string)
 
     def get_current_string(self):
-        s = str()
-        for i in range(0, 81):
-            s += str(self.box_map[i].value)
-        return s
+        return "".join(DIGITS[self.box_map[i].value] for i in range(0, self.grid.cells))
 
     def print_current_string(self):
         print("Current string: ", self.get_current_string())
@@ -193,33 +332,4 @@ class Puzzle:
         else:
             s = self.get_current_string()
 
-        # replace zeros with blanks for display of puzzle
-        print_list = s.replace('0', ' ')
-
-        # define rows that don't depend on puzzle values
-        # width in characters
-        w = 59
-        # thick and thin horizontal lines, with verticals where appropriate
-        thick_outer = "="*w
-        thick_inner = "||" + ((("="*5) + "|")*2 + ("="*5) + "||")*3
-        thin = "||" + ((("-"*5) + "|")*2 + ("-"*5) + "||")*3
-
-        # print the top horizontal, then loop three times
-        print(thick_outer)
-        for i in range(0, 3):
-            j = i*3
-            # print(spaces)
-            print_row(j, print_list)
-            # print(spaces)
-            print(thin)
-            # print(spaces)
-            print_row(j+1, print_list)
-            # print(spaces)
-            print(thin)
-            # print(spaces)
-            print_row(j+2, print_list)
-            # print(spaces)
-            if i == 2:
-                print(thick_outer)
-            else:
-                print(thick_inner)
+        print_grid(s)
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from batch import check_result
+
+# fields of a result record, in CSV column order
+RECORD_FIELDS = ['name', 'puzzle', 'solution', 'status', 'difficulty', 'guesses', 'time']
+
+# formats ResultWriter can write
+FORMATS = ['text', 'solution', 'jsonl', 'csv']
+
+
+def make_record(result):
+    """
+    The fields of a result that are written out
+    :param result: dictionary from batch.solve_one
+    :return: dictionary with the RECORD_FIELDS keys
+    """
+    return {field: result[field] for field in RECORD_FIELDS}
+
+
+class ResultWriter:
+    """
+    Writes one line per puzzle result to a text stream. Lines are collected in memory and
+    written to the stream in bulk every buffer_size results and when the writer is closed.
+    Formats are:
+    text - tab-separated name, status, check against the given solution, and solution or error
+    solution - the solution, or the status if not solved
+    jsonl - a JSON object with the RECORD_FIELDS keys
+    csv - the RECORD_FIELDS values, after a header row
+    """
+
+    def __init__(self, stream, output_format="jsonl", buffer_size=1000):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {output_format}")
+        self.stream = stream
+        self.output_format = output_format
+        self.buffer_size = buffer_size
+        # lines waiting to be written
+        self.lines = []
+        # number of results written
+        self.count = 0
+
+        if output_format == "csv":
+            # the csv module writes to a file, so format each row through a reusable string buffer
+            self.csv_buffer = io.StringIO()
+            self.csv_writer = csv.writer(self.csv_buffer, lineterminator="\n")
+            self.csv_writer.writerow(RECORD_FIELDS)
+            self.lines.append(self.csv_buffer.getvalue())
+
+    def format_line(self, result):
+        """
+        Format a result as a line in the writer's format
+        :param result: dictionary from batch.solve_one
+        :return: the line, ending in a line break
+        """
+        if self.output_format == "solution":
+            return (result['solution'] or result['status']) + "\n"
+
+        if self.output_format == "text":
+            return "\t".join([result['name'], result['status'], check_result(result),
+                              result['solution'] or result['error']]) + "\n"
+
+        record = make_record(result)
+        if self.output_format == "jsonl":
+            return json.dumps(record, separators=(',', ':')) + "\n"
+
+        self.csv_buffer.seek(0)
+        self.csv_buffer.truncate()
+        self.csv_writer.writerow([record[field] for field in RECORD_FIELDS])
+        return self.csv_buffer.getvalue()
+
+    def write(self, result):
+        """
+        Add a result, writing the buffered lines if the buffer is full
+        :param result: dictionary from batch.solve_one
+        """
+        self.lines.append(self.format_line(result))
+        self.count += 1
+        if len(self.lines) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered lines to the stream
+        """
+        if self.lines:
+            self.stream.write("".join(self.lines))
+            self.lines = []
+        self.stream.flush()
+
+    def close(self):
+        """
+        Write any buffered lines. The stream itself is left open
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,450 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+import time
+from batch import solve_one
+from loader import parse_puzzle_line, check_puzzle_string
+from results import make_record
+from cache import SolutionCache, canonical_form
+from store import STORE_FIELDS
+
+# Solving for asyncio code. SolverService.solve queues a puzzle and waits for its result
+# without blocking the event loop. A single task takes the queued puzzles in batches and sends
+# each batch to a pool of worker processes, with no more batches out at once than there are
+# workers. While every worker is busy the queue fills up, and once it is full solve waits for
+# room (or, with wait=False, raises ServiceBusy), so callers are slowed down rather than
+# piling up work. Puzzles seen before are answered from a SolutionCache without being queued.
+# Finding the canonical form of a puzzle takes milliseconds, so puzzles equivalent to one seen
+# before (see cache module) are found in a worker process, and only those left are solved.
+# serve runs the service behind a small HTTP server on a port or Unix socket, which queues the
+# puzzles of each request all together or not at all.
+
+
+class ServiceBusy(Exception):
+    """
+    Raised by SolverService.solve and solve_many when the queue is full and the caller asked not to wait
+    """
+
+
+def solve_items(items, time_limit=None, max_guesses=None):
+    """
+    Solve a batch of puzzles in a worker process
+    :param items: list of (name, puzzle string, solution string or "0") tuples
+    :param time_limit: seconds to allow for each puzzle, or None for no limit
+    :param max_guesses: number of guesses to allow for each puzzle, or None for no limit
+    :return: list of results from batch.solve_one, in the same order as items
+    """
+    return [solve_one(item, time_limit, max_guesses) for item in items]
+
+
+def canonical_forms(puzzle_strings):
+    """
+    Find the canonical forms of a batch of puzzles in a worker process
+    :param puzzle_strings: list of puzzle strings
+    :return: list of forms from cache.canonical_form, in the same order as puzzle_strings
+    """
+    return [canonical_form(puzzle_string) for puzzle_string in puzzle_strings]
+
+
+class SolverService:
+    """
+    Solves puzzles in worker processes for asyncio code, combining the puzzles of concurrent
+    calls to solve into batches. Use as an async context manager, or call start and close
+    """
+
+    def __init__(self, workers=None, batch_size=32, max_wait=0.002, max_queue=1024, time_limit=None,
+                 max_guesses=None, cache_size=10000):
+        """
+        :param workers: number of worker processes, defaults to the number of cores
+        :param batch_size: most puzzles sent to a worker at a time
+        :param max_wait: seconds to wait for more puzzles to fill a batch once the first arrives
+        :param max_queue: most puzzles waiting to be sent to a worker
+        :param time_limit: seconds to allow for each puzzle, or None for no limit
+        :param max_guesses: number of guesses to allow for each puzzle, or None for no limit
+        :param cache_size: most results kept in the SolutionCache, 0 for no cache
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.time_limit = time_limit
+        self.max_guesses = max_guesses
+        # (item, future) pairs waiting for a worker
+        self.queue = asyncio.Queue(max_queue)
+        self.pool = None
+        self.batcher = None
+        # batches sent to the workers and not yet finished
+        self.running = set()
+        self.slots = None
+        self.batches = 0
+        self.solved = 0
+        self.cache = SolutionCache(cache_size) if cache_size > 0 else None
+
+    async def start(self):
+        """
+        Start the worker processes and the task that sends them batches
+        """
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        # start the workers now, before any connections are open; workers forked later would
+        # keep copies of open connections, so closing them wouldn't end them
+        await asyncio.get_running_loop().run_in_executor(self.pool, solve_items, [])
+        self.slots = asyncio.Semaphore(self.workers)
+        self.batcher = asyncio.create_task(self.send_batches())
+
+    async def close(self):
+        """
+        Stop taking batches, wait for the batches already sent, and stop the worker processes.
+        Puzzles still queued get a CancelledError
+        """
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+            self.batcher = None
+        if self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+        while not self.queue.empty():
+            item, future = self.queue.get_nowait()
+            future.cancel()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def solve(self, puzzle_string, name="puzzle", given="0", wait=True):
+        """
+        Solve a puzzle in a worker process
+        :param puzzle_string: 81-digit puzzle string, blanks as '0'
+        :param name: the name for the puzzle
+        :param given: the solution string to check against, or "0"
+        :param wait: wait for room if the queue is full, rather than raising ServiceBusy
+        :return: dictionary as from batch.solve_one, without the method stats if the result
+         came from the cache
+        """
+        results = await self.solve_many([(name, puzzle_string, given)], wait)
+        return results[0]
+
+    async def solve_many(self, items, wait=True):
+        """
+        Solve several puzzles in worker processes. Without waiting, either every puzzle is
+        queued or, if the queue hasn't room for them all, none is
+        :param items: list of (name, puzzle string, solution string or "0") tuples
+        :param wait: wait for room as the queue fills, rather than raising ServiceBusy
+        :return: list of dictionaries as from solve, in the same order as items
+        """
+        for name, puzzle_string, given in items:
+            check_puzzle_string(puzzle_string)
+
+        # only the puzzles not in the cache are queued
+        results = [self.lookup(item) for item in items]
+        unknown = [item for item, result in zip(items, results) if result is None]
+        if not wait and len(unknown) > self.queue.maxsize - self.queue.qsize():
+            raise ServiceBusy("Too many puzzles waiting")
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for item in unknown]
+        try:
+            for item, future in zip(unknown, futures):
+                if wait:
+                    await self.queue.put((item, future))
+                else:
+                    self.queue.put_nowait((item, future))
+            waiting = iter(futures)
+            return [result if result is not None else await next(waiting) for result in results]
+        finally:
+            # a caller that gives up doesn't need the rest solved
+            for future in futures:
+                future.cancel()
+
+    def lookup(self, item):
+        """
+        Find the result for a puzzle in the cache by its exact puzzle string, in the same form
+        as solve_one. Equivalent puzzles are looked up by run_batch
+        :param item: tuple of the puzzle name, puzzle string, and solution string or "0"
+        :return: result dictionary, or None if the puzzle isn't cached
+        """
+        if self.cache is None:
+            return None
+        start = time.perf_counter()
+        return self.cached_result(item, self.cache.lookup_exact(item[1]), start)
+
+    @staticmethod
+    def cached_result(item, cached, start):
+        """
+        Make a result from the cache into the same form as solve_one
+        :param item: tuple of the puzzle name, puzzle string, and solution string or "0"
+        :param cached: dictionary from the cache, or None
+        :param start: time.perf_counter() when the lookup started
+        :return: result dictionary, or None if cached is None
+        """
+        if cached is None:
+            return None
+        name, puzzle_string, given = item
+        result = {'name': name,
+                  'puzzle': puzzle_string,
+                  'given': given}
+        result.update(cached)
+        result['time'] = round(time.perf_counter() - start, 6)
+        return result
+
+    async def next_batch(self):
+        """
+        Wait for a puzzle, then take any more queued up to the batch size. If that doesn't fill
+        the batch, wait max_wait for more to arrive
+        :return: list of (item, future) pairs
+        """
+        batch = [await self.queue.get()]
+        self.take_queued(batch)
+        if len(batch) < self.batch_size and self.max_wait > 0:
+            try:
+                await asyncio.sleep(self.max_wait)
+            except asyncio.CancelledError:
+                for item, future in batch:
+                    future.cancel()
+                raise
+            self.take_queued(batch)
+        return batch
+
+    def take_queued(self, batch):
+        """
+        Move queued puzzles to a batch until it is full or the queue is empty
+        :param batch: list of (item, future) pairs
+        """
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    async def send_batches(self):
+        """
+        Send batches of queued puzzles to the workers, one batch per free worker
+        """
+        while True:
+            await self.slots.acquire()
+            try:
+                batch = await self.next_batch()
+            except asyncio.CancelledError:
+                self.slots.release()
+                raise
+            task = asyncio.create_task(self.run_batch(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def run_batch(self, batch):
+        """
+        Solve a batch in a worker process and pass each result to the caller waiting for it.
+        With a cache, the canonical forms of the puzzles are found first, and puzzles equivalent
+        to one already solved are answered without solving them
+        :param batch: list of (item, future) pairs
+        """
+        # callers that gave up waiting don't need their puzzles solved
+        batch = [(item, future) for item, future in batch if not future.done()]
+        try:
+            loop = asyncio.get_running_loop()
+            forms = [None] * len(batch)
+            if batch and self.cache is not None:
+                start = time.perf_counter()
+                found = await loop.run_in_executor(self.pool, canonical_forms, [item[1] for item, future in batch])
+                unsolved = []
+                for (item, future), form in zip(batch, found):
+                    result = self.cached_result(item, self.cache.lookup_form(item[1], form), start)
+                    if result is None:
+                        unsolved.append((item, future, form))
+                    elif not future.done():
+                        future.set_result(result)
+                batch = [(item, future) for item, future, form in unsolved]
+                forms = [form for item, future, form in unsolved]
+            if batch:
+                results = await loop.run_in_executor(self.pool, solve_items, [item for item, future in batch],
+                                                     self.time_limit, self.max_guesses)
+                self.batches += 1
+                self.solved += len(results)
+                for (item, future), form, result in zip(batch, forms, results):
+                    # a bigger budget might solve it, so it isn't cached
+                    if self.cache is not None and result['status'] != 'budget_exceeded':
+                        self.cache.store_form(result['puzzle'], {field: result[field] for field in STORE_FIELDS},
+                                              form)
+                    if not future.done():
+                        future.set_result(result)
+        except Exception as error:
+            for item, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            self.slots.release()
+
+
+async def read_request(reader):
+    """
+    Read an HTTP request
+    :param reader: asyncio StreamReader of the connection
+    :return: tuple of the method, path, header dictionary with lower case names, and body
+     bytes; None if the connection closed before a request
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError("bad request line")
+    method, path = parts[0], parts[1]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0"))
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def http_response(status, body, content_type="application/json"):
+    """
+    An HTTP response
+    :param status: status code and reason, such as "200 OK"
+    :param body: response body text
+    :param content_type: media type of the body
+    :return: the response as bytes
+    """
+    data = body.encode("utf-8")
+    return (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1") + data
+
+
+async def handle_solve(service, body):
+    """
+    Solve the puzzles in a request body, one puzzle line per line as in a puzzle file
+    :param service: the SolverService
+    :param body: request body text
+    :return: tuple of the status and the response body, a JSON record per puzzle per line
+    """
+    items = []
+    for number, line in enumerate(body.splitlines()):
+        try:
+            puzzle = parse_puzzle_line(line)
+        except ValueError as error:
+            return "400 Bad Request", json.dumps({'error': f"{error} in line {number + 1}"}) + "\n"
+        if puzzle is not None:
+            items.append((f"request-{len(items) + 1}", puzzle[0], puzzle[1]))
+
+    if len(items) > service.queue.maxsize:
+        return "413 Payload Too Large", json.dumps({'error': f"more than {service.queue.maxsize} puzzles"}) + "\n"
+    try:
+        results = await service.solve_many(items, wait=False)
+    except ServiceBusy as error:
+        return "503 Service Unavailable", json.dumps({'error': str(error)}) + "\n"
+    return "200 OK", "".join(json.dumps(make_record(result)) + "\n" for result in results)
+
+
+async def handle_connection(service, reader, writer):
+    """
+    Answer the HTTP requests on a connection: POST /solve to solve puzzles, and GET /status
+    for the number of puzzles solved, answered from the cache, and waiting
+    """
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError):
+                writer.write(http_response("400 Bad Request", json.dumps({'error': "bad request"}) + "\n"))
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+
+            if method == "POST" and path == "/solve":
+                status, text = await handle_solve(service, body.decode("utf-8", "replace"))
+            elif method == "GET" and path == "/status":
+                cached = service.cache.hits if service.cache is not None else 0
+                status, text = "200 OK", json.dumps({'solved': service.solved, 'batches': service.batches,
+                                                     'cached': cached, 'waiting': service.queue.qsize()}) + "\n"
+            else:
+                status, text = "404 Not Found", json.dumps({'error': "not found"}) + "\n"
+            writer.write(http_response(status, text))
+            await writer.drain()
+
+            if headers.get("connection", "").lower() == "close":
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8080, unix_path=None):
+    """
+    Run an HTTP server for the service until cancelled
+    :param service: a started SolverService
+    :param host: address to listen on
+    :param port: port to listen on, 0 for any free port
+    :param unix_path: path of a Unix socket to listen on instead of a port
+    :return: the asyncio server, once listening
+    """
+    def handler(reader, writer):
+        return handle_connection(service, reader, writer)
+
+    if unix_path is not None:
+        return await asyncio.start_unix_server(handler, unix_path)
+    return await asyncio.start_server(handler, host, port)
+
+
+def parse_args(argv):
+    """
+    Parse the command line options
+    :param argv: list of command line arguments, not including the program name
+    :return: argparse namespace of the options
+    """
+    parser = argparse.ArgumentParser(description="Solve sudoku puzzles over HTTP. POST puzzle lines to /solve "
+                                                 "to get one JSON record per puzzle back.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("-p", "--port", type=int, default=8080, help="port to listen on (default 8080)")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of a port")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes (default: number of cores)")
+    parser.add_argument("--batch-size", type=int, default=32, help="most puzzles sent to a worker at a time")
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="most puzzles waiting for a worker; requests that don't fit get 503, "
+                             "and requests with more puzzles than this get 413")
+    parser.add_argument("--time-limit", type=float, metavar="SECONDS",
+                        help="stop guessing on a puzzle after this many seconds")
+    parser.add_argument("--max-guesses", type=int, metavar="N", help="stop guessing on a puzzle after this many guesses")
+    parser.add_argument("--cache-size", type=int, default=10000,
+                        help="results kept to answer repeated and equivalent puzzles (default 10000, 0 for none)")
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    """
+    Run the service with the command line options until interrupted
+    """
+    async with SolverService(args.workers, args.batch_size, max_queue=args.max_queue, time_limit=args.time_limit,
+                             max_guesses=args.max_guesses, cache_size=args.cache_size) as service:
+        server = await serve(service, args.host, args.port, args.unix)
+        where = args.unix or f"http://{args.host}:{args.port}"
+        print(f"Solving puzzles at {where} with {service.workers} workers", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv):
+    args = parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
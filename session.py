@@ -0,0 +1,184 @@
+from puzzle import Puzzle
+from basic_methods import propagate
+from counting import count_solutions
+from candidates import DIGITS, CHARACTER_VALUES
+
+# A puzzle being filled in by hand, one value at a time, as in an editor. Each value entered is
+# followed up with the basic methods from the boxes it changed only, so the tallies always hold
+# the values still possible without solving from scratch. The puzzle is checkpointed before each
+# value is entered (see Puzzle.checkpoint), so clearing a value rolls back to the checkpoint
+# taken before it and enters the values that came after it again, rather than rebuilding the
+# puzzle from its string. Counting the ways to finish the puzzle is a search, which can take
+# a large part of a second on a 25x25 grid, so it is only done when asked for, and kept until
+# the next change.
+
+
+class EditSession:
+    """
+    The givens of a puzzle and the values entered on top of them, with the puzzle as the basic
+    methods leave it
+    """
+
+    def __init__(self, puzzle_string, name="puzzle"):
+        """
+        :param puzzle_string: 81-digit puzzle string, blanks as '0' (or N x N characters for
+         other grid sizes, see grid module)
+        :param name: the name for the puzzle
+        """
+        self.p = Puzzle(name, puzzle_string)
+        # the values entered, in order, each a list of box ID, value, and the checkpoint
+        # taken before it was entered
+        self.entries = []
+        # the result of solution_count since the last change, or None
+        self.count = None
+
+        # start the undo trail, and follow up the givens from every box
+        self.p.checkpoint()
+        self.p.pending = list(range(0, self.p.grid.cells))
+        if not self.p.no_solution:
+            propagate(self.p)
+        else:
+            self.p.pending = []
+
+    def _enter(self, ID, value):
+        """
+        put a value in a box and follow it up, unless the puzzle already has no solution
+        """
+        p = self.p
+        if p.no_solution:
+            return
+        box = p.box_map[ID]
+        if box.tally & p.grid.bit[value] == 0:
+            p.no_solution = True
+            p.error_description = f'{value} cannot be placed in row {box.row + 1}, column {box.col + 1}'
+            return
+        # the basic methods may already have found the value
+        if box.value == 0:
+            p.update_new_known(ID, value)
+            propagate(p)
+
+    def entry_index(self, ID):
+        """
+        where a box is in the list of values entered
+        :param ID: box ID
+        :return: index in self.entries, or None if no value was entered in the box
+        """
+        for k in range(0, len(self.entries)):
+            if self.entries[k][0] == ID:
+                return k
+        return None
+
+    def place(self, ID, value):
+        """
+        Enter a value in a box, replacing any value entered there before
+        :param ID: box ID
+        :param value: value from 1 to the grid size
+        :return: the state of the puzzle, as from state
+        :raises ValueError: if the box holds a given or the value doesn't fit the grid
+        """
+        if CHARACTER_VALUES[self.p.puzzle_string[ID]] != 0:
+            raise ValueError(f"Box {ID} holds a given value")
+        if not 1 <= value <= self.p.grid.size:
+            raise ValueError(f"{value} is not a value in a {self.p.grid.size}x{self.p.grid.size} grid")
+
+        self.count = None
+        k = self.entry_index(ID)
+        if k is not None:
+            self._take_out(k)
+        self.entries.append([ID, value, self.p.checkpoint()])
+        self._enter(ID, value)
+        return self.state()
+
+    def clear(self, ID):
+        """
+        Take the value entered in a box back out
+        :param ID: box ID
+        :return: the state of the puzzle, as from state
+        :raises ValueError: if the box holds a given
+        """
+        if CHARACTER_VALUES[self.p.puzzle_string[ID]] != 0:
+            raise ValueError(f"Box {ID} holds a given value")
+        k = self.entry_index(ID)
+        if k is not None:
+            self.count = None
+            self._take_out(k)
+        return self.state()
+
+    def _take_out(self, k):
+        """
+        roll back to before entry k was entered, then enter the later values again
+        """
+        later = self.entries[k + 1:]
+        self.p.rollback(self.entries[k][2])
+        del self.entries[k:]
+        for ID, value, checkpoint in later:
+            self.entries.append([ID, value, self.p.checkpoint()])
+            self._enter(ID, value)
+
+    def values(self):
+        """
+        the givens and the values entered, without the values found by the basic methods
+        :return: list of the value in each box, 0 if blank
+        """
+        # from the puzzle string, since a Puzzle stops putting in givens at the first that conflicts
+        values = [CHARACTER_VALUES[ch] for ch in self.p.puzzle_string]
+        for ID, value, checkpoint in self.entries:
+            values[ID] = value
+        return values
+
+    def conflicts(self):
+        """
+        boxes holding the same given or entered value as another box in one of their axes
+        :return: sorted list of box IDs
+        """
+        values = self.values()
+        found = set()
+        for key, axis in self.p.axis_map.items():
+            # first box seen with each value in the axis
+            seen = {}
+            for j in axis.boxes:
+                value = values[j]
+                if value == 0:
+                    continue
+                if value in seen:
+                    found.add(seen[value])
+                    found.add(j)
+                else:
+                    seen[value] = j
+        return sorted(found)
+
+    def candidates(self):
+        """
+        the values still possible in each box after the basic methods
+        :return: list of the tuple of values possible in each box
+        """
+        mask_values = self.p.grid.mask_values
+        return [tuple(mask_values[box.tally]) for key, box in self.p.box_map.items()]
+
+    def solution_count(self):
+        """
+        number of ways to finish the puzzle from the values entered, counted the first time it
+        is asked for after a change
+        :return: 0 for none, 1 for one, and 2 for more than one
+        """
+        if self.count is None:
+            if self.p.no_solution:
+                self.count = 0
+            elif self.p.solved:
+                self.count = 1
+            else:
+                self.count = count_solutions(self.p.get_current_string())
+        return self.count
+
+    def state(self):
+        """
+        What an editor needs after each change
+        :return: dictionary with the givens and entered values as a puzzle string ('values'),
+         the values possible in each box ('candidates'), boxes in conflict ('conflicts'), and the
+         error found by the basic methods, if any ('error'). The number of ways to finish the
+         puzzle is left to solution_count
+        """
+        return {'values': "".join(DIGITS[value] for value in self.values()),
+                'candidates': self.candidates(),
+                'conflicts': self.conflicts(),
+                'error': self.p.error_description}
@@ -1,32 +1,116 @@
-from basic_methods import basic_solve_attempt
-from advanced_methods import use_advanced_methods
-from guess_methods import guess_recursive
+import time
+from basic_methods import propagate
+from advanced_methods import use_advanced_methods, ADVANCED_METHODS
+from guess_methods import guess_recursive, guess_in_place, BudgetExceeded, BRANCHING, VALUE_ORDERS
+from dancing_links import solve_with_dancing_links
 from puzzle import Puzzle
+from candidates import CHARACTER_VALUES
+from store import summarize_method_log
 
 
-def solve_puzzle(puzzle_string, puzzle_name):
+# ways solve_puzzle can solve a puzzle:
+# methods - the basic and advanced methods, then guessing
+# dancing_links - an exact cover search with dancing links (see dancing_links module)
+BACKENDS = ['methods', 'dancing_links']
+
+# Grids larger than 9x9 are searched with dancing links once the methods get stuck, before
+# guessing. Following up each guess with the methods costs milliseconds on a 25x25 grid, while
+# dancing links finds the solutions of puzzles with many blanks in a fraction of the rows. It
+# can also lose its way where the methods don't, so it gets this many rows per box before
+# guessing takes over
+DANCING_LINKS_ROWS = 100
+
+
+def solve_puzzle(puzzle_string, puzzle_name, in_place=True, store=None, branching='first',
+                 value_order='ascending', backend='methods', stats=None, methods=None, time_limit=None,
+                 max_guesses=None):
     """
-    Try to solve the puzzle with the various methods in the methods scripts. First check that enough clues
-    were provided for it to possibly be a valid puzzle. Then use the basic methods. If not solved,
-    try the advanced methods, and finally guess if necessary.
+    Try to solve the puzzle with the various methods in the methods scripts. If a result store
+    is given, a puzzle already in the store is rebuilt from its stored result instead of solved,
+    and a new puzzle's result is put in the store once it is solved. Stored results are those of
+    the solving methods with the default options, as the store is keyed by the puzzle alone, so
+    the store is only used with the 'methods' backend and default in_place, branching,
+    value_order, and methods
     :param puzzle_string: the string representing the puzzle
     :param puzzle_name: the name for the puzzle
-    :return: the puzzle analyzed
+    :param in_place: guess on the puzzle itself using its undo trail rather than on deep copies
+    :param store: optional ResultStore of earlier results, not used by other backends
+    :param branching: how guess_in_place picks what to guess on, one of guess_methods.BRANCHING
+    :param value_order: order guess_in_place tries guesses in, one of guess_methods.VALUE_ORDERS
+    :param backend: one of BACKENDS
+    :param stats: optional MethodStats to add the work done by each method to
+    :param methods: list of advanced methods to use, cheapest first, or None for
+     advanced_methods.ADVANCED_METHODS
+    :param time_limit: seconds to allow for the call, or None for no limit. Checked before each guess
+    :param max_guesses: number of guesses to allow, or None for no limit
+    :return: the puzzle analyzed. If the time or guesses run out while guessing, the puzzle is
+     returned as it was before guessing, with budget_exceeded set
     """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}")
+    if branching not in BRANCHING:
+        raise ValueError(f"Unknown branching {branching}")
+    if value_order not in VALUE_ORDERS:
+        raise ValueError(f"Unknown value order {value_order}")
+
+    # the clock starts before looking in the store
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    # another backend's result has no difficulty and can't stand in for the methods' result, and
+    # other options can give other guess counts and method logs
+    if backend != 'methods' or not in_place or branching != 'first' or value_order != 'ascending' or \
+            (methods is not None and methods != ADVANCED_METHODS):
+        store = None
+
+    if store is not None:
+        result = store.get(puzzle_string)
+        if result is not None:
+            return restore_puzzle(puzzle_name, puzzle_string, result)
+
     # create puzzle
     p = Puzzle(puzzle_name, puzzle_string)
+    p.stats = stats
+    p.advanced_methods = methods
+    p.deadline = deadline
+    p.max_guesses = max_guesses
+    if backend == 'dancing_links':
+        attempt_exact_cover(p)
+    else:
+        attempt_solve(p, in_place, branching, value_order)
+
+    # a bigger budget might solve it, so it isn't stored
+    if store is not None and not p.budget_exceeded:
+        store.put(puzzle_string, puzzle_result(p))
+
+    return p
+
 
+def attempt_solve(p, in_place=True, branching='first', value_order='ascending'):
+    """
+    First check that enough clues were provided for the puzzle to possibly be valid. Then use
+    the basic methods. If not solved, try the advanced methods, and finally guess if necessary.
+    :param p: the puzzle, as initialized
+    :param in_place: guess on the puzzle itself using its undo trail rather than on deep copies
+    :param branching: how guess_in_place picks what to guess on, one of guess_methods.BRANCHING
+    :param value_order: order guess_in_place tries guesses in, one of guess_methods.VALUE_ORDERS
+    :return: the puzzle analyzed
+    """
     # Check for errors detected in initialization
     if p.no_solution:
         return p
 
-    # First check that at least 17 clues were provided
-    if p.num_unknown_boxes() >= 65:
+    # First check that at least 17 clues were provided (fewest for the grid size, see grid.MIN_CLUES)
+    if p.grid.cells - p.num_unknown_boxes() < p.grid.min_clues:
         p.too_few_clues = True
         return p
 
-    # use the two standard methods to get as far as possible
-    basic_solve_attempt(p)
+    # use the two standard methods to get as far as possible, starting from the boxes whose
+    # tallies the givens shrank
+    p.pending = [ID for ID, box in p.box_map.items() if box.value == 0 and box.tally != p.grid.all_values]
+    unknown = p.num_unknown_boxes()
+    propagate(p)
+    p.pending = None
+    p.method_log.append(["propagate", p.num_unknown_boxes() < unknown])
 
     # if solution found, set difficulty rating
     if p.solved:
@@ -36,16 +120,8 @@ def solve_puzzle(puzzle_string, puzzle_name):
     if p.solved or p.no_solution:
         return p
 
-    # Try advanced algorithmic methods
-    while p.solved is False:
-        # track number of unknown boxes
-        blanks = p.num_unknown_boxes()
-        # try the advanced methods
-        use_advanced_methods(p)
-
-        # check if puzzle solved or no progress
-        if p.solved or blanks == p.num_unknown_boxes():
-            break
+    # Try advanced algorithmic methods until none of them makes progress
+    use_advanced_methods(p)
 
     # if puzzle solved, set difficulty
     if p.solved:
@@ -55,10 +131,123 @@ def solve_puzzle(puzzle_string, puzzle_name):
         return p
 
     # if not yet solved and no error found, guess
-    guess_recursive(p, 0)
+    if p.stats is not None:
+        start = time.perf_counter()
+        method_seconds = p.stats.total_seconds()
+
+    # guessing on copies also changes the puzzle itself as guesses are ruled out, so both ways
+    # keep an undo trail to return the puzzle as it was if the budget runs out
+    checkpoint = p.checkpoint()
+    try:
+        # on large grids, guessing only if dancing links gives up
+        if p.grid.size <= 9 or not solve_with_dancing_links(p, DANCING_LINKS_ROWS * p.grid.cells):
+            if in_place:
+                # basic methods are done, so nothing is pending yet
+                p.pending = []
+                guess_in_place(p, (), branching, value_order)
+            else:
+                guess_recursive(p, 0)
+    except BudgetExceeded as error:
+        # undo the guesses still in place, and what they ruled out
+        p.rollback(checkpoint)
+        p.budget_exceeded = True
+        p.error_description = str(error)
+    # guesses are all resolved, so stop recording the trail and pending boxes
+    p.trail = None
+    p.pending = None
+
+    if p.stats is not None:
+        # the time spent guessing, less the time the methods took on the guesses
+        seconds = time.perf_counter() - start - (p.stats.total_seconds() - method_seconds)
+        p.stats.record('guess', seconds, calls=0)
 
     # if guessing solved it, label Difficult
     if p.solved:
         p.difficulty = "Difficult"
 
     return p
+
+
+def attempt_exact_cover(p):
+    """
+    Check that the puzzle initialized without error and has enough clues, as attempt_solve does,
+    then solve it with dancing links. No difficulty is rated, since no solving methods are used
+    :param p: the puzzle, as initialized
+    :return: the puzzle analyzed
+    """
+    if p.no_solution:
+        return p
+
+    if p.grid.cells - p.num_unknown_boxes() < p.grid.min_clues:
+        p.too_few_clues = True
+        return p
+
+    solve_with_dancing_links(p)
+    return p
+
+
+def puzzle_status(p):
+    """
+    One-word summary of what solve_puzzle found
+    :param p: the puzzle analyzed
+    :return: 'solved', 'no_solution', 'multiple_solution', 'too_few_clues', 'budget_exceeded',
+     or 'unsolved'
+    """
+    if p.solved:
+        return 'solved'
+    if p.no_solution:
+        return 'no_solution'
+    if p.multiple_solution:
+        return 'multiple_solution'
+    if p.too_few_clues:
+        return 'too_few_clues'
+    if p.budget_exceeded:
+        return 'budget_exceeded'
+    return 'unsolved'
+
+
+def puzzle_result(p):
+    """
+    The results of solving a puzzle, in the form kept by a ResultStore
+    :param p: the puzzle analyzed
+    :return: dictionary with the solution, status, difficulty, error description, number of
+     guesses, and summary of the methods used
+    """
+    return {'solution': p.solution,
+            'status': puzzle_status(p),
+            'difficulty': p.difficulty,
+            'error': p.error_description,
+            'guesses': p.guess_count,
+            'methods': summarize_method_log(p.method_log)}
+
+
+def restore_puzzle(puzzle_name, puzzle_string, result):
+    """
+    Rebuild an analyzed puzzle from its stored result without solving it again. The method log
+    and any completions of a puzzle with more than one solution are not stored, so they are
+    left empty
+    :param puzzle_name: the name for the puzzle
+    :param puzzle_string: the string representing the puzzle
+    :param result: dictionary from puzzle_result
+    :return: the puzzle, with the stored status, solution, and difficulty
+    """
+    p = Puzzle(puzzle_name, puzzle_string)
+    p.from_store = True
+    status = result['status']
+    p.solved = status == 'solved'
+    p.no_solution = status == 'no_solution'
+    p.multiple_solution = status == 'multiple_solution'
+    p.too_few_clues = status == 'too_few_clues'
+    p.budget_exceeded = status == 'budget_exceeded'
+    p.difficulty = result['difficulty']
+    p.error_description = result['error']
+    p.guess_count = result['guesses']
+
+    if result['solution']:
+        p.solution = result['solution']
+        # fill in the boxes so the current state is the solution too
+        for i in range(0, p.grid.cells):
+            if p.box_map[i].value == 0:
+                p.update_new_known(i, CHARACTER_VALUES[p.solution[i]])
+
+    return p
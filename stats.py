@@ -0,0 +1,94 @@
+import functools
+import time
+
+# Each solving method wrapped with timed records, for a puzzle with stats attached, how many
+# times it ran, how long it took, how many values it removed from tallies, and how many boxes
+# it filled in. Guessing is recorded as 'guess' by guess_methods and solver.
+
+
+class MethodStats:
+    """
+    Totals for each solving method across one or many puzzles. The totals for a method are a
+    list of [calls, seconds, eliminations, placements]
+    """
+
+    def __init__(self):
+        self.methods = {}
+
+    def record(self, name, seconds=0.0, calls=1, eliminations=0, placements=0):
+        """
+        Add to the totals for a method
+        :param name: name of the method
+        :param seconds: time taken
+        :param calls: times the method ran
+        :param eliminations: values removed from tallies
+        :param placements: boxes filled in
+        """
+        totals = self.methods.get(name)
+        if totals is None:
+            totals = self.methods[name] = [0, 0.0, 0, 0]
+        totals[0] += calls
+        totals[1] += seconds
+        totals[2] += eliminations
+        totals[3] += placements
+
+    def total_seconds(self):
+        """
+        time taken by all the methods
+        """
+        return sum(totals[1] for totals in self.methods.values())
+
+    def as_dict(self):
+        """
+        the totals as a dictionary of method name to [calls, seconds, eliminations, placements],
+        small enough to send back from a worker process
+        """
+        return {name: list(totals) for name, totals in self.methods.items()}
+
+    def merge(self, methods):
+        """
+        Add the totals from another puzzle or batch
+        :param methods: dictionary from as_dict
+        """
+        for name, totals in methods.items():
+            self.record(name, totals[1], totals[0], totals[2], totals[3])
+
+    def format_table(self):
+        """
+        The totals as a table, slowest method first
+        :return: the table as a string, one line per method after a header line
+        """
+        lines = [f"{'method':<26}{'calls':>10}{'seconds':>10}{'us/call':>10}{'elims':>10}{'places':>10}"]
+        for name, totals in sorted(self.methods.items(), key=lambda item: -item[1][1]):
+            calls, seconds, eliminations, placements = totals
+            per_call = 1e6 * seconds / calls if calls else 0
+            lines.append(f"{name:<26}{calls:>10}{seconds:>10.3f}{per_call:>10.1f}"
+                         f"{eliminations:>10}{placements:>10}")
+        return "\n".join(lines)
+
+    def __deepcopy__(self, memo):
+        # puzzles copied while guessing keep adding to the same totals
+        return self
+
+
+def timed(method):
+    """
+    Wrap a solving method so that it records its stats when the puzzle has stats attached
+    :param method: function taking the puzzle as its first argument
+    :return: the wrapped function
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(p, *args):
+        stats = p.stats
+        if stats is None:
+            return method(p, *args)
+        removed = p.removed_count
+        unknown = p.unknown_count
+        start = time.perf_counter()
+        result = method(p, *args)
+        stats.record(name, time.perf_counter() - start, 1, p.removed_count - removed, unknown - p.unknown_count)
+        return result
+
+    return wrapper
@@ -0,0 +1,99 @@
+import json
+import sqlite3
+
+# columns of the results table after the puzzle string, in order
+STORE_FIELDS = ['solution', 'status', 'difficulty', 'error', 'guesses', 'methods']
+
+
+def summarize_method_log(method_log):
+    """
+    Count how often each method ran and how often it made progress. Guesses are logged with the
+    box guessed on, so they are all counted together as 'guess'
+    :param method_log: list of [method name, progress] entries from a Puzzle
+    :return: dictionary of method name to [times run, times progress was made]
+    """
+    summary = {}
+    for name, progress in method_log:
+        if name.startswith('Recursive guess'):
+            name = 'guess'
+        counts = summary.setdefault(name, [0, 0])
+        counts[0] += 1
+        if progress:
+            counts[1] += 1
+    return summary
+
+
+class ResultStore:
+    """
+    Results of solved puzzles kept in an SQLite database file, so that they outlast the run that
+    found them. Each puzzle string maps to a result dictionary with the STORE_FIELDS keys, where
+    methods is the summary from summarize_method_log.
+    New results are committed every commit_every puts and when the store is closed.
+    """
+
+    def __init__(self, path, commit_every=1000):
+        self.path = path
+        self.commit_every = commit_every
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                "puzzle TEXT PRIMARY KEY, solution TEXT, status TEXT, difficulty TEXT, "
+                                "error TEXT, guesses INTEGER, methods TEXT)")
+        self.connection.commit()
+        # puts not committed yet
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, puzzle_string):
+        """
+        Find the stored result for a puzzle
+        :param puzzle_string: 81-digit puzzle string
+        :return: result dictionary, or None if the puzzle isn't stored
+        """
+        row = self.connection.execute("SELECT solution, status, difficulty, error, guesses, methods "
+                                      "FROM results WHERE puzzle = ?", (puzzle_string,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        result = dict(zip(STORE_FIELDS, row))
+        result['methods'] = json.loads(result['methods'])
+        return result
+
+    def put(self, puzzle_string, result):
+        """
+        Store the result for a puzzle, replacing any result already stored for it
+        :param puzzle_string: 81-digit puzzle string
+        :param result: dictionary with the STORE_FIELDS keys
+        """
+        row = [result[field] for field in STORE_FIELDS]
+        row[-1] = json.dumps(result['methods'], separators=(',', ':'))
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                [puzzle_string] + row)
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """
+        Write the results put since the last commit to the file
+        """
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """
+        Commit any new results and close the database
+        """
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
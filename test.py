@@ -1,6 +1,36 @@
 import unittest
+import unittest.mock
+import io
+import contextlib
+import os
 from puzzle import Puzzle
-from solver import solve_puzzle
+from solver import solve_puzzle, puzzle_status
+from dancing_links import exact_cover_solutions
+from counting import count_solutions
+from stats import MethodStats
+import benchmark
+from guess_methods import BRANCHING, VALUE_ORDERS
+from candidates import mask_of
+from basic_methods import propagate
+from advanced_methods import intersection_check, naked_subset_check, hidden_subset_check, x_wing_check, \
+    swordfish_check, xy_wing_check, xyz_wing_check
+from batch import solve_batch, check_result
+from loader import parse_puzzle_line, iter_puzzle_lines
+import main
+import json
+from results import ResultWriter, RECORD_FIELDS
+from canonical import canonicalize, uncanonicalize
+from cache import SolutionCache
+from session import EditSession
+from hints import next_hint, apply_hint, hint
+from grader import grade_puzzle, grade_stream, format_table, GUESS_RATING
+from store import ResultStore
+from batch import solve_stream
+import tempfile
+import asyncio
+from service import SolverService, ServiceBusy, serve
+import vectorized
+import grid
 
 
 class PuzzleCreationTests(unittest.TestCase):
@@ -40,15 +70,15 @@ class PuzzleCreationTests(unittest.TestCase):
         self.assertEqual(self.p.axis_map[0].dimension, 0)
         self.assertEqual(self.p.axis_map[0].index, 0)
         self.assertEqual(self.p.axis_map[0].box_set, {0, 1, 2, 3, 4, 5, 6, 7, 8})
-        self.assertEqual(self.p.axis_map[0].unknown, {1, 3, 5, 7, 9})
+        self.assertEqual(self.p.axis_map[0].unknown, mask_of({1, 3, 5, 7, 9}))
         self.assertEqual(self.p.axis_map[11].dimension, 1)
         self.assertEqual(self.p.axis_map[11].index, 2)
         self.assertEqual(self.p.axis_map[11].box_set, {2, 11, 20, 29, 38, 47, 56, 65, 74})
-        self.assertEqual(self.p.axis_map[11].unknown, {1, 3, 7, 8, 9})
+        self.assertEqual(self.p.axis_map[11].unknown, mask_of({1, 3, 7, 8, 9}))
         self.assertEqual(self.p.axis_map[23].dimension, 2)
         self.assertEqual(self.p.axis_map[23].index, 5)
         self.assertEqual(self.p.axis_map[23].box_set, {33, 34, 35, 42, 43, 44, 51, 52, 53})
-        self.assertEqual(self.p.axis_map[23].unknown, {2, 3, 4, 5, 7, 9})
+        self.assertEqual(self.p.axis_map[23].unknown, mask_of({2, 3, 4, 5, 7, 9}))
 
     def test_box_0(self):
         self.assertEqual(self.p.box_map[0].ID, 0)
@@ -58,7 +88,7 @@ class PuzzleCreationTests(unittest.TestCase):
         self.assertEqual(self.p.box_map[0].coord, [0, 0, 0])
         self.assertEqual(self.p.box_map[0].value, 2)
         self.assertTrue(self.p.box_map[0].given)
-        self.assertEqual(self.p.box_map[0].tally, {2})
+        self.assertEqual(self.p.box_map[0].tally, mask_of({2}))
 
     def test_box_13(self):
         self.assertEqual(self.p.box_map[13].ID, 13)
@@ -68,7 +98,97 @@ class PuzzleCreationTests(unittest.TestCase):
         self.assertEqual(self.p.box_map[13].coord, [1, 4, 1])
         self.assertEqual(self.p.box_map[13].value, 0)
         self.assertFalse(self.p.box_map[13].given)
-        self.assertEqual(self.p.box_map[13].tally, {4, 6, 9})
+        self.assertEqual(self.p.box_map[13].tally, mask_of({4, 6, 9}))
+
+
+class GridTests(unittest.TestCase):
+    def test_peers(self):
+        self.assertEqual(len(grid.PEERS[40]), 20)
+        self.assertNotIn(40, grid.PEERS[40])
+        self.assertEqual(grid.PEERS[0][:10], (1, 2, 3, 4, 5, 6, 7, 8, 9, 10))
+
+    def test_box_axes(self):
+        self.assertEqual(grid.BOX_AXES[13], (1, 13, 19))
+
+    def test_intersections(self):
+        self.assertEqual(len(grid.INTERSECTIONS), 54)
+        self.assertEqual(grid.INTERSECTIONS[1], (18, 9, (0, 9, 18), (1, 2, 10, 11, 19, 20),
+                                                 (27, 36, 45, 54, 63, 72)))
+
+    def test_axes_shared(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        q = Puzzle("Puzzle Name", '0' * 81)
+        self.assertIs(p.axis_map[5].boxes, q.axis_map[5].boxes)
+
+    def test_other_sizes(self):
+        small = grid.get_grid(4)
+        self.assertEqual(small.axis_boxes[8], (0, 1, 4, 5))
+        self.assertEqual(len(small.peers[0]), 7)
+        large = grid.get_grid(25)
+        self.assertEqual(len(large.peers[0]), 3 * 24 - 8)
+        self.assertEqual(large.mask_values[large.all_values], tuple(range(1, 26)))
+        with self.assertRaises(ValueError):
+            grid.grid_for('0' * 80)
+
+
+class GridSizeTests(unittest.TestCase):
+    small = '0100004000002400'
+    small_solution = '4132324113242413'
+    # needs guessing
+    large = '0C0E04010GF60000D40000F030A0000E00F000A05C00D00000000CB00001200000E0400200000A000012G06390000B00' \
+            'G0600A00CB0D07100A000000070000600E04010000300000012G0609A00CBE00F039000C00047020000000D070200600' \
+            '000710GF0300000000000000000BED40600000000D40020F050BE00010GF009A'
+    large_solution = '5CBED4712GF639A8D4712GF639A85CBE2GF639A85CBED47139A85CBED4712GF6CBED4712GF639A854712GF639A85CB' \
+                     'EDGF639A85CBED47129A85CBED4712GF63BED4712GF639A85C712GF639A85CBED4F639A85CBED4712GA85CBED4712GF6' \
+                     '39ED4712GF639A85CB12GF639A85CBED47639A85CBED4712GF85CBED4712GF639A'
+
+    def test_small(self):
+        p = solve_puzzle(self.small, "small")
+        self.assertTrue(p.solved)
+        self.assertEqual(p.solution, self.small_solution)
+
+    def test_large(self):
+        for in_place in (True, False):
+            p = solve_puzzle(self.large, "large", in_place=in_place)
+            self.assertTrue(p.solved)
+            self.assertEqual(p.solution, self.large_solution)
+            self.assertGreater(p.guess_count, 0)
+            self.assertEqual(p.method_log[-1], ["dancing links", True])
+
+    def test_large_guessing(self):
+        # with no rows for dancing links, guessing takes over straight away
+        with unittest.mock.patch("solver.DANCING_LINKS_ROWS", 0):
+            for in_place in (True, False):
+                p = solve_puzzle(self.large, "large", in_place=in_place)
+                self.assertTrue(p.solved)
+                self.assertEqual(p.solution, self.large_solution)
+                self.assertIn(["dancing links", False], p.method_log)
+                self.assertTrue(any(name.startswith("Recursive guess") for name, progress in p.method_log))
+
+    def test_many_solutions(self):
+        puzzle = self.large_solution[:64] + '0' * 192
+        p = solve_puzzle(puzzle, "large", time_limit=60)
+        self.assertEqual(puzzle_status(p), 'multiple_solution')
+
+    def test_other_solvers(self):
+        p = solve_puzzle(self.large, "large", backend='dancing_links')
+        self.assertEqual(p.solution, self.large_solution)
+        self.assertEqual(count_solutions(self.large), 1)
+        self.assertEqual(count_solutions('0' * 16, limit=5), 5)
+
+    def test_too_few_clues(self):
+        self.assertTrue(solve_puzzle('0001' + '0' * 12, "small").too_few_clues)
+
+    def test_lowercase_letters(self):
+        self.assertEqual(parse_puzzle_line(self.large.lower())[0], self.large)
+        with self.assertRaises(ValueError):
+            parse_puzzle_line(self.small.replace('1', '5'))
+
+    def test_picture(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            Puzzle("small", self.small).print_pic("blank")
+        self.assertEqual(out.getvalue().splitlines()[1], "||     |  1  ||     |     ||  ")
 
 
 class PuzzleSolvedTests(unittest.TestCase):
@@ -103,11 +223,141 @@ class PuzzleSolvedTests(unittest.TestCase):
         self.assertEqual(self.p.error_description, '')
 
     def test_puzzle_method_log(self):
-        self.assertEqual(self.p.method_log[0][0], 'lone tally')
-        self.assertTrue(self.p.method_log[0][1])
-        self.assertEqual(self.p.method_log[1][0], 'only place')
-        self.assertTrue(self.p.method_log[1][1])
-        self.assertEqual(len(self.p.method_log), 2)
+        self.assertEqual(self.p.method_log, [['propagate', True]])
+
+
+class PropagateTests(unittest.TestCase):
+    def setUp(self):
+        self.p = Puzzle("Puzzle Name",
+                        '286000004530208100000030082000400610002315800054006000640070000005904068300000479')
+
+    def test_unknown_count(self):
+        self.assertEqual(self.p.num_unknown_boxes(), 46)
+        self.assertEqual(self.p.num_unknown_boxes(),
+                         sum(1 for box in self.p.box_map.values() if box.value == 0))
+
+    def test_propagate_solves(self):
+        self.p.pending = list(range(81))
+        propagate(self.p)
+        self.assertTrue(self.p.solved)
+        self.assertEqual(self.p.solution,
+                         "286159734537248196491637582873492615962315847154786923649873251715924368328561479")
+        self.assertEqual(self.p.pending, [])
+        self.assertEqual(self.p.method_log, [])
+
+    def test_propagate_finds_error(self):
+        self.p.pending = []
+        # leave no place for 9 in the first row
+        for i in (3, 4, 5, 6, 7):
+            self.p.remove_from_tally(i, mask_of({9}))
+        propagate(self.p)
+        self.assertTrue(self.p.no_solution)
+
+
+class AdvancedMethodsTests(unittest.TestCase):
+    puzzle = '302000000001090004090002503509000007000080030008600900000270600000009000000040850'
+
+    def test_solves_medium(self):
+        p = solve_puzzle(self.puzzle, "Puzzle Name")
+        self.assertTrue(p.solved)
+        self.assertEqual(p.difficulty, "Medium")
+        self.assertIsNone(p.pending)
+
+    def test_idle_methods_skipped(self):
+        p = solve_puzzle(self.puzzle, "Puzzle Name")
+        advanced = {"bare tally pair", "hidden tally pair", "intersection", "naked subset", "hidden subset",
+                    "x-wing", "swordfish", "jellyfish", "xy-wing", "xyz-wing"}
+        # methods that ran without progress since the last method that made progress
+        idle = set()
+        for name, progress in p.method_log:
+            if name in advanced:
+                self.assertNotIn(name, idle)
+                if progress:
+                    idle = set()
+                else:
+                    idle.add(name)
+
+    def test_methods_per_call(self):
+        p = solve_puzzle(self.puzzle, "Puzzle Name", methods=[intersection_check])
+        names = {name for name, progress in p.method_log}
+        self.assertIn("intersection", names)
+        self.assertNotIn("bare tally pair", names)
+        self.assertNotIn("hidden tally pair", names)
+
+        p = solve_puzzle(self.puzzle, "Puzzle Name", methods=[])
+        self.assertEqual(p.difficulty, "Difficult")
+
+    def test_naked_triple(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        for i, values in enumerate([{1, 2}, {2, 3}, {1, 3}]):
+            p.set_tally(i, mask_of(values))
+        naked_subset_check(p)
+        self.assertEqual(p.method_log, [["naked subset", True]])
+        for i in range(3, 9):
+            self.assertEqual(p.box_map[i].tally, mask_of(range(4, 10)))
+        self.assertEqual(p.box_map[0].tally, mask_of({1, 2}))
+
+    def test_hidden_triple(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        for i in range(3, 9):
+            p.set_tally(i, mask_of(range(4, 10)))
+        hidden_subset_check(p)
+        self.assertEqual(p.method_log, [["hidden subset", True]])
+        for i in range(0, 3):
+            self.assertEqual(p.box_map[i].tally, mask_of({1, 2, 3}))
+        self.assertEqual(p.box_map[9].tally, mask_of(range(1, 10)))
+
+    @staticmethod
+    def confine(p, value, places):
+        # leave value possible only in the given columns of each given row
+        for row, columns in places.items():
+            for col in range(0, 9):
+                if col not in columns:
+                    p.remove_from_tally(row * 9 + col, mask_of({value}))
+
+    def test_x_wing(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        self.confine(p, 1, {0: {1, 7}, 4: {1, 7}})
+        x_wing_check(p)
+        self.assertEqual(p.method_log, [["x-wing", True]])
+        self.assertEqual(p.box_map[2 * 9 + 1].tally, mask_of(range(2, 10)))
+        self.assertEqual(p.box_map[2 * 9 + 7].tally, mask_of(range(2, 10)))
+        self.assertEqual(p.box_map[2 * 9 + 2].tally, mask_of(range(1, 10)))
+        self.assertEqual(p.box_map[4 * 9 + 7].tally, mask_of(range(1, 10)))
+
+    def test_swordfish(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        self.confine(p, 1, {0: {0, 3}, 3: {3, 6}, 6: {0, 6}})
+        x_wing_check(p)
+        self.assertEqual(p.method_log, [["x-wing", False]])
+        swordfish_check(p)
+        self.assertEqual(p.method_log[1], ["swordfish", True])
+        for row in (1, 4, 8):
+            for col in (0, 3, 6):
+                self.assertEqual(p.box_map[row * 9 + col].tally, mask_of(range(2, 10)))
+        self.assertEqual(p.box_map[3 * 9 + 0].tally & mask_of({1}), 0)
+
+    def test_xy_wing(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        p.set_tally(0, mask_of({1, 2}))
+        p.set_tally(4, mask_of({1, 3}))
+        p.set_tally(18, mask_of({2, 3}))
+        xy_wing_check(p)
+        self.assertEqual(p.method_log, [["xy-wing", True]])
+        for i in (1, 2, 21, 22, 23):
+            self.assertEqual(p.box_map[i].tally, mask_of({1, 2, 4, 5, 6, 7, 8, 9}))
+        self.assertEqual(p.box_map[5].tally, mask_of(range(1, 10)))
+
+    def test_xyz_wing(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        p.set_tally(0, mask_of({1, 2, 3}))
+        p.set_tally(1, mask_of({1, 3}))
+        p.set_tally(9, mask_of({2, 3}))
+        xyz_wing_check(p)
+        self.assertEqual(p.method_log, [["xyz-wing", True]])
+        for i in (2, 10, 11, 18, 19, 20):
+            self.assertEqual(p.box_map[i].tally, mask_of({1, 2, 4, 5, 6, 7, 8, 9}))
+        self.assertEqual(p.box_map[3].tally, mask_of(range(1, 10)))
 
 
 class PuzzleMultipleSolutionTests(unittest.TestCase):
@@ -141,5 +391,763 @@ class PuzzleMultipleSolutionTests(unittest.TestCase):
         self.assertEqual(self.p.error_description, 'Multiple values possible in box 32')
 
 
+class PuzzleGuessInPlaceTests(unittest.TestCase):
+    def setUp(self):
+        self.puzzle_string = '000000003000000750050480000004009000100067002060000080030200040040100005800005600'
+        self.p = solve_puzzle(self.puzzle_string, "Puzzle Name")
+        self.copied = solve_puzzle(self.puzzle_string, "Puzzle Name", in_place=False)
+
+    def test_puzzle_solution(self):
+        self.assertEqual(self.p.solution,
+                         "496751823218693754753482169374829516185367492962514387531276948649138275827945631")
+
+    def test_puzzle_difficulty(self):
+        self.assertEqual(self.p.difficulty, "Difficult")
+
+    def test_puzzle_method_log_matches_copy(self):
+        self.assertEqual(self.p.method_log, self.copied.method_log)
+
+    def test_puzzle_trail_stopped(self):
+        self.assertIsNone(self.p.trail)
+
+    def test_rollback(self):
+        p = Puzzle("Puzzle Name", self.puzzle_string)
+        before = p.get_current_string()
+        tallies = [p.box_map[i].tally for i in range(81)]
+        checkpoint = p.checkpoint()
+        p.update_new_known(0, 4)
+        p.method_log.append(["guess", True])
+        p.rollback(checkpoint)
+        self.assertEqual(p.get_current_string(), before)
+        self.assertEqual([p.box_map[i].tally for i in range(81)], tallies)
+        self.assertEqual(p.method_log, [])
+
+
+class GuessStrategyTests(unittest.TestCase):
+    puzzle = '000000003000000750050480000004009000100067002060000080030200040040100005800005600'
+    solution = "496751823218693754753482169374829516185367492962514387531276948649138275827945631"
+
+    def test_strategies_find_solution(self):
+        for branching in BRANCHING:
+            for value_order in VALUE_ORDERS:
+                p = solve_puzzle(self.puzzle, "Puzzle Name", branching=branching, value_order=value_order)
+                self.assertEqual(p.solution, self.solution)
+                self.assertEqual(p.num_unknown_boxes(), 0)
+
+    def test_strategies_find_multiple_solutions(self):
+        for branching in BRANCHING:
+            p = solve_puzzle('000801000000000430500000000000070800000000100020030000600000075003400000000200600',
+                             "Puzzle Name", branching=branching)
+            self.assertTrue(p.multiple_solution)
+            self.assertEqual(len(p.valid_completion_list), 2)
+
+    def test_fewest_guesses_fewer(self):
+        first = solve_puzzle(self.puzzle, "Puzzle Name")
+        fewest = solve_puzzle(self.puzzle, "Puzzle Name", branching='fewest')
+        self.assertLess(fewest.guess_count, first.guess_count)
+
+    def test_unknown_branching(self):
+        with self.assertRaises(ValueError):
+            solve_puzzle(self.puzzle, "Puzzle Name", branching='random')
+
+
+class BudgetTests(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = GuessStrategyTests.puzzle
+        # the puzzle as the basic and advanced methods leave it
+        before = solve_puzzle(self.puzzle, "Puzzle Name", max_guesses=0)
+        self.before_guessing = before.get_current_string()
+        self.tallies_before = [box.tally for key, box in before.box_map.items()]
+
+    def test_max_guesses(self):
+        for in_place in (True, False):
+            p = solve_puzzle(self.puzzle, "Puzzle Name", in_place=in_place, max_guesses=3)
+            self.assertEqual(puzzle_status(p), 'budget_exceeded')
+            self.assertEqual(p.guess_count, 3)
+            self.assertEqual(p.error_description, "Stopped after 3 guesses")
+            self.assertIsNone(p.trail)
+            # the guesses, and the values they ruled out, are undone
+            self.assertEqual(p.get_current_string(), self.before_guessing)
+            self.assertEqual([box.tally for key, box in p.box_map.items()], self.tallies_before)
+            self.assertEqual(p.valid_completion_list, [])
+
+    def test_dancing_links(self):
+        p = solve_puzzle(self.puzzle, "Puzzle Name", backend='dancing_links', max_guesses=3)
+        self.assertEqual(puzzle_status(p), 'budget_exceeded')
+        self.assertEqual(p.guess_count, 3)
+        self.assertEqual(p.error_description, "Stopped after 3 guesses")
+        self.assertEqual(p.get_current_string(), self.puzzle)
+        p = solve_puzzle(self.puzzle, "Puzzle Name", backend='dancing_links', time_limit=0)
+        self.assertEqual(puzzle_status(p), 'budget_exceeded')
+        p = solve_puzzle(self.puzzle, "Puzzle Name", backend='dancing_links', time_limit=60, max_guesses=10 ** 6)
+        self.assertEqual(p.solution, GuessStrategyTests.solution)
+
+    def test_partial_puzzle(self):
+        p = solve_puzzle(self.puzzle, "Puzzle Name", max_guesses=3)
+        self.assertEqual(p.get_current_string(), self.before_guessing)
+        self.assertFalse(p.solved)
+        self.assertEqual(p.valid_completion_list, [])
+
+    def test_time_limit(self):
+        p = solve_puzzle(self.puzzle, "Puzzle Name", time_limit=0)
+        self.assertEqual(puzzle_status(p), 'budget_exceeded')
+        p = solve_puzzle(self.puzzle, "Puzzle Name", time_limit=60)
+        self.assertEqual(p.solution, GuessStrategyTests.solution)
+
+    def test_not_stored(self):
+        with ResultStore(":memory:") as store:
+            solve_puzzle(self.puzzle, "Puzzle Name", store=store, max_guesses=3)
+            self.assertEqual(len(store), 0)
+            solve_puzzle(self.puzzle, "Puzzle Name", store=store)
+            self.assertEqual(len(store), 1)
+
+
+class DancingLinksTests(unittest.TestCase):
+    def test_matches_methods(self):
+        for name, puzzle, given in BatchTests.items:
+            methods = solve_puzzle(puzzle, name)
+            exact_cover = solve_puzzle(puzzle, name, backend='dancing_links')
+            self.assertEqual(puzzle_status(exact_cover), puzzle_status(methods))
+            self.assertEqual(exact_cover.solution, methods.solution)
+
+    def test_solution_filled_in(self):
+        p = solve_puzzle(BatchTests.items[2][1], "three", backend='dancing_links')
+        self.assertEqual(p.get_current_string(), BatchTests.items[2][2])
+        self.assertEqual(p.method_log, [["dancing links", True]])
+
+    def test_multiple_solutions(self):
+        p = solve_puzzle(BatchTests.items[1][1], "two", backend='dancing_links')
+        self.assertEqual(len(p.valid_completion_list), 2)
+        self.assertNotEqual(p.error_description, "")
+
+    def test_no_solution(self):
+        # the solution has a 4 in the first box, so a 2 there leaves no solution
+        puzzle = '2' + BatchTests.items[2][1][1:]
+        solutions, nodes = exact_cover_solutions(puzzle)
+        self.assertEqual(solutions, [])
+        p = solve_puzzle(puzzle, "Puzzle Name", backend='dancing_links')
+        self.assertTrue(p.no_solution)
+        self.assertEqual(p.error_description, "No way to complete the puzzle")
+
+    def test_given_conflict(self):
+        puzzle = '33' + '0' * 79
+        self.assertEqual(exact_cover_solutions(puzzle), ([], 0))
+
+
+class MethodStatsTests(unittest.TestCase):
+    def test_methods_recorded(self):
+        stats = MethodStats()
+        p = solve_puzzle(BatchTests.items[2][1], "three", stats=stats)
+        totals = stats.as_dict()
+        self.assertEqual(totals['guess'][0], p.guess_count)
+        for name in ['lone_tally_check', 'only_place_check', 'hidden_tally_pair_check',
+                     'bare_tally_pair_check', 'intersection_check', 'propagate']:
+            self.assertGreater(totals[name][0], 0)
+        # every box not given was filled in by a method or a guess
+        self.assertGreaterEqual(sum(total[3] for total in totals.values()), p.puzzle_string.count('0'))
+
+    def test_merge(self):
+        stats = MethodStats()
+        solve_puzzle(BatchTests.items[0][1], "one", stats=stats)
+        total = MethodStats()
+        total.merge(stats.as_dict())
+        total.merge(stats.as_dict())
+        self.assertEqual(total.methods['propagate'][0], 2 * stats.methods['propagate'][0])
+
+    def test_off_by_default(self):
+        p = solve_puzzle(BatchTests.items[0][1], "one")
+        self.assertIsNone(p.stats)
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.5), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([3], 0.99), 3)
+
+    def test_tier(self):
+        puzzles = [[item[1], item[2]] for item in BatchTests.items if item[2] != "0"]
+        row = benchmark.benchmark_tier(puzzles, 'solved', repeat=1)
+        self.assertEqual((row['puzzles'], row['correct']), (2, 2))
+        self.assertEqual(row['guesses'], solve_puzzle(puzzles[1][0], "three").guess_count)
+
+    def test_regressions(self):
+        base = {'tiers': {'hard': {'correct': 10, 'guesses': 100, 'per_second': 100, 'p99_ms': 10, 'peak_kb': 50}}}
+        same = {'tiers': {'hard': dict(base['tiers']['hard'], per_second=80)}}
+        worse = {'tiers': {'hard': dict(base['tiers']['hard'], guesses=101, per_second=40)}}
+        self.assertEqual(benchmark.compare_to_baseline(same, base, 0.25), [])
+        self.assertEqual(len(benchmark.compare_to_baseline(worse, base, 0.25)), 2)
+
+
+class CountSolutionsTests(unittest.TestCase):
+    def test_unique(self):
+        self.assertEqual(count_solutions(BatchTests.items[0][1]), 1)
+        self.assertEqual(count_solutions(BatchTests.items[2][1]), 1)
+
+    def test_multiple(self):
+        self.assertEqual(count_solutions(BatchTests.items[1][1]), 2)
+        self.assertEqual(count_solutions(BatchTests.items[1][1], limit=1), 1)
+
+    def test_limit(self):
+        self.assertEqual(count_solutions('0' * 81, limit=5), 5)
+
+    def test_no_solution(self):
+        self.assertEqual(count_solutions('2' + BatchTests.items[2][1][1:]), 0)
+        self.assertEqual(count_solutions('33' + '0' * 79), 0)
+
+    def test_solved_grid(self):
+        self.assertEqual(count_solutions(BatchTests.items[2][2]), 1)
+
+
+class BatchTests(unittest.TestCase):
+    items = [("one", '286000004530208100000030082000400610002315800054006000640070000005904068300000479',
+              "286159734537248196491637582873492615962315847154786923649873251715924368328561479"),
+             ("two", '000801000000000430500000000000070800000000100020030000600000075003400000000200600',
+              "0"),
+             ("three", '000000003000000750050480000004009000100067002060000080030200040040100005800005600',
+              "496751823218693754753482169374829516185367492962514387531276948649138275827945631")]
+
+    def test_pool_matches_single_process(self):
+        pooled = solve_batch(self.items, workers=2, chunksize=1)
+        single = solve_batch(self.items, workers=1)
+        for result in pooled + single:
+            # solve times differ from run to run
+            del result['time']
+            for totals in result['stats'].values():
+                totals[1] = 0
+        self.assertEqual(pooled, single)
+
+    def test_results_in_order(self):
+        results = solve_batch(self.items, workers=2, chunksize=1)
+        self.assertEqual([result['name'] for result in results], ["one", "two", "three"])
+        self.assertEqual([result['status'] for result in results], ['solved', 'multiple_solution', 'solved'])
+        self.assertEqual([check_result(result) for result in results], ['PASS', '', 'PASS'])
+
+
+class ServiceTests(unittest.TestCase):
+    def test_solve(self):
+        async def solve_all():
+            async with SolverService(workers=1) as service:
+                return await asyncio.gather(*(service.solve(puzzle, name, given)
+                                              for name, puzzle, given in BatchTests.items))
+
+        results = asyncio.run(solve_all())
+        self.assertEqual([result['name'] for result in results], ["one", "two", "three"])
+        self.assertEqual([result['status'] for result in results], ['solved', 'multiple_solution', 'solved'])
+        self.assertEqual(results[2]['solution'], BatchTests.items[2][2])
+
+    def test_repeats_from_cache(self):
+        tests = CanonicalTests()
+        tests.setUp()
+
+        async def solve_twice():
+            async with SolverService(workers=1) as service:
+                # canonical forms are found in the workers, never on the event loop
+                with unittest.mock.patch.object(service.cache, '_canonicalize', side_effect=AssertionError):
+                    first = await service.solve(tests.puzzle)
+                    second = await service.solve(tests.variant)
+                    again = await service.solve(tests.variant)
+                return first, second, again, service.solved
+
+        first, second, again, solved = asyncio.run(solve_twice())
+        self.assertEqual(solved, 1)
+        self.assertEqual(again, dict(second, time=again['time']))
+        self.assertNotIn('stats', second)
+        self.assertEqual(second['status'], 'solved')
+        self.assertEqual(second['solution'], transform(tests.solution, tests.rows, tests.columns, tests.digits, True))
+
+    def test_busy_when_queue_full(self):
+        async def fill():
+            # not started, so nothing takes puzzles off the queue
+            service = SolverService(workers=1, max_queue=1)
+            waiting = asyncio.ensure_future(service.solve(BatchTests.items[0][1]))
+            await asyncio.sleep(0)
+            with self.assertRaises(ServiceBusy):
+                await service.solve(BatchTests.items[1][1], wait=False)
+            waiting.cancel()
+            await asyncio.sleep(0)
+
+            # a request is queued all together or not at all
+            service.queue.get_nowait()
+            with self.assertRaises(ServiceBusy):
+                await service.solve_many(BatchTests.items, wait=False)
+            self.assertTrue(service.queue.empty())
+
+        asyncio.run(fill())
+
+    def test_http(self):
+        async def post(port, body):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            data = body.encode()
+            writer.write(b"POST /solve HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % len(data)
+                         + data)
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+
+        async def requests():
+            async with SolverService(workers=1) as service:
+                server = await serve(service, port=0)
+                port = server.sockets[0].getsockname()[1]
+                responses = await asyncio.gather(post(port, BatchTests.items[0][1] + "," + BatchTests.items[0][2]),
+                                                 post(port, "123"))
+                server.close()
+                return responses
+
+        solved, bad = asyncio.run(requests())
+        self.assertTrue(solved.startswith("HTTP/1.1 200 OK"))
+        record = json.loads(solved.split("\r\n\r\n")[1])
+        self.assertEqual(record['status'], 'solved')
+        self.assertEqual(record['solution'], BatchTests.items[0][2])
+        self.assertTrue(bad.startswith("HTTP/1.1 400"))
+
+
+@unittest.skipUnless(vectorized.available(), "numpy is not installed")
+class VectorizedTests(unittest.TestCase):
+    def test_matches_solve_stream(self):
+        items = BatchTests.items + [("four", '003020600900305001001806400008102900700000008006708200002609500800203009005010300',
+                                     "0")]
+        together = list(vectorized.solve_stream_vectorized(items, workers=1, batch_size=2))
+        alone = list(solve_stream(items, workers=1))
+        for result in together + alone:
+            del result['time']
+            del result['methods']
+            result.pop('stats', None)
+        self.assertEqual(together, alone)
+
+    def test_stats_recorded(self):
+        results = list(vectorized.solve_stream_vectorized(BatchTests.items, workers=1))
+        self.assertTrue(all('stats' in result for result in results))
+        blanks = BatchTests.items[0][1].count('0')
+        self.assertEqual(results[0]['stats']['vectorized'][2:], [8 * blanks, blanks])
+
+    def test_one_pool_for_all_batches(self):
+        pooled = list(vectorized.solve_stream_vectorized(BatchTests.items, workers=2, chunksize=1, batch_size=1))
+        single = list(vectorized.solve_stream_vectorized(BatchTests.items, workers=1, batch_size=1))
+        for result in pooled + single:
+            del result['time']
+            del result['stats']
+        self.assertEqual(pooled, single)
+
+    def test_only_easy_solved_together(self):
+        solutions, eliminations, placements = vectorized.solve_masks([item[1] for item in BatchTests.items])
+        self.assertEqual(solutions, [BatchTests.items[0][2], None, None])
+        # the unsolved puzzles get part of the way
+        self.assertGreater(eliminations[1], 0)
+        self.assertLess(placements[1], BatchTests.items[1][1].count('0'))
+
+    def test_error_found(self):
+        masks = vectorized.parse_masks(['33' + '0' * 79, BatchTests.items[0][1]])
+        self.assertEqual(list(vectorized.propagate_masks(masks)), [False, True])
+
+
+class LoaderTests(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = '286000004530208100000030082000400610002315800054006000640070000005904068300000479'
+        self.solution = "286159734537248196491637582873492615962315847154786923649873251715924368328561479"
+
+    def test_puzzle_and_solution(self):
+        self.assertEqual(parse_puzzle_line(self.puzzle + ", " + self.solution + "\n"), [self.puzzle, self.solution])
+
+    def test_puzzle_only(self):
+        self.assertEqual(parse_puzzle_line(self.puzzle + "\n"), [self.puzzle, "0"])
+
+    def test_dots_as_blanks(self):
+        self.assertEqual(parse_puzzle_line(self.puzzle.replace('0', '.')), [self.puzzle, "0"])
+
+    def test_blank_line(self):
+        self.assertIsNone(parse_puzzle_line("\n"))
+
+    def test_invalid_lines_skipped(self):
+        lines = [self.puzzle[:80] + "A\n", "\n", self.puzzle + ",0\n", self.puzzle + ",123\n"]
+        self.assertEqual(list(iter_puzzle_lines(lines)), [[self.puzzle, "0"]])
+
+
+class ResultWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.results = solve_batch(BatchTests.items, workers=1)
+
+    def test_jsonl(self):
+        stream = io.StringIO()
+        with ResultWriter(stream, "jsonl") as writer:
+            for result in self.results:
+                writer.write(result)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([record['status'] for record in records], ['solved', 'multiple_solution', 'solved'])
+        self.assertEqual(list(records[0].keys()), RECORD_FIELDS)
+        self.assertEqual(records[0]['difficulty'], 'Easy')
+        self.assertEqual(records[0]['guesses'], 0)
+        self.assertGreater(records[2]['guesses'], 0)
+
+    def test_csv(self):
+        stream = io.StringIO()
+        with ResultWriter(stream, "csv") as writer:
+            for result in self.results:
+                writer.write(result)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], ",".join(RECORD_FIELDS))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[2].startswith("two,000801000"))
+
+    def test_buffered(self):
+        stream = io.StringIO()
+        writer = ResultWriter(stream, "solution", buffer_size=2)
+        writer.write(self.results[0])
+        self.assertEqual(stream.getvalue(), "")
+        writer.write(self.results[1])
+        self.assertEqual(stream.getvalue().splitlines(), [self.results[0]['solution'], 'multiple_solution'])
+        writer.close()
+
+
+def transform(s, rows, columns, digits, transpose=False):
+    """
+    rearrange a puzzle string for the canonical form tests
+    """
+    if transpose:
+        s = "".join(s[c * 9 + r] for r in range(9) for c in range(9))
+    return "".join(digits[int(s[r * 9 + c])] for r in rows for c in columns)
+
+
+class CanonicalTests(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = '000000003000000750050480000004009000100067002060000080030200040040100005800005600'
+        self.solution = "496751823218693754753482169374829516185367492962514387531276948649138275827945631"
+        self.rows = [4, 3, 5, 0, 2, 1, 7, 8, 6]
+        self.columns = [8, 6, 7, 2, 0, 1, 3, 5, 4]
+        self.digits = "0356287149"
+        self.variant = transform(self.puzzle, self.rows, self.columns, self.digits, True)
+
+    def test_equivalent_puzzles_same_form(self):
+        self.assertEqual(canonicalize(self.puzzle)[0], canonicalize(self.variant)[0])
+
+    def test_form_is_relabelled_rearrangement(self):
+        canonical, source, labels = canonicalize(self.variant)
+        self.assertEqual(canonical, "".join(str(labels[int(self.variant[i])]) for i in source))
+
+    def test_solution_mapped_back(self):
+        canonical, source, labels = canonicalize(self.puzzle)
+        variant_canonical, variant_source, variant_labels = canonicalize(self.variant)
+        canonical_solution = "".join(str(labels[int(self.solution[i])]) for i in source)
+        self.assertEqual(uncanonicalize(canonical_solution, variant_source, variant_labels),
+                         transform(self.solution, self.rows, self.columns, self.digits, True))
+
+    def test_rejects_improper_puzzles(self):
+        with self.assertRaises(ValueError):
+            canonicalize('0' * 81)
+        with self.assertRaises(ValueError):
+            canonicalize('11' + self.puzzle[2:])
+
+    def test_blank_rows(self):
+        # two full rows and seven blank ones, which can be arranged a great many ways
+        puzzle = '123456789456789123' + '0' * 63
+        variant = transform(puzzle, self.rows, self.columns, self.digits, True)
+        canonical, source, labels = canonicalize(puzzle)
+        self.assertEqual(canonicalize(variant)[0], canonical)
+        self.assertEqual(canonical, '0' * 63 + '123456789456789123')
+
+
+class EditSessionTests(unittest.TestCase):
+    puzzle = AdvancedMethodsTests.puzzle
+
+    def setUp(self):
+        self.solution = solve_puzzle(self.puzzle, "Puzzle Name").solution
+        self.session = EditSession(self.puzzle)
+        # blank boxes the basic methods don't fill in
+        self.open = [i for i, values in enumerate(self.session.candidates()) if len(values) > 1]
+
+    def test_place(self):
+        i = self.open[0]
+        value = int(self.solution[i])
+        state = self.session.place(i, value)
+        self.assertEqual(state['values'][i], self.solution[i])
+        self.assertEqual(state['candidates'][i], (value,))
+        self.assertEqual(state['conflicts'], [])
+        self.assertNotIn('solutions', state)
+        self.assertEqual(self.session.solution_count(), 1)
+        # the value can no longer go in the rest of the row
+        for j in range(i - i % 9, i - i % 9 + 9):
+            if j != i:
+                self.assertNotIn(value, state['candidates'][j])
+
+    def test_conflict(self):
+        # a value given elsewhere in the first row
+        state = self.session.place(1, 3)
+        self.assertEqual(state['conflicts'], [0, 1])
+        self.assertEqual(self.session.solution_count(), 0)
+        self.assertNotEqual(state['error'], "")
+        state = self.session.clear(1)
+        self.assertEqual(state, EditSession(self.puzzle).state())
+        self.assertEqual(self.session.solution_count(), 1)
+
+    def test_clear_keeps_later_values(self):
+        first, second = self.open[0], self.open[-1]
+        self.session.place(first, int(self.solution[first]))
+        self.session.place(second, int(self.solution[second]))
+        state = self.session.clear(first)
+        only_second = self.puzzle[:second] + self.solution[second] + self.puzzle[second + 1:]
+        self.assertEqual(state, EditSession(only_second).state())
+        self.assertEqual([entry[0] for entry in self.session.entries], [second])
+
+    def test_replace_value(self):
+        i = self.open[0]
+        wrong = int(self.solution[i]) % 9 + 1
+        self.session.place(i, wrong)
+        self.assertEqual(self.session.solution_count(), 0)
+        self.session.place(i, int(self.solution[i]))
+        self.assertEqual(self.session.solution_count(), 1)
+        self.assertEqual(len(self.session.entries), 1)
+
+    def test_count_kept_until_changed(self):
+        with unittest.mock.patch("session.count_solutions", return_value=1) as counting:
+            self.session.solution_count()
+            self.session.solution_count()
+            self.assertEqual(counting.call_count, 1)
+            self.session.place(self.open[0], int(self.solution[self.open[0]]))
+            self.session.clear(self.open[0])
+            self.assertEqual(counting.call_count, 1)
+            self.session.solution_count()
+            self.assertEqual(counting.call_count, 2)
+
+    def test_givens_fixed(self):
+        with self.assertRaises(ValueError):
+            self.session.place(0, 4)
+        with self.assertRaises(ValueError):
+            self.session.clear(0)
+
+
+class HintTests(unittest.TestCase):
+    puzzle = AdvancedMethodsTests.puzzle
+
+    def test_first_hint(self):
+        solution = solve_puzzle(self.puzzle, "Puzzle Name").solution
+        found = hint(self.puzzle)
+        self.assertEqual(found['strategy'], "only place")
+        (i, value), = found['placements']
+        self.assertEqual(str(value), solution[i])
+        self.assertEqual(found['cells'], [i])
+
+    def test_puzzle_unchanged(self):
+        p = Puzzle("Puzzle Name", self.puzzle)
+        tallies = [box.tally for key, box in p.box_map.items()]
+        next_hint(p)
+        self.assertEqual([box.tally for key, box in p.box_map.items()], tallies)
+        self.assertEqual(p.method_log, [])
+
+    def test_step_to_solution(self):
+        solution = solve_puzzle(self.puzzle, "Puzzle Name").solution
+        p = Puzzle("Puzzle Name", self.puzzle)
+        strategies = set()
+        while not p.solved:
+            found = next_hint(p)
+            strategies.add(found['strategy'])
+            for i, value in found['eliminations']:
+                self.assertNotEqual(str(value), solution[i])
+            apply_hint(p, found)
+        self.assertEqual(p.solution, solution)
+        self.assertGreater(len(strategies - {"only place", "lone tally"}), 0)
+        self.assertIsNone(next_hint(p))
+
+    def test_x_wing(self):
+        p = Puzzle("Puzzle Name", '0' * 81)
+        AdvancedMethodsTests.confine(p, 1, {0: {1, 7}, 4: {1, 7}})
+        found = next_hint(p)
+        self.assertEqual(found['strategy'], "x-wing")
+        self.assertEqual(found['rating'], 3.2)
+        self.assertEqual(found['cells'], [1, 37, 7, 43])
+        self.assertEqual(found['digits'], [1])
+        self.assertEqual(len(found['eliminations']), 14)
+        self.assertIn((2 * 9 + 1, 1), found['eliminations'])
+
+    def test_check_removes_hint_eliminations(self):
+        # the hint and the advanced method find the same X-Wing
+        p = Puzzle("Puzzle Name", '0' * 81)
+        AdvancedMethodsTests.confine(p, 1, {0: {1, 7}, 4: {1, 7}})
+        found = next_hint(p)
+        x_wing_check(p)
+        for i, value in found['eliminations']:
+            self.assertFalse(p.box_map[i].tally & p.grid.bit[value])
+        self.assertEqual(p.method_log, [["x-wing", True]])
+
+
+class GraderTests(unittest.TestCase):
+    def test_strategies_only(self):
+        result = grade_puzzle(("Puzzle Name", AdvancedMethodsTests.puzzle, "0"))
+        self.assertEqual(result['status'], 'solved')
+        self.assertEqual((result['guesses'], result['depth']), (0, 0))
+        self.assertGreater(result['rating'], 2.3)
+        self.assertLess(result['rating'], GUESS_RATING)
+        self.assertGreater(result['steps'], 0)
+
+    def test_guessing(self):
+        result = grade_puzzle(("Puzzle Name", GuessStrategyTests.puzzle, "0"))
+        self.assertEqual(result['status'], 'solved')
+        self.assertGreater(result['depth'], 0)
+        self.assertGreaterEqual(result['guesses'], result['depth'])
+        self.assertGreaterEqual(result['rating'], GUESS_RATING)
+
+    def test_statuses(self):
+        self.assertEqual(grade_puzzle(("two", BatchTests.items[1][1], "0"))['status'], 'multiple_solution')
+        self.assertEqual(grade_puzzle(("bad", '33' + '0' * 79, "0"))['status'], 'no_solution')
+        self.assertEqual(grade_puzzle(("few", '0' * 81, "0"))['status'], 'too_few_clues')
+
+    def test_pool_matches_single_process(self):
+        self.assertEqual(list(grade_stream(BatchTests.items, workers=2, chunksize=1)),
+                         list(grade_stream(BatchTests.items, workers=1)))
+
+    def test_table(self):
+        lines = list(format_table(grade_stream(BatchTests.items, workers=1)))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[0].split(), ["name", "rating", "hardest", "steps", "guesses", "depth", "status"])
+        self.assertTrue(lines[3].startswith("three "))
+        self.assertTrue(lines[3].endswith(" solved"))
+
+
+class SolutionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = SolutionCache(maxsize=2)
+        self.tests = CanonicalTests()
+        self.tests.setUp()
+
+    def test_equivalent_puzzle_hit(self):
+        self.cache.solve(self.tests.puzzle)
+        result = self.cache.solve(self.tests.variant)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(result['status'], 'solved')
+        self.assertEqual(result['solution'], solve_puzzle(self.tests.variant, "Puzzle Name").solution)
+
+    def test_exact_repeat_hit(self):
+        first = self.cache.solve(self.tests.puzzle)
+        self.assertEqual(self.cache.solve(self.tests.puzzle), first)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_results_are_copies(self):
+        for puzzle in (self.tests.puzzle, self.tests.variant, self.tests.variant):
+            self.cache.solve(puzzle)['name'] = "changed"
+        self.assertNotIn('name', self.cache.lookup(self.tests.puzzle))
+        self.assertNotIn('name', self.cache.lookup(self.tests.variant))
+
+    def test_size_bound(self):
+        for item in BatchTests.items:
+            self.cache.solve(item[1])
+        self.assertEqual(len(self.cache.canonical), 2)
+        self.assertEqual(len(self.cache.exact), 2)
+        self.assertIsNone(self.cache.lookup(BatchTests.items[0][1]))
+
+    def test_no_canonical_form_exact_only(self):
+        first = self.cache.solve('0' * 81)
+        self.assertEqual(first['status'], 'too_few_clues')
+        self.assertEqual(self.cache.solve('0' * 81), first)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(len(self.cache.canonical), 0)
+
+
+class ResultStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_results_kept_after_close(self):
+        puzzle = BatchTests.items[0][1]
+        with ResultStore(self.path) as store:
+            first = solve_puzzle(puzzle, "one", store=store)
+        with ResultStore(self.path) as store:
+            second = solve_puzzle(puzzle, "one", store=store)
+            self.assertEqual(store.hits, 1)
+        self.assertFalse(first.from_store)
+        self.assertTrue(second.from_store)
+        self.assertEqual(second.solution, first.solution)
+        self.assertEqual(second.difficulty, first.difficulty)
+        self.assertEqual(second.num_unknown_boxes(), 0)
+
+    def test_method_summary(self):
+        with ResultStore(self.path) as store:
+            p = solve_puzzle(BatchTests.items[2][1], "three", store=store)
+            methods = store.get(BatchTests.items[2][1])['methods']
+        self.assertEqual(sum(counts[0] for counts in methods.values()), len(p.method_log))
+        self.assertIn('guess', methods)
+
+    def test_stream_only_solves_new_puzzles(self):
+        with ResultStore(self.path) as store:
+            first = list(solve_stream(BatchTests.items[:2], workers=2, chunksize=1, store=store))
+        with ResultStore(self.path) as store:
+            second = list(solve_stream(BatchTests.items, workers=2, chunksize=1, store=store))
+            self.assertEqual((store.hits, store.misses), (2, 1))
+            self.assertEqual(len(store), 3)
+        third = solve_batch(BatchTests.items[2:], workers=1)
+        for result in first + second + third:
+            del result['time']
+            # method stats aren't stored
+            result.pop('stats', None)
+        self.assertEqual(second, first + third)
+
+    def test_other_backend_not_stored(self):
+        puzzle = BatchTests.items[0][1]
+        with ResultStore(self.path) as store:
+            p = solve_puzzle(puzzle, "one", store=store, backend='dancing_links')
+            self.assertEqual(len(store), 0)
+            solve_puzzle(puzzle, "one", store=store)
+            p = solve_puzzle(puzzle, "one", store=store, backend='dancing_links')
+            self.assertFalse(p.from_store)
+            self.assertEqual(p.difficulty, "")
+
+    def test_other_options_not_stored(self):
+        puzzle = BatchTests.items[0][1]
+        with ResultStore(self.path) as store:
+            solve_puzzle(puzzle, "one", store=store)
+            p = solve_puzzle(puzzle, "one", store=store, branching='fewest')
+            self.assertFalse(p.from_store)
+            self.assertNotEqual(p.method_log, [])
+            solve_puzzle(puzzle, "two", store=store, value_order='least_constraining', methods=[])
+            self.assertEqual(len(store), 1)
+            self.assertTrue(solve_puzzle(puzzle, "one", store=store).from_store)
+
+    def test_command_line_commits_when_stopped(self):
+        puzzles = os.path.join(self.directory.name, "puzzles.txt")
+        with open(puzzles, "w") as file:
+            file.write(BatchTests.items[0][1] + "\n" + BatchTests.items[1][1] + "\n")
+        with unittest.mock.patch.object(ResultWriter, "write", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                main.main([puzzles, "--store", self.path, "-q"])
+        with ResultStore(self.path) as store:
+            self.assertEqual(len(store), 1)
+
+
+class CommandLineTests(unittest.TestCase):
+    def run_main(self, argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main.main(argv)
+        return status, output.getvalue().splitlines()
+
+    def test_missing_file(self):
+        missing = os.path.join("puzzles", "no such file.txt")
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            status, lines = self.run_main([missing])
+        self.assertEqual(status, 2)
+        self.assertEqual(lines, [])
+        self.assertEqual(errors.getvalue(), f"main.py: {missing}: No such file or directory\n")
+
+    def test_file_text_format(self):
+        status, lines = self.run_main([os.path.join("puzzles", "LeeBatch1.txt"), "-q"])
+        self.assertEqual(status, 0)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0].split("\t")[:3], ["LeeBatch1.txt-1", "solved", "PASS"])
+
+    def test_solution_format(self):
+        status, lines = self.run_main([os.path.join("puzzles", "LeeBatch1.txt"), "-q", "-f", "solution"])
+        self.assertEqual(lines[0], "184295736362471859975683124746352981519864273238917465851746392493528617627139548")
+
+    def test_no_pictures_unless_asked(self):
+        status, lines = self.run_main([os.path.join("puzzles", "LeeBatch1.txt"), "-q"])
+        self.assertFalse(any(line.startswith("===") for line in lines))
+        status, lines = self.run_main([os.path.join("puzzles", "LeeBatch1.txt"), "-q", "--pic"])
+        self.assertTrue(any(line.startswith("===") for line in lines))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,207 @@
+import itertools
+import multiprocessing
+import os
+import time
+from batch import solve_stream, lookup_one
+from candidates import ALL_VALUES, POPCOUNT
+from grid import AXIS_BOXES, BOX_AXES
+
+# numpy is optional. Without it, solve_stream_vectorized solves every puzzle one at a time
+# as batch.solve_stream does
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Many puzzles are solved at once by holding their candidate masks in an (N, 81) array and
+# applying the basic methods to every puzzle with array operations: values known in a box are
+# removed from its peers (lone tally), and a value with only one place left in an axis is put
+# there (only place). These are the rules of the basic methods, so a puzzle solved this
+# way is one solve_puzzle would rate Easy. Puzzles left unsolved, or with an error, are solved one at a
+# time by the usual methods so their results and error descriptions are the same as ever.
+
+if np is not None:
+    BOX_AXIS_ARRAY = np.array(BOX_AXES, dtype=np.intp)
+    AXIS_ARRAY = np.array(AXIS_BOXES, dtype=np.intp)
+    POPCOUNT_ARRAY = np.array(POPCOUNT, dtype=np.int8)
+    # the value of each single-value mask, 0 for other masks
+    DIGIT_ARRAY = np.array([mask.bit_length() if POPCOUNT[mask] == 1 else 0 for mask in range(0, 512)],
+                           dtype=np.uint8)
+
+
+def available():
+    """
+    whether numpy is installed, so puzzles can be solved together
+    """
+    return np is not None
+
+
+def parse_masks(puzzle_strings):
+    """
+    The candidate masks of a list of puzzles
+    :param puzzle_strings: list of 81-digit puzzle strings
+    :return: (N, 81) array of candidate masks, a single value for the given boxes
+    """
+    digits = np.frombuffer("".join(puzzle_strings).encode("ascii"), dtype=np.uint8).reshape(-1, 81)
+    digits = digits.astype(np.int16) - 48
+    return np.where(digits > 0, np.left_shift(1, np.maximum(digits, 1) - 1), ALL_VALUES).astype(np.int16)
+
+
+def propagate_masks(masks):
+    """
+    Apply the lone tally and only place rules to every puzzle until none of them changes
+    :param masks: (N, 81) array of candidate masks, changed in place
+    :return: (N,) boolean array, False for puzzles found to have an error
+    """
+    valid = np.ones(len(masks), dtype=bool)
+    # puzzles still changing
+    active = np.arange(0, len(masks))
+
+    while len(active) > 0:
+        current = masks[active]
+
+        # values known in each axis; if a value is known twice in an axis, adding up the
+        # known masks gives more than combining them
+        cells = current[:, AXIS_ARRAY]
+        known = np.where(POPCOUNT_ARRAY[cells] == 1, cells, 0)
+        axis_known = np.bitwise_or.reduce(known, axis=2)
+        clash = (known.sum(axis=2) != axis_known).any(axis=1)
+
+        # remove the values known in each box's axes from its tally, unless it is the known box
+        box_known = axis_known[:, BOX_AXIS_ARRAY[:, 0]] | axis_known[:, BOX_AXIS_ARRAY[:, 1]] | \
+            axis_known[:, BOX_AXIS_ARRAY[:, 2]]
+        new = np.where(POPCOUNT_ARRAY[current] == 1, current, current & ~box_known)
+
+        # values possible in one box or more than one box of each axis
+        cells = new[:, AXIS_ARRAY]
+        once = np.zeros(axis_known.shape, dtype=new.dtype)
+        twice = np.zeros(axis_known.shape, dtype=new.dtype)
+        for j in range(0, 9):
+            twice |= once & cells[:, :, j]
+            once |= cells[:, :, j]
+        no_place = (once != ALL_VALUES).any(axis=1)
+
+        # put each value with one place in an axis in that place; each dimension's axes
+        # cover each box once
+        hits = cells & (once & ~twice)[:, :, None]
+        only = np.zeros_like(new)
+        for dimension in range(0, 3):
+            boxes = AXIS_ARRAY[9 * dimension: 9 * dimension + 9].ravel()
+            only[:, boxes] |= hits[:, 9 * dimension: 9 * dimension + 9].reshape(len(new), 81)
+        # two values with their only place in the same box
+        crowded = (POPCOUNT_ARRAY[only] > 1).any(axis=1)
+        new = np.where(only != 0, only, new)
+
+        empty = (new == 0).any(axis=1)
+        error = clash | no_place | crowded | empty
+        changed = (new != current).any(axis=1)
+
+        masks[active] = new
+        valid[active[error]] = False
+        active = active[changed & ~error]
+
+    return valid
+
+
+def solve_masks(puzzle_strings):
+    """
+    Solve as many of a list of puzzles as the lone tally and only place rules can
+    :param puzzle_strings: list of 81-digit puzzle strings
+    :return: tuple of the list of the solution string for each puzzle, or None if it wasn't
+     solved, and lists of the values removed from tallies and the boxes filled in for each puzzle
+    """
+    masks = parse_masks(puzzle_strings)
+    before = POPCOUNT_ARRAY[masks].astype(np.int32)
+    valid = propagate_masks(masks)
+    after = POPCOUNT_ARRAY[masks].astype(np.int32)
+    solved = valid & (after == 1).all(axis=1)
+
+    # clue counts under 17 are left to the usual methods, which report too few clues
+    clues = (np.array([len(s) - s.count('0') for s in puzzle_strings]) >= 17)
+    solved &= clues
+
+    eliminations = (before - after).sum(axis=1).tolist()
+    placements = ((before > 1) & (after == 1)).sum(axis=1).tolist()
+    text = (DIGIT_ARRAY[masks] + 48).tobytes().decode("ascii")
+    solutions = [text[81 * k: 81 * k + 81] if solved[k] else None for k in range(0, len(puzzle_strings))]
+    return solutions, eliminations, placements
+
+
+def solve_stream_vectorized(items, workers=None, chunksize=64, batch_size=4096, store=None, time_limit=None,
+                            max_guesses=None):
+    """
+    Solve puzzles from any iterable, yielding results as batch.solve_stream does. Puzzles are
+    read batch_size at a time and solved together as far as the basic methods go; the rest
+    are solved by solve_stream, with one pool of worker processes for all the batches. Without
+    numpy every puzzle goes to solve_stream
+    :param items: iterable of (name, puzzle string, solution string or "0") tuples
+    :param workers: number of worker processes for the puzzles not solved together
+    :param chunksize: puzzles sent to a worker at a time
+    :param batch_size: puzzles solved together at a time
+    :param store: optional ResultStore of earlier results
+    :param time_limit: seconds to allow for each puzzle not solved together, or None for no limit
+    :param max_guesses: number of guesses to allow for each puzzle, or None for no limit
+    :return: generator of results as from batch.solve_one, in the same order as items. The
+     stats of the puzzles solved together are their share of the time, with 'vectorized' as the
+     method
+    """
+    if np is None:
+        yield from solve_stream(items, workers, chunksize, store, time_limit, max_guesses)
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        yield from solve_batches(items, workers, chunksize, batch_size, store, time_limit, max_guesses, None)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from solve_batches(items, workers, chunksize, batch_size, store, time_limit, max_guesses, pool)
+
+
+def solve_batches(items, workers, chunksize, batch_size, store, time_limit, max_guesses, pool):
+    """
+    solve_stream_vectorized, with the pool for the puzzles not solved together, or None for
+    a single worker
+    """
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if len(batch) == 0:
+            break
+
+        results = [lookup_one(item, store) if store is not None else None for item in batch]
+        # the mask arrays hold 9x9 grids, so other sizes go to solve_stream
+        unknown = [k for k in range(0, len(batch)) if results[k] is None and len(batch[k][1]) == 81]
+
+        start = time.perf_counter()
+        solutions, eliminations, placements = [], [], []
+        if unknown:
+            solutions, eliminations, placements = solve_masks([batch[k][1] for k in unknown])
+        # the time is shared between the puzzles solved together
+        elapsed = round((time.perf_counter() - start) / max(1, len(unknown)), 6)
+
+        for k, solution, removed, filled in zip(unknown, solutions, eliminations, placements):
+            if solution is None:
+                continue
+            name, puzzle_string, given = batch[k]
+            results[k] = {'name': name,
+                          'puzzle': puzzle_string,
+                          'given': given,
+                          'solution': solution,
+                          'status': 'solved',
+                          'difficulty': 'Easy',
+                          'error': "",
+                          'guesses': 0,
+                          'methods': {'vectorized': [1, 1]},
+                          'time': elapsed,
+                          'stats': {'vectorized': [1, elapsed, removed, filled]}}
+            if store is not None:
+                store.put(puzzle_string, results[k])
+
+        # the rest are solved one at a time, and put in the store by solve_stream
+        rest = [k for k in range(0, len(batch)) if results[k] is None]
+        solved = solve_stream([batch[k] for k in rest], workers, chunksize, store, time_limit, max_guesses, pool)
+        for k in rest:
+            results[k] = next(solved)
+
+        yield from results